@@ -1,20 +1,168 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+import time
+import uuid
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Async drivers used by the request path, keyed by backend name
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver configured for {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Request pool, per worker process. Liveness is either a ping on every
+# checkout (DB_POOL_PRE_PING) or replacing connections older than
+# DB_POOL_RECYCLE seconds, which avoids the extra round trip.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+# Connections opened at startup; defaults to the whole pool
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+# PgBouncer in transaction mode cannot keep server-side prepared statements
+DB_PGBOUNCER = _env_flag("DB_PGBOUNCER", "false")
+
+
+class PoolStats:
+    """Checkout counters for the request pool, read by ``pool_gauges``."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited.
+
+    The wait covers everything before the handler gets a usable
+    connection: queueing for a free slot, connecting and the pre-ping.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record(time.perf_counter() - started)
+
+
+def _async_engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    backend = make_url(url).get_backend_name()
+    if backend == "postgresql":
+        options.update(
+            poolclass=InstrumentedAsyncPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        if DB_PGBOUNCER:
+            # Statements may run on a different server connection each
+            # transaction, so nothing is cached and names never collide
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+    return options
+
+
+# Synchronous engine: schema setup at startup and the maintenance jobs
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Async engine: every request handler. Objects stay usable after commit
+# because lazy refreshes cannot run implicitly on an AsyncSession.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# AsyncAttrs adds ``await obj.awaitable_attrs.<relationship>`` for explicit lazy loads
+Base = declarative_base(cls=AsyncAttrs)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
+
+
+async def warm_pool(count: int = DB_POOL_WARM) -> int:
+    """Open up to ``count`` pooled connections so the first requests skip connecting.
+
+    Returns the number of connections opened. Does nothing for engines
+    that do not keep connections (SQLite).
+    """
+    if not isinstance(async_engine.pool, QueuePool):
+        return 0
+    count = min(count, DB_POOL_SIZE)
+    if count <= 0:
+        return 0
+    results = await asyncio.gather(*(async_engine.connect() for _ in range(count)), return_exceptions=True)
+    connections = [result for result in results if not isinstance(result, BaseException)]
+    try:
+        # Any connection that did open goes back to the pool before a failure is raised
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        # One round trip each so every connection has finished its handshake
+        for connection in connections:
+            await connection.execute(text("SELECT 1"))
     finally:
-        db.close()
+        for connection in connections:
+            await connection.close()
+    return count
+
+
+def pool_gauges() -> dict:
+    """Current state of this worker's request pool."""
+    pool = async_engine.pool
+    gauges = {
+        "pool": type(pool).__name__,
+        "checkouts": pool_stats.checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_ms_avg": round(pool_stats.wait_seconds / pool_stats.checkouts * 1000, 3) if pool_stats.checkouts else 0.0,
+        "wait_ms_max": round(pool_stats.max_wait_seconds * 1000, 3),
+    }
+    if isinstance(pool, QueuePool):
+        gauges.update(
+            size=pool.size(),
+            max_overflow=DB_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # Negative while the pool has not opened all of its base connections
+            overflow=max(pool.overflow(), 0),
+        )
+    return gauges
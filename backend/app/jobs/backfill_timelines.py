@@ -0,0 +1,21 @@
+"""Populate department_timelines from existing shoutouts and recipients.
+
+Run once after upgrading with ``python -m app.jobs.backfill_timelines``. It is
+safe to re-run; each shoutout's rows are rebuilt from scratch.
+"""
+import app.models  # noqa: F401  (register every mapper before querying)
+from app.database import SessionLocal
+from app.utils.timelines import backfill_department_timelines
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        processed = backfill_department_timelines(db)
+    finally:
+        db.close()
+    print(f"Rebuilt department timelines for {processed} shoutout(s)")
+
+
+if __name__ == "__main__":
+    main()
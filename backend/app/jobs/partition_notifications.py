@@ -0,0 +1,31 @@
+"""Convert the notifications table to monthly partitions (PostgreSQL only).
+
+Run once, during a quiet period, with ``python -m app.jobs.partition_notifications``;
+the table is locked while every row is copied. Afterwards
+``app.jobs.purge_notifications`` maintains the partitions.
+"""
+import asyncio
+import app.models  # noqa: F401  (register every mapper before querying)
+from app.database import AsyncSessionLocal, async_engine
+from app.utils.notification_partitions import is_partitioned, partition_notifications
+
+
+async def _partition():
+    try:
+        async with AsyncSessionLocal() as db:
+            if db.get_bind().dialect.name != "postgresql":
+                return "Partitioning needs PostgreSQL; nothing done"
+            if await is_partitioned(db):
+                return "notifications is already partitioned"
+            copied = await partition_notifications(db)
+            return f"Partitioned notifications by month ({copied} row(s) copied)"
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    print(asyncio.run(_partition()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Enforce the notification retention policy.
+
+Deletes read notifications older than NOTIFICATION_READ_RETENTION_DAYS and
+all notifications older than NOTIFICATION_RETENTION_DAYS in small batches.
+On a partitioned table (see ``app.jobs.partition_notifications``) it also
+creates upcoming monthly partitions and drops expired ones whole. Run daily
+(e.g. from cron) with ``python -m app.jobs.purge_notifications``.
+"""
+import asyncio
+import app.models  # noqa: F401  (register every mapper before querying)
+from app.database import AsyncSessionLocal, async_engine
+from app.utils.notification_partitions import drop_expired_partitions, ensure_partitions, is_partitioned
+from app.utils.notifications import purge_expired_notifications
+
+
+async def _purge():
+    try:
+        async with AsyncSessionLocal() as db:
+            created = dropped = 0
+            if await is_partitioned(db):
+                created = await ensure_partitions(db)
+                dropped = await drop_expired_partitions(db)
+            return created, dropped, await purge_expired_notifications(db)
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    created, dropped, purged = asyncio.run(_purge())
+    print(f"Created {created} partition(s), dropped {dropped} expired partition(s), purged {purged} notification(s)")
+
+
+if __name__ == "__main__":
+    main()
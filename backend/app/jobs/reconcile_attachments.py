@@ -0,0 +1,25 @@
+"""Fix attachment blob reference counts and remove unreferenced files.
+
+Run periodically (e.g. from cron) with ``python -m app.jobs.reconcile_attachments``.
+"""
+import asyncio
+import app.models  # noqa: F401  (register every mapper before querying)
+from app.database import AsyncSessionLocal, async_engine
+from app.utils.attachments import reconcile_attachment_blobs
+
+
+async def _reconcile():
+    try:
+        async with AsyncSessionLocal() as db:
+            return await reconcile_attachment_blobs(db)
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    recounted, purged, swept = asyncio.run(_reconcile())
+    print(f"Recounted {recounted} blob(s), purged {purged} unreferenced blob(s), swept {swept} orphaned file(s)")
+
+
+if __name__ == "__main__":
+    main()
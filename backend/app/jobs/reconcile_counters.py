@@ -0,0 +1,25 @@
+"""Fix drift between denormalized counters and the rows they count.
+
+Covers the ShoutOut reaction/comment counters and the per-user unread
+notification counters. Run periodically (e.g. from cron) with
+``python -m app.jobs.reconcile_counters``.
+"""
+import app.models  # noqa: F401  (register every mapper before querying)
+from app.database import SessionLocal
+from app.utils.counters import reconcile_shoutout_counters
+from app.utils.notifications import reconcile_unread_counts
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        fixed = reconcile_shoutout_counters(db)
+        fixed_users = reconcile_unread_counts(db)
+    finally:
+        db.close()
+    print(f"Reconciled counters on {fixed} shoutout(s)")
+    print(f"Reconciled unread notification counters for {fixed_users} user(s)")
+
+
+if __name__ == "__main__":
+    main()
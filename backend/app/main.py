@@ -1,13 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 import os
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
-from app.routes import auth, users, shoutouts, comments, reactions, admin, notifications
+from app.database import async_engine, engine, Base, warm_pool
+from app.routes import auth, users, shoutouts, comments, reactions, admin, notifications, search
+from app.utils.schema import sync_schema
+from app.utils.search import ensure_search_index
+from app.utils.typeahead import ensure_typeahead_index
+from app.utils.static import UploadsStaticFiles
+from app.utils.broker import notification_broker
 
 Base.metadata.create_all(bind=engine)
+sync_schema(engine, Base.metadata)
+ensure_search_index(engine)
+ensure_typeahead_index(engine)
 
-app = FastAPI(title="Employee Recognition Platform")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect the request pool before traffic arrives
+    await warm_pool()
+    await notification_broker.start()
+    yield
+    await notification_broker.stop()
+    await async_engine.dispose()
+
+
+app = FastAPI(title="Employee Recognition Platform", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
@@ -24,11 +44,12 @@ app.include_router(comments.router)
 app.include_router(reactions.router)
 app.include_router(admin.router)
 app.include_router(notifications.router)
+app.include_router(search.router)
 
 # Static file serving for uploaded attachments
 uploads_dir = os.path.join(os.getcwd(), 'uploads')
 os.makedirs(uploads_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+app.mount("/uploads", UploadsStaticFiles(directory=uploads_dir), name="uploads")
 
 @app.get("/")
 async def root():
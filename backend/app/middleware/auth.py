@@ -1,52 +1,71 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.user import User
+from app.utils.principals import Principal, resolve_principal, resolve_principal_by_email
 from app.utils.security import decode_token
 
 security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
     token = credentials.credentials
     payload = decode_token(token)
-    
+
     if payload is None or payload.get("type") != "access":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    email: str = payload.get("sub")
-    if email is None:
+
+    subject: str = payload.get("sub")
+    if subject is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+
+    # Served from the principal cache when warm, without touching the database
+    if subject.isdigit():
+        principal = await resolve_principal(db, int(subject))
+    else:
+        # Tokens issued before the subject became the user id
+        principal = await resolve_principal_by_email(db, subject)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    
-    return user
+
+    return principal
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def require_admin(
-    current_user: User = Depends(get_current_active_user)
+async def get_current_user_record(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ) -> User:
+    """The current user's row in the request session, for handlers that modify it."""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
+
+async def require_admin(
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     # Accept either role flag or legacy is_admin boolean
     if current_user.role != "admin" and not getattr(current_user, "is_admin", False):
         raise HTTPException(
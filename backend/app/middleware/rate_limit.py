@@ -0,0 +1,193 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.database import async_engine
+from app.middleware.auth import get_current_active_user
+from app.models.rate_limit_bucket import RateLimitBucket
+from app.utils.principals import Principal
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
+RATE_LIMIT_ENABLED = _env_flag("RATE_LIMIT_ENABLED", "true")
+# "memory" keeps buckets per worker process; "database" shares them between
+# workers through the rate_limit_buckets table
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory").strip().lower()
+# Behind a reverse proxy, limit by the address it appends to X-Forwarded-For
+RATE_LIMIT_TRUST_PROXY = _env_flag("RATE_LIMIT_TRUST_PROXY", "false")
+# Buckets kept by the memory store before the least recently used is dropped
+RATE_LIMIT_MEMORY_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_KEYS", "100000"))
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Bucket of ``capacity`` requests, refilled at ``capacity`` per ``per_seconds``."""
+
+    capacity: int
+    per_seconds: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+def _limit(name: str, default: str) -> Optional[Limit]:
+    # RATE_LIMIT_<NAME>="<requests>/<seconds>"; "0" or "off" disables the limit
+    value = os.getenv(f"RATE_LIMIT_{name.upper()}", default).strip().lower()
+    if value in {"", "0", "off"}:
+        return None
+    count, _, seconds = value.partition("/")
+    return Limit(capacity=int(count), per_seconds=float(seconds or 1))
+
+
+# Per-IP limits are loose because a whole office can share one address;
+# per-account limits are what stop guessing against a single user.
+RATE_LIMITS: Dict[str, Optional[Limit]] = {
+    name: _limit(name, default)
+    for name, default in {
+        "login_ip": "60/60",
+        "login_account": "10/300",
+        "register_ip": "20/3600",
+        "forgot_password_ip": "10/600",
+        "forgot_password_account": "3/3600",
+        "shoutout_user": "30/60",
+        "comment_user": "60/60",
+        "reaction_user": "120/60",
+    }.items()
+}
+
+
+class RateLimitStore:
+    """Where bucket state lives. Subclass to share buckets through another backend."""
+
+    async def take(self, key: str, limit: Limit, now: float) -> float:
+        """Take one token from ``key``'s bucket.
+
+        Returns 0 when the request may proceed, otherwise the seconds until
+        a token is available. A denied request leaves the bucket unchanged.
+        """
+        raise NotImplementedError
+
+
+class MemoryStore(RateLimitStore):
+    """Buckets in this worker process; each worker enforces its own copy of every limit."""
+
+    def __init__(self, max_keys: int):
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_rate)
+        if tokens < 1:
+            return (1 - tokens) / limit.refill_rate
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        # A dropped bucket starts over full, the same as one idle for its window
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+
+class DatabaseStore(RateLimitStore):
+    """Buckets in the rate_limit_buckets table, shared by every worker.
+
+    Each check is one atomic upsert, so concurrent workers cannot both
+    spend the last token; a denied check also reads the bucket for
+    Retry-After. Buckets idle for longer than the longest window
+    are full again and are deleted every ``purge_every`` checks.
+    """
+
+    def __init__(self, purge_every: int = 1000):
+        self._purge_every = purge_every
+        self._checks = 0
+
+    async def take(self, key: str, limit: Limit, now: float) -> float:
+        table = RateLimitBucket.__table__
+        dialect = postgresql if async_engine.dialect.name == "postgresql" else sqlite
+        refilled = table.c.tokens + (now - table.c.updated_at) * limit.refill_rate
+        refilled = case((refilled > limit.capacity, float(limit.capacity)), else_=refilled)
+        # A bucket without a token is not updated, so no row comes back
+        statement = (
+            dialect.insert(table)
+            .values(key=key, tokens=limit.capacity - 1, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tokens": refilled - 1, "updated_at": now},
+                where=refilled >= 1,
+            )
+            .returning(table.c.key)
+        )
+        async with async_engine.begin() as conn:
+            allowed = (await conn.execute(statement)).first() is not None
+            if not allowed:
+                tokens, updated_at = (await conn.execute(
+                    select(table.c.tokens, table.c.updated_at).where(table.c.key == key)
+                )).one()
+            self._checks += 1
+            if self._checks % self._purge_every == 0:
+                await conn.execute(delete(table).where(table.c.updated_at < now - _longest_window()))
+        if allowed:
+            return 0.0
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_rate)
+        return (1 - tokens) / limit.refill_rate
+
+
+def _longest_window() -> float:
+    return max((limit.per_seconds for limit in RATE_LIMITS.values() if limit), default=0.0)
+
+
+def _create_store() -> RateLimitStore:
+    if RATE_LIMIT_STORE == "database":
+        return DatabaseStore()
+    if RATE_LIMIT_STORE == "memory":
+        return MemoryStore(RATE_LIMIT_MEMORY_KEYS)
+    raise RuntimeError(f"Unknown RATE_LIMIT_STORE {RATE_LIMIT_STORE!r}")
+
+
+rate_limit_store = _create_store()
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # Earlier entries are supplied by the client and can be forged
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(name: str, identity: str) -> None:
+    """Spend a token from the ``name`` bucket of ``identity``; 429 with Retry-After when empty."""
+    limit = RATE_LIMITS[name]
+    if not RATE_LIMIT_ENABLED or limit is None:
+        return
+    wait = await rate_limit_store.take(f"{name}:{identity}", limit, time.time())
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+def limit_by_ip(name: str):
+    """Route dependency applying the ``name`` limit to the client address."""
+    async def dependency(request: Request) -> None:
+        await enforce_rate_limit(name, client_ip(request))
+    return dependency
+
+
+def limit_by_user(name: str):
+    """Route dependency applying the ``name`` limit to the authenticated user."""
+    async def dependency(current_user: Principal = Depends(get_current_active_user)) -> None:
+        await enforce_rate_limit(name, str(current_user.id))
+    return dependency
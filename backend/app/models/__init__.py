@@ -1,5 +1,6 @@
 from app.models.user import User
-from app.models.shoutout import ShoutOut, ShoutOutRecipient
+from app.models.shoutout import ShoutOut, ShoutOutRecipient, ShoutOutAttachment
+from app.models.attachment_blob import AttachmentBlob
 from app.models.comment import Comment
 from app.models.reaction import Reaction
 from app.models.report import Report
@@ -7,3 +8,9 @@ from app.models.admin_log import AdminLog
 from app.models.email_verification import EmailVerification
 from app.models.password_reset import PasswordReset
 from app.models.department_change import DepartmentChangeRequest
+from app.models.comment_report import CommentReport
+from app.models.company_approval import CompanyApprovalRequest
+from app.models.notification import Notification
+from app.models.notification_unread_count import NotificationUnreadCount
+from app.models.department_timeline import DepartmentTimeline
+from app.models.rate_limit_bucket import RateLimitBucket
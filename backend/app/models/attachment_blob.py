@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AttachmentBlob(Base):
+    """One stored file per distinct attachment content, keyed by its SHA-256.
+
+    ``ref_count`` is the number of ShoutOutAttachment rows pointing at the
+    blob; the row and its file are removed when it drops to zero (see
+    app.utils.attachments).
+    """
+    __tablename__ = "attachment_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)  # relative to the uploads directory
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
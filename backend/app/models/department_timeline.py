@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+
+class DepartmentTimeline(Base):
+    """Materialized department feed: one row per department a shoutout is visible to.
+
+    A shoutout belongs to the timeline of every department one of its
+    recipients is in. Rows are written with the shoutout and rebuilt when a
+    recipient changes department (see app.utils.timelines).
+    """
+    __tablename__ = "department_timelines"
+    __table_args__ = (
+        Index("ix_department_timelines_feed", "department", "created_at", "shoutout_id"),
+    )
+
+    department = Column(String, primary_key=True)
+    shoutout_id = Column(Integer, ForeignKey("shoutouts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    shoutout = relationship("ShoutOut", back_populates="timeline_entries")
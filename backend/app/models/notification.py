@@ -1,14 +1,25 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 
+def current_month():
+    return datetime.utcnow().date().replace(day=1)
+
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # At most one unread row per coalescing key and month; reading a row
+        # clears its key. The month keeps the index valid on a table
+        # partitioned by created_month (see app.utils.notification_partitions).
+        Index("ux_notifications_coalesce", "user_id", "coalesce_key", "created_month", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     actor_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     event_type = Column(String(64), nullable=False)
     title = Column(String(255), nullable=False)
@@ -19,6 +30,43 @@ class Notification(Base):
     is_read = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     read_at = Column(DateTime(timezone=True), nullable=True)
+    # Coalesced notifications (see app.utils.notifications): actor_id is the
+    # latest actor, previous_actor_id the one before, actor_count the distinct
+    # people merged into the row (their ids in actor_ids, as ",3,7,") and
+    # event_count the events. updated_at is when the
+    # latest event was merged in (null until then); created_at never moves,
+    # so the row keeps its place in keyset pages.
+    coalesce_key = Column(String(160), nullable=True)
+    previous_actor_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    actor_ids = Column(Text, nullable=True)
+    actor_count = Column(Integer, default=1, server_default="1", nullable=False)
+    event_count = Column(Integer, default=1, server_default="1", nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    # First day of the (UTC) month the row was created in; never updated, so
+    # it can serve as the partition key. Null on rows from earlier releases.
+    created_month = Column(Date, default=current_month, nullable=True)
 
     user = relationship("User", foreign_keys=[user_id], back_populates="notifications")
     actor = relationship("User", foreign_keys=[actor_id])
+    previous_actor = relationship("User", foreign_keys=[previous_actor_id])
+
+
+# Keyset pagination of a user's history walks (created_at, id) in descending
+# order; unread-only pages, mark-all-read and the unread recount use the
+# partial index. Streams find recently coalesced rows through the last one.
+Index(
+    "ix_notifications_user_created_at",
+    Notification.user_id, Notification.created_at.desc(), Notification.id.desc(),
+)
+Index(
+    "ix_notifications_user_unread",
+    Notification.user_id, Notification.created_at.desc(), Notification.id.desc(),
+    postgresql_where=Notification.is_read.is_(False),
+    sqlite_where=Notification.is_read.is_(False),
+)
+Index(
+    "ix_notifications_user_updated_at",
+    Notification.user_id, Notification.updated_at.desc(),
+    postgresql_where=Notification.updated_at.isnot(None),
+    sqlite_where=Notification.updated_at.isnot(None),
+)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from app.database import Base
+
+
+class NotificationUnreadCount(Base):
+    """Unread notifications per user and event type, kept alongside notification writes.
+
+    Maintained by app.utils.notifications; ``python -m app.jobs.reconcile_counters``
+    recomputes it from the notifications table.
+    """
+    __tablename__ = "notification_unread_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    event_type = Column(String(64), primary_key=True)
+    unread = Column(Integer, default=0, server_default="0", nullable=False)
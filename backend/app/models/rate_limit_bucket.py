@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Float, String
+from app.database import Base
+
+
+class RateLimitBucket(Base):
+    """Token bucket state shared by API workers (RATE_LIMIT_STORE=database).
+
+    ``tokens`` is the balance as of ``updated_at`` (epoch seconds); refills
+    since then are applied when the bucket is next read.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)
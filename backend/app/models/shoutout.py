@@ -1,16 +1,26 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class ShoutOut(Base):
     __tablename__ = "shoutouts"
+    __table_args__ = (
+        # Keyset pagination of the feed walks (created_at, id) in descending order
+        Index("ix_shoutouts_created_at_id", "created_at", "id"),
+        Index("ix_shoutouts_sender_created_at", "sender_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     message = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Denormalized counters maintained alongside reaction/comment writes (see app.utils.counters)
+    like_count = Column(Integer, default=0, server_default="0", nullable=False)
+    clap_count = Column(Integer, default=0, server_default="0", nullable=False)
+    star_count = Column(Integer, default=0, server_default="0", nullable=False)
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)
     # attachments via relationship
     attachments = relationship("ShoutOutAttachment", back_populates="shoutout", cascade="all, delete-orphan")
 
@@ -21,9 +31,14 @@ class ShoutOut(Base):
     comments = relationship("Comment", back_populates="shoutout", cascade="all, delete-orphan")
     reactions = relationship("Reaction", back_populates="shoutout", cascade="all, delete-orphan")
     reports = relationship("Report", back_populates="shoutout", cascade="all, delete-orphan")
+    timeline_entries = relationship("DepartmentTimeline", back_populates="shoutout", cascade="all, delete-orphan")
 
 class ShoutOutRecipient(Base):
     __tablename__ = "shoutout_recipients"
+    __table_args__ = (
+        Index("ix_shoutout_recipients_shoutout_recipient", "shoutout_id", "recipient_id"),
+        Index("ix_shoutout_recipients_recipient_shoutout", "recipient_id", "shoutout_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     shoutout_id = Column(Integer, ForeignKey("shoutouts.id", ondelete="CASCADE"), nullable=False)
@@ -42,6 +57,9 @@ class ShoutOutAttachment(Base):
     name = Column(String, nullable=True)
     type = Column(String, nullable=True)
     size = Column(Integer, nullable=True)
+    # Content-addressed storage; NULL for files uploaded before blobs existed
+    blob_sha256 = Column(String(64), ForeignKey("attachment_blobs.sha256"), nullable=True, index=True)
+    variants = Column(Text, nullable=True)  # JSON from app.utils.images.generate_variants
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     shoutout = relationship("ShoutOut", back_populates="attachments")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -20,6 +20,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     role = Column(String, default="employee", nullable=False)  # ✅ make not nullable + default
     avatar_url = Column(String, nullable=True)
+    avatar_variants = Column(Text, nullable=True)  # JSON from app.utils.images.generate_variants
 
     # 👇 Make sure this matches ShoutOut.sender's back_populates
     shoutouts_sent = relationship("ShoutOut", back_populates="sender", foreign_keys=[ShoutOut.sender_id])
@@ -1 +1 @@
-from app.routes import auth, users, shoutouts, comments, reactions, admin, notifications
+from app.routes import auth, users, shoutouts, comments, reactions, admin, notifications, search
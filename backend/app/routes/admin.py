@@ -1,9 +1,10 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, pool_gauges
 from app.models.user import User
 from app.models.shoutout import ShoutOut, ShoutOutRecipient
 from app.models.comment import Comment
@@ -14,55 +15,85 @@ from app.schemas.report import Report as ReportSchema, ReportCreate, ReportResol
 from app.schemas.comment_report import CommentReport as CommentReportSchema
 from app.schemas.user import User as UserSchema
 from app.middleware.auth import get_current_active_user, require_admin
+from app.utils.principals import Principal
 from app.models.department_change import DepartmentChangeRequest
 from app.schemas.department_change import (
     DepartmentChangeRequest as DepartmentChangeSchema,
     DepartmentChangeDecision,
 )
-from app.utils.notifications import create_notification
+from app.utils.attachments import release_attachments, remove_blob_files
+from app.utils.notifications import create_notifications_bulk
+from app.utils.timelines import rebuild_timelines_for_recipient
+from app.utils.http_cache import make_etag, not_modified
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+
+async def _recognition_watermark(db: AsyncSession):
+    """Cheap summary that changes whenever the leaderboard/analytics aggregates can."""
+    shoutouts = (await db.execute(select(func.count(ShoutOut.id), func.max(ShoutOut.id)))).one()
+    recipients = (await db.execute(select(func.count(ShoutOutRecipient.id), func.max(ShoutOutRecipient.id)))).one()
+    users = (await db.execute(select(func.count(User.id), func.max(User.updated_at)))).one()
+    return tuple(shoutouts), tuple(recipients), tuple(users)
+
+
+def _department_request_options():
+    return (
+        selectinload(DepartmentChangeRequest.user),
+        selectinload(DepartmentChangeRequest.admin),
+    )
+
+
 @router.get("/users", response_model=List[UserSchema])
 async def get_all_users(
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    users = db.query(User).all()
+    users = (await db.scalars(select(User))).all()
     return users
 
+@router.get("/db-pool")
+async def get_db_pool(
+    admin: Principal = Depends(require_admin),
+):
+    """Request pool gauges for the worker that served this call."""
+    return pool_gauges()
+
 @router.get("/analytics")
 async def get_analytics(
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    total_users = db.query(func.count(User.id)).scalar()
-    total_shoutouts = db.query(func.count(ShoutOut.id)).scalar()
+    cached = not_modified(request, response, make_etag("analytics", await _recognition_watermark(db)))
+    if cached:
+        return cached
+
+    total_users = await db.scalar(select(func.count(User.id)))
+    total_shoutouts = await db.scalar(select(func.count(ShoutOut.id)))
     
-    top_contributors = (
-        db.query(User.id, User.name, User.department, func.count(ShoutOut.id).label("count"))
+    top_contributors = (await db.execute(
+        select(User.id, User.name, User.department, func.count(ShoutOut.id).label("count"))
         .join(ShoutOut, ShoutOut.sender_id == User.id)
         .group_by(User.id)
         .order_by(func.count(ShoutOut.id).desc())
         .limit(10)
-        .all()
-    )
+    )).all()
     
-    most_tagged = (
-        db.query(User.id, User.name, User.department, func.count(ShoutOutRecipient.id).label("count"))
+    most_tagged = (await db.execute(
+        select(User.id, User.name, User.department, func.count(ShoutOutRecipient.id).label("count"))
         .join(ShoutOutRecipient, ShoutOutRecipient.recipient_id == User.id)
         .group_by(User.id)
         .order_by(func.count(ShoutOutRecipient.id).desc())
         .limit(10)
-        .all()
-    )
+    )).all()
     
-    department_stats = (
-        db.query(User.department, func.count(ShoutOut.id).label("count"))
+    department_stats = (await db.execute(
+        select(User.department, func.count(ShoutOut.id).label("count"))
         .join(ShoutOut, ShoutOut.sender_id == User.id)
         .group_by(User.department)
-        .all()
-    )
+    )).all()
     
     return {
         "total_users": total_users,
@@ -85,10 +116,10 @@ async def get_analytics(
 async def report_shoutout(
     shoutout_id: int,
     report_data: ReportCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.get(ShoutOut, shoutout_id)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
 
@@ -103,53 +134,55 @@ async def report_shoutout(
     )
     
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await db.refresh(new_report)
     
     return new_report
 
 @router.get("/reports", response_model=List[ReportSchema])
 async def get_reports(
     status: str = None,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(Report)
+    query = select(Report)
     
     if status:
-        query = query.filter(Report.status == status)
+        query = query.where(Report.status == status)
     
-    reports = query.order_by(Report.created_at.desc()).all()
+    reports = (await db.scalars(query.order_by(Report.created_at.desc()))).all()
     return reports
 
 
 @router.get("/comment-reports", response_model=List[CommentReportSchema])
 async def get_comment_reports(
     status: str = None,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(CommentReportModel).options(
-        joinedload(CommentReportModel.comment).joinedload(Comment.user),
-        joinedload(CommentReportModel.reporter),
+    query = select(CommentReportModel).options(
+        selectinload(CommentReportModel.comment).options(
+            selectinload(Comment.user), selectinload(Comment.mentions)
+        ),
+        selectinload(CommentReportModel.reporter),
     )
 
     if status:
-        query = query.filter(CommentReportModel.status == status)
+        query = query.where(CommentReportModel.status == status)
 
-    return query.order_by(CommentReportModel.created_at.desc()).all()
+    return (await db.scalars(query.order_by(CommentReportModel.created_at.desc()))).all()
 
 @router.post("/reports/{report_id}/resolve")
 async def resolve_report(
     report_id: int,
     payload: ReportResolve,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Resolve a report by approving (keeping) or rejecting (dismissing) it.
     Body: {"action": "approved" | "rejected"}
     """
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -167,7 +200,7 @@ async def resolve_report(
     )
     db.add(admin_log)
 
-    db.commit()
+    await db.commit()
 
     return {"message": f"Report {action} successfully"}
 
@@ -176,10 +209,10 @@ async def resolve_report(
 async def resolve_comment_report(
     report_id: int,
     payload: ReportResolve,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    report = db.query(CommentReportModel).filter(CommentReportModel.id == report_id).first()
+    report = await db.get(CommentReportModel, report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Comment report not found")
 
@@ -197,7 +230,7 @@ async def resolve_comment_report(
     )
     db.add(admin_log)
 
-    db.commit()
+    await db.commit()
 
     return {"message": f"Comment report {action} successfully"}
 
@@ -205,35 +238,30 @@ async def resolve_comment_report(
 @router.get("/department-change-requests", response_model=List[DepartmentChangeSchema])
 async def list_department_change_requests(
     status: Optional[str] = None,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(DepartmentChangeRequest).options(
-        joinedload(DepartmentChangeRequest.user),
-        joinedload(DepartmentChangeRequest.admin),
+    query = select(DepartmentChangeRequest).options(
+        *_department_request_options()
     ).order_by(DepartmentChangeRequest.created_at.desc())
 
     if status:
-        query = query.filter(DepartmentChangeRequest.status == status)
+        query = query.where(DepartmentChangeRequest.status == status)
 
-    return query.all()
+    return (await db.scalars(query)).all()
 
 
 @router.post("/department-change-requests/{request_id}/decision", response_model=DepartmentChangeSchema)
 async def decide_department_change_request(
     request_id: int,
     payload: DepartmentChangeDecision,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    request = (
-        db.query(DepartmentChangeRequest)
-        .options(
-            joinedload(DepartmentChangeRequest.user),
-            joinedload(DepartmentChangeRequest.admin),
-        )
-        .filter(DepartmentChangeRequest.id == request_id)
-        .first()
+    request = await db.scalar(
+        select(DepartmentChangeRequest)
+        .options(*_department_request_options())
+        .where(DepartmentChangeRequest.id == request_id)
     )
     if not request:
         raise HTTPException(status_code=404, detail="Department change request not found")
@@ -247,16 +275,18 @@ async def decide_department_change_request(
 
     request.status = action
     request.admin_id = admin.id
-    request.admin = admin
     request.resolved_at = datetime.now(timezone.utc)
 
     admin_action = f"Department change request #{request_id} {action}"
 
     if action == "approved":
-        user = db.query(User).filter(User.id == request.user_id).first()
+        user = await db.get(User, request.user_id)
         if user:
             user.department = request.requested_department
             request.user = user
+            await db.flush()
+            # Shoutouts this user received now also belong to their new department's feed
+            await db.run_sync(rebuild_timelines_for_recipient, user.id)
         admin_action += f"; department set to {request.requested_department}"
 
     db.add(AdminLog(
@@ -273,9 +303,9 @@ async def decide_department_change_request(
         if action == "approved"
         else "Your department change request was rejected by the administrator."
     )
-    create_notification(
+    await create_notifications_bulk(
         db,
-        user_id=request.user_id,
+        [request.user_id],
         actor_id=admin.id,
         event_type="department_change.decision",
         title=decision_title,
@@ -289,18 +319,23 @@ async def decide_department_change_request(
         },
     )
 
-    db.commit()
-    db.refresh(request)
+    await db.commit()
 
-    return request
+    # Reload for the server-side timestamps; the relationships come along
+    return await db.scalar(
+        select(DepartmentChangeRequest)
+        .options(*_department_request_options())
+        .where(DepartmentChangeRequest.id == request_id)
+        .execution_options(populate_existing=True)
+    )
 
 @router.delete("/shoutouts/{shoutout_id}")
 async def admin_delete_shoutout(
     shoutout_id: int,
-    admin: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    admin: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.get(ShoutOut, shoutout_id)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
     
@@ -312,33 +347,41 @@ async def admin_delete_shoutout(
     )
     db.add(admin_log)
     
-    db.delete(shoutout)
-    db.commit()
+    attachments = list(await shoutout.awaitable_attrs.attachments)
+    await db.delete(shoutout)
+    await db.flush()
+    released = await release_attachments(db, attachments)
+    await db.commit()
+    await remove_blob_files(released)
     
     return {"message": "Shoutout deleted successfully"}
 
 @router.get("/leaderboard")
 async def get_leaderboard(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    top_senders = (
-        db.query(User.id, User.name, User.department, func.count(ShoutOut.id).label("sent"))
+    cached = not_modified(request, response, make_etag("leaderboard", await _recognition_watermark(db)))
+    if cached:
+        return cached
+
+    top_senders = (await db.execute(
+        select(User.id, User.name, User.department, func.count(ShoutOut.id).label("sent"))
         .join(ShoutOut, ShoutOut.sender_id == User.id)
         .group_by(User.id)
         .order_by(func.count(ShoutOut.id).desc())
         .limit(10)
-        .all()
-    )
+    )).all()
     
-    top_receivers = (
-        db.query(User.id, User.name, User.department, func.count(ShoutOutRecipient.id).label("received"))
+    top_receivers = (await db.execute(
+        select(User.id, User.name, User.department, func.count(ShoutOutRecipient.id).label("received"))
         .join(ShoutOutRecipient, ShoutOutRecipient.recipient_id == User.id)
         .group_by(User.id)
         .order_by(func.count(ShoutOutRecipient.id).desc())
         .limit(10)
-        .all()
-    )
+    )).all()
     
     return {
         "top_senders": [
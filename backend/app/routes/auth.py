@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import (
@@ -13,12 +14,13 @@ from app.schemas.user import (
     ResetPasswordResponse,
 )
 from app.utils.security import (
-    verify_password,
-    get_password_hash,
     create_access_token,
     create_refresh_token,
     decode_token
 )
+from app.utils.passwords import check_password, hash_password
+from app.middleware.rate_limit import enforce_rate_limit, limit_by_ip
+from app.utils.principals import token_claims
 from app.models.email_verification import EmailVerification
 from app.models.password_reset import PasswordReset
 from app.models.company_approval import CompanyApprovalRequest
@@ -28,6 +30,7 @@ from app.utils.email import (
     send_company_approval_email,
     COMPANY_APPROVER_EMAIL,
 )
+from app.utils.timelines import rebuild_timelines
 from datetime import datetime, timedelta, timezone
 import secrets
 from fastapi.responses import HTMLResponse
@@ -36,8 +39,8 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 # ---------------- REGISTER ROUTE ---------------- #
-@router.post("/register", response_model=RegistrationResponse)
-async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+@router.post("/register", response_model=RegistrationResponse, dependencies=[Depends(limit_by_ip("register_ip"))])
+async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
     # ---- Basic field validation ----
     if not user_data.name or not user_data.name.strip():
         raise HTTPException(status_code=400, detail="User name cannot be empty")
@@ -49,7 +52,7 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
         raise HTTPException(status_code=400, detail="Department cannot be empty")
 
     # ---- Check if user already exists ----
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -64,7 +67,7 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
         user_data.role = "employee"  # default role if not provided
 
     # ---- Hash password ----
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
 
     # ---- Create and save new user (unverified/inactive) ----
     new_user = User(
@@ -80,8 +83,8 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # ---- Create email verification token ----
     token = secrets.token_urlsafe(32)
@@ -93,7 +96,7 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
         expires_at=expires_at,
     )
     db.add(verification)
-    db.commit()
+    await db.commit()
 
     # ---- Send verification email in background ----
     background_tasks.add_task(send_verification_email, new_user.email, new_user.name, token)
@@ -102,12 +105,13 @@ async def register(user_data: UserCreate, background_tasks: BackgroundTasks, db:
 
 
 # ---------------- LOGIN ROUTE ---------------- #
-@router.post("/login", response_model=Token)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_by_ip("login_ip"))])
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    await enforce_rate_limit("login_account", login_data.email.lower())
+    user = await db.scalar(select(User).where(User.email == login_data.email))
 
     # ---- Verify user credentials ----
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await check_password(login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -133,8 +137,8 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         )
 
     # ---- Generate tokens ----
-    access_token = create_access_token(data={"sub": user.email})
-    refresh_token = create_refresh_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
+    refresh_token = create_refresh_token(data={"sub": str(user.id)})
 
     return {
         "access_token": access_token,
@@ -145,7 +149,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 # ---------------- REFRESH TOKEN ROUTE ---------------- #
 @router.post("/refresh", response_model=Token)
-async def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
+async def refresh(refresh_data: RefreshRequest, db: AsyncSession = Depends(get_db)):
     payload = decode_token(refresh_data.refresh_token)
 
     if payload is None or payload.get("type") != "refresh":
@@ -154,8 +158,12 @@ async def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
             detail="Invalid refresh token"
         )
 
-    email = payload.get("sub")
-    user = db.query(User).filter(User.email == email).first()
+    subject = payload.get("sub") or ""
+    if subject.isdigit():
+        user = await db.get(User, int(subject))
+    else:
+        # Refresh tokens issued before the subject became the user id
+        user = await db.scalar(select(User).where(User.email == subject))
 
     if not user:
         raise HTTPException(
@@ -164,8 +172,8 @@ async def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
         )
 
     # ---- Generate new tokens ----
-    access_token = create_access_token(data={"sub": user.email})
-    new_refresh_token = create_refresh_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
+    new_refresh_token = create_refresh_token(data={"sub": str(user.id)})
 
     return {
         "access_token": access_token,
@@ -176,8 +184,8 @@ async def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
 
 # ---------------- VERIFY EMAIL VIA TOKEN ---------------- #
 @router.get("/verify-email")
-async def verify_email(token: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    verification = db.query(EmailVerification).filter(EmailVerification.token == token).first()
+async def verify_email(token: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    verification = await db.scalar(select(EmailVerification).where(EmailVerification.token == token))
     if not verification:
         raise HTTPException(status_code=400, detail="Invalid verification token")
 
@@ -188,7 +196,7 @@ async def verify_email(token: str, background_tasks: BackgroundTasks, db: Sessio
     if verification.expires_at < now:
         raise HTTPException(status_code=400, detail="Verification token has expired")
 
-    user = db.query(User).filter(User.id == verification.user_id).first()
+    user = await db.get(User, verification.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -203,10 +211,9 @@ async def verify_email(token: str, background_tasks: BackgroundTasks, db: Sessio
         approval_token = secrets.token_urlsafe(32)
         expires_at = now + timedelta(days=7)
 
-        approval_request = (
-            db.query(CompanyApprovalRequest)
-            .filter(CompanyApprovalRequest.user_id == user.id, CompanyApprovalRequest.status == "pending")
-            .first()
+        approval_request = await db.scalar(
+            select(CompanyApprovalRequest)
+            .where(CompanyApprovalRequest.user_id == user.id, CompanyApprovalRequest.status == "pending")
         )
 
         if approval_request:
@@ -226,7 +233,7 @@ async def verify_email(token: str, background_tasks: BackgroundTasks, db: Sessio
 
     verification.consumed = True
     verification.consumed_at = now
-    db.commit()
+    await db.commit()
 
     if approval_token:
         background_tasks.add_task(
@@ -242,12 +249,12 @@ async def verify_email(token: str, background_tasks: BackgroundTasks, db: Sessio
 
 
 @router.get("/company-approval", response_class=HTMLResponse)
-async def handle_company_approval(token: str, action: str, request: Request, db: Session = Depends(get_db)):
+async def handle_company_approval(token: str, action: str, request: Request, db: AsyncSession = Depends(get_db)):
     action_normalized = (action or "").strip().lower()
     if action_normalized not in {"approve", "reject"}:
         return HTMLResponse("<h2>Invalid action</h2><p>Please use the Approve or Reject links provided in the email.</p>", status_code=400)
 
-    approval_request = db.query(CompanyApprovalRequest).filter(CompanyApprovalRequest.token == token).first()
+    approval_request = await db.scalar(select(CompanyApprovalRequest).where(CompanyApprovalRequest.token == token))
     if not approval_request:
         return HTMLResponse("<h2>Invalid or expired link</h2><p>The approval request could not be found. It may have already been processed.</p>", status_code=404)
 
@@ -260,14 +267,14 @@ async def handle_company_approval(token: str, action: str, request: Request, db:
     if approval_request.expires_at < now:
         approval_request.status = "expired"
         approval_request.resolved_at = now
-        db.commit()
+        await db.commit()
         return HTMLResponse("<h2>Link Expired</h2><p>The approval link has expired. Ask the employee to verify their email again.</p>", status_code=400)
 
-    user = db.query(User).filter(User.id == approval_request.user_id).first()
+    user = await db.get(User, approval_request.user_id)
     if not user:
         approval_request.status = "rejected"
         approval_request.resolved_at = now
-        db.commit()
+        await db.commit()
         return HTMLResponse("<h2>User Not Found</h2><p>The user associated with this request no longer exists.</p>", status_code=404)
 
     approval_request.action_ip = request.client.host if request.client else None
@@ -279,21 +286,25 @@ async def handle_company_approval(token: str, action: str, request: Request, db:
         user.is_active = user.email_verified and user.company_verified
         approval_request.status = "approved"
         approval_request.resolved_at = now
-        db.commit()
+        await db.commit()
         return HTMLResponse("<h2>User Approved</h2><p>The employee can now log in.</p>", status_code=200)
 
     # Reject flow: remove the user record and mark the request
     approval_request.status = "rejected"
     approval_request.resolved_at = now
-    db.delete(user)
-    db.commit()
+    received_ids = [r.shoutout_id for r in await user.awaitable_attrs.shoutouts_received]
+    await db.delete(user)
+    await db.flush()
+    await db.run_sync(rebuild_timelines, received_ids)
+    await db.commit()
     return HTMLResponse("<h2>User Rejected</h2><p>The user has been removed from the system.</p>", status_code=200)
 
 
 # ---------------- FORGOT PASSWORD ---------------- #
-@router.post("/forgot-password")
-async def forgot_password(req: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email.lower()).first()
+@router.post("/forgot-password", dependencies=[Depends(limit_by_ip("forgot_password_ip"))])
+async def forgot_password(req: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    await enforce_rate_limit("forgot_password_account", req.email.lower())
+    user = await db.scalar(select(User).where(User.email == req.email.lower()))
     # Always return generic message to prevent user enumeration
     generic_response = {"message": "If that email exists, a reset link has been sent."}
     if not user:
@@ -305,7 +316,7 @@ async def forgot_password(req: ForgotPasswordRequest, background_tasks: Backgrou
 
     reset = PasswordReset(user_id=user.id, token=token, expires_at=expires_at)
     db.add(reset)
-    db.commit()
+    await db.commit()
 
     background_tasks.add_task(send_password_reset_email, user.email, user.name, token)
     return generic_response
@@ -313,8 +324,8 @@ async def forgot_password(req: ForgotPasswordRequest, background_tasks: Backgrou
 
 # ---------------- RESET PASSWORD ---------------- #
 @router.post("/reset-password", response_model=ResetPasswordResponse)
-async def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db)):
-    reset = db.query(PasswordReset).filter(PasswordReset.token == payload.token).first()
+async def reset_password(payload: ResetPasswordRequest, db: AsyncSession = Depends(get_db)):
+    reset = await db.scalar(select(PasswordReset).where(PasswordReset.token == payload.token))
     if not reset:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     if reset.consumed:
@@ -323,14 +334,14 @@ async def reset_password(payload: ResetPasswordRequest, db: Session = Depends(ge
     if reset.expires_at < now:
         raise HTTPException(status_code=400, detail="Reset token has expired")
 
-    user = db.query(User).filter(User.id == reset.user_id).first()
+    user = await db.get(User, reset.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Update password
-    user.hashed_password = get_password_hash(payload.new_password)
+    user.hashed_password = await hash_password(payload.new_password)
     reset.consumed = True
     reset.consumed_at = now
-    db.commit()
+    await db.commit()
 
     return {"message": "Password has been reset successfully"}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.database import get_db
 from app.models.user import User
@@ -8,22 +9,42 @@ from app.models.shoutout import ShoutOut
 from app.schemas.comment import Comment as CommentSchema, CommentCreate, CommentUpdate
 from app.schemas.comment_report import CommentReport as CommentReportSchema, CommentReportCreate
 from app.middleware.auth import get_current_active_user
+from app.middleware.rate_limit import limit_by_user
+from app.utils.principals import Principal
 from app.models.comment_report import CommentReport as CommentReportModel
-from app.utils.notifications import create_notification
+from app.utils.notifications import create_notifications_bulk
+from app.utils.counters import bump_comment_count
 import re
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 
 
 router = APIRouter(prefix="/api/shoutouts", tags=["comments"])
 
-@router.post("/{shoutout_id}/comments", response_model=CommentSchema)
+
+def comment_load_options():
+    """Eager-load the relationships rendered by the Comment schema."""
+    return (selectinload(Comment.user), selectinload(Comment.mentions))
+
+
+async def load_comment(comment_id, db):
+    # populate_existing reloads relationships the request already changed
+    return await db.scalar(
+        select(Comment)
+        .options(*comment_load_options())
+        .where(Comment.id == comment_id)
+        .execution_options(populate_existing=True)
+    )
+
+@router.post("/{shoutout_id}/comments", response_model=CommentSchema, dependencies=[Depends(limit_by_user("comment_user"))])
 async def create_comment(
     shoutout_id: int,
     comment_data: CommentCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.scalar(
+        select(ShoutOut).options(selectinload(ShoutOut.recipients)).where(ShoutOut.id == shoutout_id)
+    )
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
 
@@ -39,7 +60,7 @@ async def create_comment(
     # Handle mentions
     mentioned_users = []
     if comment_data.mentions:
-        mentioned_users = db.query(User).filter(User.id.in_(comment_data.mentions)).all()
+        mentioned_users = (await db.scalars(select(User).where(User.id.in_(comment_data.mentions)))).all()
         new_comment.mentions.extend(mentioned_users)
     else:
         # Fallback: parse react-mentions style markup from content @[display](id)
@@ -48,105 +69,91 @@ async def create_comment(
         for m in mention_pattern.finditer(comment_data.content or ""):
             raw_ids.add(int(m.group(2)))
         if raw_ids:
-            mentioned_users = db.query(User).filter(User.id.in_(raw_ids)).all()
+            mentioned_users = (await db.scalars(select(User).where(User.id.in_(raw_ids)))).all()
             new_comment.mentions.extend(mentioned_users)
     
     db.add(new_comment)
-    db.flush()
+    await db.flush()
+    await bump_comment_count(db, shoutout_id, 1)
 
     preview = (comment_data.content or "").strip()
     if len(preview) > 160:
         preview = f"{preview[:157]}..."
 
+    payload = {
+        "shoutout_id": shoutout_id,
+        "comment_id": new_comment.id,
+        "redirect_url": "/feed",
+    }
+
     # Notify shoutout owner about new comment (excluding self comments)
     if shoutout.sender_id != current_user.id:
-        create_notification(
+        await create_notifications_bulk(
             db,
-            user_id=shoutout.sender_id,
+            [shoutout.sender_id],
             actor_id=current_user.id,
             event_type="comment.new",
             title=f"{current_user.name} commented on your shoutout",
             message=preview,
             reference_type="comment",
             reference_id=new_comment.id,
-            payload={
-                "shoutout_id": shoutout_id,
-                "comment_id": new_comment.id,
-                "redirect_url": "/feed",
-            },
+            payload=payload,
         )
 
     # Notify other recipients tagged on the shoutout
-    notified_recipient_ids = set()
-    for recipient in shoutout.recipients:
-        rid = recipient.recipient_id
-        if rid in (current_user.id, shoutout.sender_id):
-            continue
-        if rid in notified_recipient_ids:
-            continue
-        create_notification(
-            db,
-            user_id=rid,
-            actor_id=current_user.id,
-            event_type="comment.new",
-            title=f"New comment on a shoutout you're tagged in",
-            message=preview,
-            reference_type="comment",
-            reference_id=new_comment.id,
-            payload={
-                "shoutout_id": shoutout_id,
-                "comment_id": new_comment.id,
-                "redirect_url": "/feed",
-            },
-        )
-        notified_recipient_ids.add(rid)
+    recipient_ids = sorted({
+        recipient.recipient_id for recipient in shoutout.recipients
+        if recipient.recipient_id not in (current_user.id, shoutout.sender_id)
+    })
+    await create_notifications_bulk(
+        db,
+        recipient_ids,
+        actor_id=current_user.id,
+        event_type="comment.new",
+        title=f"New comment on a shoutout you're tagged in",
+        message=preview,
+        reference_type="comment",
+        reference_id=new_comment.id,
+        payload=payload,
+    )
 
     # Notify mentioned users explicitly
-    for mentioned in mentioned_users:
-        if mentioned.id == current_user.id:
-            continue
-        create_notification(
-            db,
-            user_id=mentioned.id,
-            actor_id=current_user.id,
-            event_type="comment.mention",
-            title=f"{current_user.name} mentioned you in a comment",
-            message=preview,
-            reference_type="comment",
-            reference_id=new_comment.id,
-            payload={
-                "shoutout_id": shoutout_id,
-                "comment_id": new_comment.id,
-                "redirect_url": "/feed",
-            },
-        )
+    await create_notifications_bulk(
+        db,
+        [mentioned.id for mentioned in mentioned_users if mentioned.id != current_user.id],
+        actor_id=current_user.id,
+        event_type="comment.mention",
+        title=f"{current_user.name} mentioned you in a comment",
+        message=preview,
+        reference_type="comment",
+        reference_id=new_comment.id,
+        payload=payload,
+    )
 
-    db.commit()
-    db.refresh(new_comment)
-    return new_comment
+    await db.commit()
+    return await load_comment(new_comment.id, db)
 
 @router.get("/{shoutout_id}/comments", response_model=List[CommentSchema])
 async def get_comments(
     shoutout_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    comments = (
-        db.query(Comment)
-        .options(joinedload(Comment.user), joinedload(Comment.mentions))
-        .filter(Comment.shoutout_id == shoutout_id)
+    comments = (await db.scalars(
+        select(Comment)
+        .options(*comment_load_options())
+        .where(Comment.shoutout_id == shoutout_id)
         .order_by(Comment.created_at.asc())
-        .all()
-    )
+    )).all()
     return comments
 
 @router.put("/comments/{comment_id}", response_model=CommentSchema)
 async def update_comment(
     comment_id: int,
     comment_update: CommentUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -157,17 +164,16 @@ async def update_comment(
         raise HTTPException(status_code=400, detail="Comment content cannot be empty")
     
     comment.content = comment_update.content
-    db.commit()
-    db.refresh(comment)
-    return comment
+    await db.commit()
+    return await load_comment(comment_id, db)
 
 @router.delete("/comments/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -175,8 +181,9 @@ async def delete_comment(
     if comment.user_id != current_user.id and not (current_user.role == "admin" or getattr(current_user, "is_admin", False)):
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
     
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await bump_comment_count(db, comment.shoutout_id, -1)
+    await db.commit()
     
     return {"message": "Comment deleted successfully"}
 
@@ -185,15 +192,10 @@ async def delete_comment(
 async def report_comment(
     comment_id: int,
     report_data: CommentReportCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    comment = (
-        db.query(Comment)
-        .options(joinedload(Comment.shoutout))
-        .filter(Comment.id == comment_id)
-        .first()
-    )
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
@@ -203,13 +205,12 @@ async def report_comment(
     if not report_data.reason or not report_data.reason.strip():
         raise HTTPException(status_code=400, detail="Report reason cannot be empty")
 
-    existing_report = (
-        db.query(CommentReportModel)
-        .filter(
+    existing_report = await db.scalar(
+        select(CommentReportModel)
+        .where(
             CommentReportModel.comment_id == comment_id,
             CommentReportModel.reported_by == current_user.id,
         )
-        .first()
     )
     if existing_report:
         raise HTTPException(status_code=400, detail="You have already reported this comment")
@@ -223,7 +224,13 @@ async def report_comment(
     )
 
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
 
-    return new_report
+    return await db.scalar(
+        select(CommentReportModel)
+        .options(
+            selectinload(CommentReportModel.comment).options(*comment_load_options()),
+            selectinload(CommentReportModel.reporter),
+        )
+        .where(CommentReportModel.id == new_report.id)
+    )
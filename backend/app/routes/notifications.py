@@ -1,21 +1,66 @@
+import asyncio
 import json
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select
 from app.database import get_db
 from app.middleware.auth import get_current_active_user
+from app.utils.principals import Principal
 from app.models.notification import Notification
-from app.models.user import User
 from app.schemas.notification import (
     Notification as NotificationSchema,
     NotificationListResponse,
     NotificationReadRequest,
 )
-from app.utils.notifications import mark_notification_read, mark_all_notifications_read
+from app.utils.notifications import (
+    coalesced_title,
+    delete_all_notifications,
+    mark_all_notifications_read,
+    mark_notifications_read,
+    unread_counts,
+)
+from app.utils.http_cache import make_etag, not_modified
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_before
+from app.utils.broker import notification_broker
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
+# Keep-alive comment interval on an idle stream, under common proxy read timeouts
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "15"))
+# Streams end after this long and the client reconnects with Last-Event-ID,
+# which re-checks its token and spreads connections across workers
+NOTIFICATION_STREAM_MAX_SECONDS = int(os.getenv("NOTIFICATION_STREAM_MAX_SECONDS", "900"))
+# Newest and most recently coalesced notifications a stream re-reads when
+# woken, sending those that are new or were coalesced since it last looked
+_STREAM_WINDOW = 20
+
+
+def _load_actors():
+    return selectinload(Notification.actor), selectinload(Notification.previous_actor)
+
+
+async def _stream_window(db: AsyncSession, user_id: int) -> List[Notification]:
+    """The newest notifications and the most recently coalesced ones, oldest activity first.
+
+    A coalesced row keeps its created_at, so it is found by updated_at
+    even when newer rows have pushed it out of the first window.
+    """
+    query = select(Notification).options(*_load_actors()).where(Notification.user_id == user_id)
+    newest = (await db.scalars(
+        query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(_STREAM_WINDOW)
+    )).all()
+    coalesced = (await db.scalars(
+        query.where(Notification.updated_at.isnot(None))
+        .order_by(Notification.updated_at.desc())
+        .limit(_STREAM_WINDOW)
+    )).all()
+    window = {n.id: n for n in [*newest, *coalesced]}
+    return sorted(window.values(), key=lambda n: (n.updated_at or n.created_at, n.id))
+
 
 def _serialize(notification: Notification) -> NotificationSchema:
     payload = None
@@ -27,96 +72,196 @@ def _serialize(notification: Notification) -> NotificationSchema:
     data = {
         "id": notification.id,
         "event_type": notification.event_type,
-        "title": notification.title,
+        "title": coalesced_title(notification),
         "message": notification.message,
         "reference_type": notification.reference_type,
         "reference_id": notification.reference_id,
         "payload": payload,
         "is_read": notification.is_read,
         "created_at": notification.created_at,
+        "updated_at": notification.updated_at,
         "read_at": notification.read_at,
         "actor": notification.actor,
+        "actor_count": notification.actor_count,
+        "event_count": notification.event_count,
     }
     return NotificationSchema.model_validate(data)
 
 
+async def _unread_count(db: AsyncSession, user_id: int) -> int:
+    return sum((await unread_counts(db, user_id)).values())
+
+
+def _sse(event: str, data: str, event_id=None) -> str:
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {data}\n\n"
+
+
 @router.get("", response_model=NotificationListResponse)
 async def list_notifications(
+    request: Request,
+    response: Response,
     limit: int = 20,
-    offset: int = 0,
+    before: Optional[str] = None,  # opaque keyset cursor from X-Next-Cursor
     unread_only: bool = False,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     query = (
-        db.query(Notification)
-        .options(joinedload(Notification.actor))
-        .filter(Notification.user_id == current_user.id)
+        select(Notification)
+        .where(Notification.user_id == current_user.id)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
     )
-
     if unread_only:
-        query = query.filter(Notification.is_read.is_(False))
+        query = query.where(Notification.is_read.is_(False))
+    if before:
+        position = decode_cursor(before)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(keyset_before(Notification.created_at, Notification.id, position))
 
-    notifications: List[Notification] = (
-        query.order_by(Notification.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    # Resolve the page as row versions first (one extra row tells whether another
+    # page exists); full rows are only loaded when the client's copy is stale.
+    page = (await db.execute(query.with_only_columns(
+        Notification.id,
+        Notification.created_at,
+        Notification.is_read,
+        Notification.event_count,
+    ).limit(limit + 1))).all()
+    by_event_type = await unread_counts(db, current_user.id)
+    etag = make_etag("notifications", current_user.id, [tuple(row) for row in page], sorted(by_event_type.items()))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
 
-    unread_count = (
-        db.query(func.count(Notification.id))
-        .filter(Notification.user_id == current_user.id, Notification.is_read.is_(False))
-        .scalar()
-    )
+    if len(page) > limit:
+        last = page[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
+    notifications: List[Notification] = (await db.scalars(
+        select(Notification)
+        .options(*_load_actors())
+        .where(Notification.user_id == current_user.id, Notification.id.in_([row.id for row in page[:limit]]))
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+    )).all() if page else []
 
     return NotificationListResponse(
         notifications=[_serialize(n) for n in notifications],
-        unread_count=unread_count or 0,
+        unread_count=sum(by_event_type.values()),
+    )
+
+
+@router.get("/unread-count")
+async def get_unread_count(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Badge count from the maintained counters, without touching the notifications table."""
+    by_event_type = await unread_counts(db, current_user.id)
+    return {"unread_count": sum(by_event_type.values()), "by_event_type": by_event_type}
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Server-Sent Events stream of the current user's notifications.
+
+    Sends a ``notification`` event (``id`` is the notification id) for each
+    notification created after ``Last-Event-ID``, or after connecting, and
+    again whenever another event is coalesced into it, plus an ``unread``
+    event whenever the unread count changes. The database is read only when
+    the broker reports a change for this user.
+    """
+    user_id = current_user.id
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        last_id = int(last_event_id)
+    else:
+        last_id = await db.scalar(
+            select(func.coalesce(func.max(Notification.id), 0)).where(Notification.user_id == user_id)
+        )
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + NOTIFICATION_STREAM_MAX_SECONDS
+        unread_count = None
+        # Notification id -> event_count as last seen by the client. Diffing the
+        # window against it also catches rows committed out of id order.
+        seen = None
+        changed = True
+        # Reconnect delay for EventSource clients
+        yield "retry: 5000\n\n"
+        async with notification_broker.subscribe(user_id) as wakeup:
+            while True:
+                if changed:
+                    wakeup.clear()
+                    notifications = await _stream_window(db, user_id)
+                    count = await _unread_count(db, user_id)
+                    # Hand the connection back to the pool while the stream idles
+                    await db.close()
+                    if seen is None:
+                        seen = {n.id: n.event_count for n in notifications if n.id <= last_id}
+                    for notification in notifications:
+                        if seen.get(notification.id) != notification.event_count:
+                            yield _sse("notification", _serialize(notification).model_dump_json(), notification.id)
+                    seen = {n.id: n.event_count for n in notifications}
+                    if count != unread_count:
+                        unread_count = count
+                        yield _sse("unread", json.dumps({"unread_count": count}))
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=min(NOTIFICATION_STREAM_HEARTBEAT_SECONDS, remaining))
+                    changed = True
+                except asyncio.TimeoutError:
+                    changed = False
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @router.post("/mark-read")
-async def mark_notifications_read(
+async def mark_notifications(
     payload: NotificationReadRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    query = select(func.count(Notification.id)).where(Notification.user_id == current_user.id)
 
     if payload.ids:
-        query = query.filter(Notification.id.in_(payload.ids))
+        query = query.where(Notification.id.in_(payload.ids))
 
-    notifications = query.all()
-    if not notifications:
+    matched = await db.scalar(query)
+    if not matched:
         raise HTTPException(status_code=404, detail="No notifications found")
 
-    for notification in notifications:
-        mark_notification_read(notification)
-
-    db.commit()
-    return {"updated": len(notifications)}
+    await mark_notifications_read(db, user_id=current_user.id, ids=payload.ids or None)
+    await db.commit()
+    return {"updated": matched}
 
 
 @router.post("/mark-all-read")
 async def mark_all_notifications(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    updated = mark_all_notifications_read(db, user_id=current_user.id)
-    db.commit()
+    updated = await mark_all_notifications_read(db, user_id=current_user.id)
+    await db.commit()
     return {"updated": updated}
 
 
 @router.delete("")
 async def delete_notifications(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    deleted = (
-        db.query(Notification)
-        .filter(Notification.user_id == current_user.id)
-        .delete(synchronize_session=False)
-    )
-    db.commit()
-    return {"deleted": deleted or 0}
\ No newline at end of file
+    deleted = await delete_all_notifications(db, user_id=current_user.id)
+    return {"deleted": deleted}
@@ -1,44 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.database import get_db
 from app.models.user import User
 from app.models.reaction import Reaction
 from app.models.shoutout import ShoutOut
-from sqlalchemy import func
+from sqlalchemy import select
 from app.schemas.reaction import ReactionCreate, ReactionSummary, ReactionUser
 from app.middleware.auth import get_current_active_user
-from app.utils.notifications import create_notification
+from app.middleware.rate_limit import limit_by_user
+from app.utils.principals import Principal
+from app.utils.notifications import create_notifications_bulk
+from app.utils.counters import bump_reaction_count, reaction_counts
 
 router = APIRouter(prefix="/api/shoutouts", tags=["reactions"])
 
-@router.post("/{shoutout_id}/reactions")
+@router.post("/{shoutout_id}/reactions", dependencies=[Depends(limit_by_user("reaction_user"))])
 async def add_reaction(
     shoutout_id: int,
     reaction_data: ReactionCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.scalar(
+        select(ShoutOut).options(selectinload(ShoutOut.recipients)).where(ShoutOut.id == shoutout_id)
+    )
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
     
     if reaction_data.type not in ["like", "clap", "star"]:
         raise HTTPException(status_code=400, detail="Invalid reaction type")
     
-    existing_reaction = (
-        db.query(Reaction)
-        .filter(
+    existing_reaction = await db.scalar(
+        select(Reaction)
+        .where(
             Reaction.shoutout_id == shoutout_id,
             Reaction.user_id == current_user.id,
         )
-        .first()
     )
 
     if existing_reaction:
         if existing_reaction.type == reaction_data.type:
             return {"message": "Reaction already exists"}
+        await bump_reaction_count(db, shoutout_id, existing_reaction.type, -1)
+        await bump_reaction_count(db, shoutout_id, reaction_data.type, 1)
         existing_reaction.type = reaction_data.type
-        db.commit()
+        await db.commit()
         return {"message": "Reaction updated successfully"}
 
     new_reaction = Reaction(
@@ -48,7 +55,8 @@ async def add_reaction(
     )
 
     db.add(new_reaction)
-    db.flush()
+    await db.flush()
+    await bump_reaction_count(db, shoutout_id, reaction_data.type, 1)
 
     recipients_to_notify = set()
     if shoutout.sender_id != current_user.id:
@@ -59,23 +67,22 @@ async def add_reaction(
             recipients_to_notify.add(rid)
 
     reaction_label = reaction_data.type.capitalize()
-    for uid in recipients_to_notify:
-        create_notification(
-            db,
-            user_id=uid,
-            actor_id=current_user.id,
-            event_type="reaction.new",
-            title=f"{current_user.name} reacted to a shoutout",
-            message=f"Reaction: {reaction_label}",
-            reference_type="shoutout",
-            reference_id=shoutout_id,
-            payload={
-                "shoutout_id": shoutout_id,
-                "redirect_url": "/feed",
-            },
-        )
+    await create_notifications_bulk(
+        db,
+        sorted(recipients_to_notify),
+        actor_id=current_user.id,
+        event_type="reaction.new",
+        title=f"{current_user.name} reacted to a shoutout",
+        message=f"Reaction: {reaction_label}",
+        reference_type="shoutout",
+        reference_id=shoutout_id,
+        payload={
+            "shoutout_id": shoutout_id,
+            "redirect_url": "/feed",
+        },
+    )
 
-    db.commit()
+    await db.commit()
 
     return {"message": "Reaction added successfully"}
 
@@ -83,24 +90,24 @@ async def add_reaction(
 async def remove_reaction(
     shoutout_id: int,
     reaction_type: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    reaction = (
-        db.query(Reaction)
-        .filter(
+    reaction = await db.scalar(
+        select(Reaction)
+        .where(
             Reaction.shoutout_id == shoutout_id,
             Reaction.user_id == current_user.id,
             Reaction.type == reaction_type
         )
-        .first()
     )
     
     if not reaction:
         raise HTTPException(status_code=404, detail="Reaction not found")
     
-    db.delete(reaction)
-    db.commit()
+    await db.delete(reaction)
+    await bump_reaction_count(db, shoutout_id, reaction.type, -1)
+    await db.commit()
     
     return {"message": "Reaction removed successfully"}
 
@@ -109,35 +116,28 @@ async def remove_reaction(
 async def list_reactions(
     shoutout_id: int,
     reaction_type: str | None = Query(default=None, pattern="^(like|clap|star)$"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ):
     # Ensure shoutout exists
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.get(ShoutOut, shoutout_id)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
 
-    # Counts for each type
-    counts_rows = (
-        db.query(Reaction.type, func.count(Reaction.id))
-        .filter(Reaction.shoutout_id == shoutout_id)
-        .group_by(Reaction.type)
-        .all()
-    )
-    counts = {t: c for t, c in counts_rows}
+    # Counts for each type, maintained on the shoutout row
+    counts = reaction_counts(shoutout)
 
     # Build users map
     types_to_fetch = [reaction_type] if reaction_type else ["like", "clap", "star"]
     users_map: dict[str, list[ReactionUser]] = {t: [] for t in types_to_fetch}
 
     for t in types_to_fetch:
-        rows = (
-            db.query(User)
+        rows = (await db.scalars(
+            select(User)
             .join(Reaction, Reaction.user_id == User.id)
-            .filter(Reaction.shoutout_id == shoutout_id, Reaction.type == t)
+            .where(Reaction.shoutout_id == shoutout_id, Reaction.type == t)
             .order_by(User.name.asc())
-            .all()
-        )
+        )).all()
         users_map[t] = [ReactionUser(id=u.id, name=u.name, email=u.email, department=u.department, avatar_url=u.avatar_url) for u in rows]
 
     # If a specific type was requested, include only that in users but keep counts for all
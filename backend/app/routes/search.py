@@ -0,0 +1,34 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.schemas.search import SearchResult
+from app.middleware.auth import get_current_active_user
+from app.utils.principals import Principal
+from app.utils.search import search_content
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., max_length=200),
+    limit: int = Query(default=20, ge=1, le=50),
+    offset: int = Query(default=0, ge=0),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query cannot be empty")
+
+    # Admins can view any shoutout regardless of department
+    is_admin = (current_user.role == "admin" or getattr(current_user, "is_admin", False))
+    rows = await db.run_sync(
+        search_content,
+        q.strip(),
+        department=current_user.department,
+        all_departments=is_admin,
+        limit=limit,
+        offset=offset,
+    )
+    return [SearchResult(**row) for row in rows]
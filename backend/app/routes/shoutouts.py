@@ -1,35 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response
+from sqlalchemy.orm import selectinload
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from typing import List, Optional
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
 from app.database import get_db
 from app.models.user import User
 from app.models.shoutout import ShoutOut, ShoutOutRecipient, ShoutOutAttachment
 from app.models.reaction import Reaction
-from app.models.comment import Comment
-from app.schemas.shoutout import ShoutOut as ShoutOutSchema, ShoutOutCreate, ShoutOutUpdate
-import os, secrets, shutil
+from app.models.department_timeline import DepartmentTimeline
+from app.schemas.shoutout import (
+    ShoutOut as ShoutOutSchema,
+    ShoutOutBatchCreate,
+    ShoutOutBatchItemResult,
+    ShoutOutBatchResult,
+    ShoutOutCreate,
+    ShoutOutUpdate,
+)
+import json, os
 from app.middleware.auth import get_current_active_user
-from app.utils.notifications import create_notification
+from app.middleware.rate_limit import limit_by_user
+from app.utils.principals import Principal
+from app.utils.counters import reaction_counts
+from app.utils.timelines import fan_out_shoutouts
+from app.utils.http_cache import make_etag, not_modified
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_before
+from app.utils.attachments import release_attachments, remove_blob_files, stage_upload, store_blob
+from app.utils.images import ATTACHMENT_WIDTHS, generate_variants
+from app.utils.uploads import remove_file
+from app.utils.notifications import insert_notification_rows, notification_rows
 
 router = APIRouter(prefix="/api/shoutouts", tags=["shoutouts"])
 
-def format_shoutout(shoutout, user_id, db):
-    reaction_counts = (
-        db.query(Reaction.type, func.count(Reaction.id))
-        .filter(Reaction.shoutout_id == shoutout.id)
-        .group_by(Reaction.type)
-        .all()
-    )
-    
-    user_reactions = (
-        db.query(Reaction.type)
-        .filter(Reaction.shoutout_id == shoutout.id, Reaction.user_id == user_id)
-        .all()
+# Shoutouts written per INSERT round by the batch endpoint
+BATCH_CHUNK_SIZE = 200
+
+def feed_load_options():
+    """Eager-load the relationships rendered by format_shoutout for a whole page."""
+    return (
+        selectinload(ShoutOut.sender),
+        selectinload(ShoutOut.recipients).selectinload(ShoutOutRecipient.recipient),
+        selectinload(ShoutOut.attachments),
     )
-    
-    comment_count = db.query(func.count(Comment.id)).filter(Comment.shoutout_id == shoutout.id).scalar()
-    
+
+def user_summary(user):
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "department": user.department,
+        "avatar_url": user.avatar_url,
+        "avatar_variants": json.loads(user.avatar_variants) if user.avatar_variants else None,
+    }
+
+def format_shoutout(shoutout, reaction_counts, comment_count, user_reactions):
     # Collect attachments from relationship
     attachment_objs = []
     if getattr(shoutout, 'attachments', None):
@@ -39,6 +65,7 @@ def format_shoutout(shoutout, user_id, db):
                 "name": a.name,
                 "type": a.type,
                 "size": a.size,
+                "variants": a.variants,
             })
 
     return {
@@ -47,193 +74,402 @@ def format_shoutout(shoutout, user_id, db):
         "message": shoutout.message,
         "created_at": shoutout.created_at,
         "updated_at": shoutout.updated_at,
-        "sender": {
-            "id": shoutout.sender.id,
-            "name": shoutout.sender.name,
-            "email": shoutout.sender.email,
-            "department": shoutout.sender.department,
-            "avatar_url": shoutout.sender.avatar_url,
-        },
-        "recipients": [
-            {
-                "id": r.recipient.id,
-                "name": r.recipient.name,
-                "email": r.recipient.email,
-                "department": r.recipient.department,
-                "avatar_url": r.recipient.avatar_url,
-            }
-            for r in shoutout.recipients
-        ],
-        "reaction_counts": {reaction_type: count for reaction_type, count in reaction_counts},
+        "sender": user_summary(shoutout.sender),
+        "recipients": [user_summary(r.recipient) for r in shoutout.recipients],
+        "reaction_counts": reaction_counts,
         "comment_count": comment_count,
-        "user_reactions": [r[0] for r in user_reactions],
+        "user_reactions": user_reactions,
         "attachments": attachment_objs
     }
 
-@router.post("", response_model=ShoutOutSchema)
+async def hydrate_shoutouts(shoutouts, user_id, db):
+    """Format a page of shoutouts with a fixed number of queries.
+
+    Reaction and comment counts come from the counters on each row; the
+    caller's own reactions are fetched in one query keyed by shoutout id.
+    Callers should load the shoutouts with ``feed_load_options()``.
+    """
+    shoutout_ids = [s.id for s in shoutouts]
+    if not shoutout_ids:
+        return []
+
+    user_reactions = defaultdict(list)
+    rows = (await db.execute(
+        select(Reaction.shoutout_id, Reaction.type)
+        .where(Reaction.shoutout_id.in_(shoutout_ids), Reaction.user_id == user_id)
+    )).all()
+    for shoutout_id, reaction_type in rows:
+        user_reactions[shoutout_id].append(reaction_type)
+
+    return [
+        format_shoutout(
+            s,
+            reaction_counts(s),
+            s.comment_count,
+            user_reactions.get(s.id, []),
+        )
+        for s in shoutouts
+    ]
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{field} must be a YYYY-MM-DD date")
+
+async def load_shoutout(shoutout_id, db):
+    return await db.scalar(
+        select(ShoutOut)
+        .options(*feed_load_options())
+        .where(ShoutOut.id == shoutout_id)
+    )
+
+def notification_preview(message):
+    preview = (message or "").strip()
+    if len(preview) > 160:
+        preview = f"{preview[:157]}..."
+    return preview
+
+def recipient_error(recipient_ids, sender, users_by_id):
+    """Return the HTTPException a recipient list would raise for ``sender``, or None if it is allowed."""
+    if not recipient_ids:
+        return HTTPException(status_code=400, detail="At least one recipient is required")
+    for recipient_id in recipient_ids:
+        recipient = users_by_id.get(recipient_id)
+        if not recipient:
+            return HTTPException(status_code=404, detail=f"Recipient with id {recipient_id} not found")
+        if recipient.id == sender.id:
+            return HTTPException(status_code=400, detail="You cannot give a shoutout to yourself")
+        if recipient.department != sender.department:
+            return HTTPException(status_code=403, detail="Can only tag users from your own department")
+    return None
+
+async def load_recipients(recipient_ids, db):
+    """Fetch the users behind ``recipient_ids`` with one IN query, keyed by id."""
+    if not recipient_ids:
+        return {}
+    users = await db.scalars(select(User).where(User.id.in_(recipient_ids)))
+    return {user.id: user for user in users}
+
+async def insert_shoutouts(db, sender, items):
+    """Insert shoutouts from ``sender`` with one statement per table.
+
+    ``items`` is a list of ``(message, recipient_ids)`` pairs whose recipients
+    are already validated. Recipient rows, ``shoutout.received`` notifications
+    and department timeline rows are written alongside. Returns the new
+    ``(id, created_at, updated_at)`` rows in the order of ``items``.
+    """
+    rows = (await db.execute(
+        insert(ShoutOut).returning(
+            ShoutOut.id, ShoutOut.created_at, ShoutOut.updated_at, sort_by_parameter_order=True
+        ),
+        [{"sender_id": sender.id, "message": message} for message, _ in items],
+    )).all()
+    shoutout_ids = [row.id for row in rows]
+
+    recipient_rows = []
+    notifications = []
+    for shoutout_id, (message, recipient_ids) in zip(shoutout_ids, items):
+        recipient_rows.extend(
+            {"shoutout_id": shoutout_id, "recipient_id": recipient_id} for recipient_id in recipient_ids
+        )
+        notifications.extend(notification_rows(
+            recipient_ids,
+            actor_id=sender.id,
+            event_type="shoutout.received",
+            title=f"{sender.name} recognized you",
+            message=notification_preview(message),
+            reference_type="shoutout",
+            reference_id=shoutout_id,
+            payload={"shoutout_id": shoutout_id, "redirect_url": "/feed"},
+        ))
+    await db.execute(insert(ShoutOutRecipient), recipient_rows)
+    await insert_notification_rows(db, notifications)
+    await db.run_sync(fan_out_shoutouts, shoutout_ids)
+    return rows
+
+@router.post("", response_model=ShoutOutSchema, dependencies=[Depends(limit_by_user("shoutout_user"))])
 async def create_shoutout(
     request: Request,
     message: str = Form(...),
     recipient_ids: List[int] = Form(...),
     files: List[UploadFile] = File(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate message
     if not message.strip():
         raise HTTPException(status_code=400, detail="Shoutout message cannot be empty")
 
-    new_shoutout = ShoutOut(
-        sender_id=current_user.id,
-        message=message,
-    )
-    db.add(new_shoutout)
-    db.flush()
-
     # Validate recipients
-    recipient_objects = []
-    for recipient_id in recipient_ids:
-        recipient = db.query(User).filter(User.id == recipient_id).first()
-        if not recipient:
-            raise HTTPException(status_code=404, detail=f"Recipient with id {recipient_id} not found")
-        if recipient.id == current_user.id:
-            raise HTTPException(status_code=400, detail="You cannot give a shoutout to yourself")
-        if recipient.department != current_user.department:
-            raise HTTPException(status_code=403, detail="Can only tag users from your own department")
-        shoutout_recipient = ShoutOutRecipient(shoutout_id=new_shoutout.id, recipient_id=recipient_id)
-        db.add(shoutout_recipient)
-        recipient_objects.append(recipient)
+    recipient_ids = list(dict.fromkeys(recipient_ids))
+    users_by_id = await load_recipients(recipient_ids, db)
+    error = recipient_error(recipient_ids, current_user, users_by_id)
+    if error:
+        raise error
 
     # Handle file uploads (optional)
     saved_files = []
     if files:
-        upload_root = os.path.join(os.getcwd(), 'uploads', 'shoutouts')
-        os.makedirs(upload_root, exist_ok=True)
         MAX_SIZE = 5 * 1024 * 1024  # 5MB
         allowed_ext = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.pdf'}
         for file in files:
-            original_name = file.filename
-            _, ext = os.path.splitext(original_name.lower())
+            _, ext = os.path.splitext(file.filename.lower())
             if ext not in allowed_ext:
                 raise HTTPException(status_code=400, detail=f"File type {ext} not allowed")
-            # Read content to enforce size limit
-            contents = await file.read()
-            size = len(contents)
-            if size > MAX_SIZE:
-                raise HTTPException(status_code=400, detail=f"File {original_name} exceeds 5MB size limit")
-            file.file.seek(0)  # reset pointer for saving via shutil if needed
-            safe_name = f"{secrets.token_hex(8)}_{original_name}"
-            dest_path = os.path.join(upload_root, safe_name)
-            with open(dest_path, 'wb') as out_file:
-                out_file.write(contents)
-            url = f"/uploads/shoutouts/{safe_name}"
+        staged_files = []
+        try:
+            for file in files:
+                # Streamed in chunks; the size limit is enforced while copying
+                staged = await stage_upload(file, max_size=MAX_SIZE)
+                if staged is None:
+                    raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds 5MB size limit")
+                staged_files.append((file, staged))
+        except HTTPException:
+            for _, staged in staged_files:
+                await remove_file(staged.path)
+            raise
+        for file, staged in staged_files:
+            original_name = file.filename
+            _, ext = os.path.splitext(original_name.lower())
+            # Identical files share one stored blob
+            url = await store_blob(db, staged, ext)
             mime = None
             if ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']:
                 mime = f"image/{ext.replace('.', '') if ext != '.jpg' else 'jpeg'}"
-            saved_files.append({"url": url, "name": original_name, "type": mime, "size": size})
-        for f in saved_files:
-            db.add(ShoutOutAttachment(shoutout_id=new_shoutout.id, url=f["url"], name=f["name"], type=f.get("type"), size=f.get("size")))
+            saved_files.append({
+                "url": url,
+                "name": original_name,
+                "type": mime,
+                "size": staged.size,
+                "blob_sha256": staged.sha256,
+                "variants": None,
+            })
 
-    # Notify tagged recipients
-    preview = (message or "").strip()
-    if len(preview) > 160:
-        preview = f"{preview[:157]}..."
+    # Shoutout, recipients, notifications and timeline rows
+    (row,) = await insert_shoutouts(db, current_user, [(message, recipient_ids)])
+    if saved_files:
+        await db.execute(insert(ShoutOutAttachment), [{"shoutout_id": row.id, **f} for f in saved_files])
 
-    for recipient in recipient_objects:
-        create_notification(
-            db,
-            user_id=recipient.id,
-            actor_id=current_user.id,
-            event_type="shoutout.received",
-            title=f"{current_user.name} recognized you",
-            message=preview,
-            reference_type="shoutout",
-            reference_id=new_shoutout.id,
-            payload={
-                "shoutout_id": new_shoutout.id,
-                "redirect_url": "/feed",
-            },
-        )
+    # Everything the response needs is already in memory
+    created = {
+        "id": row.id,
+        "sender_id": current_user.id,
+        "message": message,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "sender": user_summary(current_user),
+        "recipients": [user_summary(users_by_id[recipient_id]) for recipient_id in recipient_ids],
+        "reaction_counts": {},
+        "comment_count": 0,
+        "user_reactions": [],
+        "attachments": saved_files,
+    }
+    await db.commit()
+
+    # Rendered only now, so no blob row lock or pooled connection is held meanwhile
+    rendered = False
+    for saved in saved_files:
+        if not saved["type"]:
+            continue
+        variants = await generate_variants(saved["url"], ATTACHMENT_WIDTHS)
+        if variants:
+            saved["variants"] = json.dumps(variants)
+            await db.execute(
+                update(ShoutOutAttachment)
+                .where(ShoutOutAttachment.shoutout_id == row.id, ShoutOutAttachment.url == saved["url"])
+                .values(variants=saved["variants"])
+            )
+            rendered = True
+    if rendered:
+        await db.commit()
+    return created
 
-    db.commit()
-    db.refresh(new_shoutout)
-    return format_shoutout(new_shoutout, current_user.id, db)
+@router.post("/batch", response_model=ShoutOutBatchResult, dependencies=[Depends(limit_by_user("shoutout_user"))])
+async def create_shoutouts_batch(
+    batch: ShoutOutBatchCreate,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many shoutouts from the current user in one request.
+
+    Items are validated up front against a single recipient lookup and the
+    valid ones are written in chunks. A chunk that fails is retried item by
+    item, so one bad item never discards the rest of the batch.
+    """
+    results = [ShoutOutBatchItemResult(index=index, success=False) for index in range(len(batch.items))]
+
+    users_by_id = await load_recipients({rid for item in batch.items for rid in item.recipient_ids}, db)
+
+    pending = []  # (index, (message, recipient_ids))
+    for index, item in enumerate(batch.items):
+        recipient_ids = list(dict.fromkeys(item.recipient_ids))
+        if not item.message.strip():
+            results[index].error = "Shoutout message cannot be empty"
+            continue
+        error = recipient_error(recipient_ids, current_user, users_by_id)
+        if error:
+            results[index].error = error.detail
+            continue
+        pending.append((index, (item.message, recipient_ids)))
+
+    async def write(chunk):
+        rows = await insert_shoutouts(db, current_user, [entry for _, entry in chunk])
+        await db.commit()
+        for (index, _), row in zip(chunk, rows):
+            results[index].success = True
+            results[index].shoutout_id = row.id
+
+    for start in range(0, len(pending), BATCH_CHUNK_SIZE):
+        chunk = pending[start:start + BATCH_CHUNK_SIZE]
+        try:
+            await write(chunk)
+        except SQLAlchemyError:
+            await db.rollback()
+            for entry in chunk:
+                try:
+                    await write([entry])
+                except SQLAlchemyError:
+                    await db.rollback()
+                    results[entry[0]].error = "Could not create shoutout"
+
+    created = sum(1 for result in results if result.success)
+    return ShoutOutBatchResult(created=created, failed=len(results) - created, results=results)
 
 @router.get("", response_model=List[ShoutOutSchema])
 async def get_shoutouts(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,      # opaque keyset cursor from X-Next-Cursor; takes precedence over skip
     department: Optional[str] = None,
     sender_id: Optional[int] = None,
     recipient_id: Optional[int] = None,
     start_date: Optional[str] = None,  # YYYY-MM-DD
     end_date: Optional[str] = None,    # YYYY-MM-DD
     all_departments: bool = False,     # NEW: Flag to fetch from all departments
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # Base query: optionally restrict to the current user's department by recipient membership
     if all_departments:
         # Fetch all shoutouts from all departments
-        shoutouts_query = db.query(ShoutOut).distinct()
+        shoutouts_query = select(ShoutOut)
+        sort_created_at, sort_id = ShoutOut.created_at, ShoutOut.id
     else:
-        # Restrict to current user's department (original behavior)
+        # Restrict to current user's department via its materialized timeline,
+        # paging on the timeline's own (department, created_at, shoutout_id) index
         shoutouts_query = (
-            db.query(ShoutOut)
-            .join(ShoutOutRecipient, ShoutOut.id == ShoutOutRecipient.shoutout_id)
-            .join(User, ShoutOutRecipient.recipient_id == User.id)
-            .filter(User.department == current_user.department)
-            .distinct()
+            select(ShoutOut)
+            .join(DepartmentTimeline, DepartmentTimeline.shoutout_id == ShoutOut.id)
+            .where(DepartmentTimeline.department == current_user.department)
         )
+        sort_created_at, sort_id = DepartmentTimeline.created_at, DepartmentTimeline.shoutout_id
 
     # Optional filters
     if department:
-        # filter by sender department; due to business rules, sender and recipients share dept
-        sender_user = aliased(User)
-        shoutouts_query = shoutouts_query.join(
-            sender_user, ShoutOut.sender_id == sender_user.id
-        ).filter(sender_user.department == department)
+        # filter by sender department; due to business rules, sender and recipients share dept.
+        # Expressed as EXISTS so the feed never multiplies rows or needs DISTINCT.
+        shoutouts_query = shoutouts_query.where(ShoutOut.sender.has(User.department == department))
 
     if recipient_id:
-        if all_departments:
-            shoutouts_query = shoutouts_query.join(ShoutOutRecipient, ShoutOutRecipient.shoutout_id == ShoutOut.id)
-        shoutouts_query = shoutouts_query.filter(ShoutOutRecipient.recipient_id == recipient_id)
+        shoutouts_query = shoutouts_query.where(
+            ShoutOut.recipients.any(ShoutOutRecipient.recipient_id == recipient_id)
+        )
 
     if sender_id:
-        shoutouts_query = shoutouts_query.filter(ShoutOut.sender_id == sender_id)
+        shoutouts_query = shoutouts_query.where(ShoutOut.sender_id == sender_id)
 
+    # Whole days as half-open timestamp ranges on the sort column, so the
+    # (…, created_at) indexes stay usable; midnight is taken in the database
+    # session's time zone, matching the previous date(created_at) comparison.
     if start_date:
-        # Compare by date portion to avoid TZ issues
-        shoutouts_query = shoutouts_query.filter(func.date(ShoutOut.created_at) >= start_date)
+        start = datetime.combine(_parse_date(start_date, "start_date"), time.min)
+        shoutouts_query = shoutouts_query.where(sort_created_at >= start)
     if end_date:
-        shoutouts_query = shoutouts_query.filter(func.date(ShoutOut.created_at) <= end_date)
+        end = datetime.combine(_parse_date(end_date, "end_date") + timedelta(days=1), time.min)
+        shoutouts_query = shoutouts_query.where(sort_created_at < end)
+
+    shoutouts_query = shoutouts_query.order_by(sort_created_at.desc(), sort_id.desc())
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        shoutouts_query = shoutouts_query.where(keyset_before(sort_created_at, sort_id, position))
+    elif skip:
+        # Legacy offset paging for older clients
+        shoutouts_query = shoutouts_query.offset(skip)
+
+    # Resolve the page as row versions first (one extra row tells whether another
+    # page exists); full rows are only loaded when the client's copy is stale.
+    page = (await db.execute(shoutouts_query.with_only_columns(
+        ShoutOut.id,
+        ShoutOut.created_at,
+        ShoutOut.updated_at,
+        ShoutOut.like_count,
+        ShoutOut.clap_count,
+        ShoutOut.star_count,
+        ShoutOut.comment_count,
+    ).limit(limit + 1))).all()
+    shoutout_ids = [row.id for row in page[:limit]]
 
-    shoutouts_query = shoutouts_query.order_by(ShoutOut.created_at.desc()).offset(skip).limit(limit)
+    own_reactions = (await db.execute(
+        select(Reaction.shoutout_id, Reaction.type)
+        .where(Reaction.shoutout_id.in_(shoutout_ids), Reaction.user_id == current_user.id)
+        .order_by(Reaction.shoutout_id, Reaction.type)
+    )).all() if shoutout_ids else []
+    # Only the senders and recipients rendered on this page can change it
+    people = (await db.execute(
+        select(User.id, User.updated_at)
+        .where(or_(
+            User.id.in_(select(ShoutOut.sender_id).where(ShoutOut.id.in_(shoutout_ids))),
+            User.id.in_(
+                select(ShoutOutRecipient.recipient_id).where(ShoutOutRecipient.shoutout_id.in_(shoutout_ids))
+            ),
+        ))
+        .order_by(User.id)
+    )).all() if shoutout_ids else []
+    etag = make_etag(
+        "feed",
+        current_user.id,
+        [tuple(row) for row in page],
+        [tuple(row) for row in own_reactions],
+        [tuple(row) for row in people],
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    if len(page) > limit:
+        last = page[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
 
-    shoutouts = shoutouts_query.all()
-    return [format_shoutout(s, current_user.id, db) for s in shoutouts]
+    by_id = {
+        s.id: s
+        for s in await db.scalars(
+            select(ShoutOut).options(*feed_load_options()).where(ShoutOut.id.in_(shoutout_ids))
+        )
+    } if shoutout_ids else {}
+    shoutouts = [by_id[shoutout_id] for shoutout_id in shoutout_ids if shoutout_id in by_id]
+    return await hydrate_shoutouts(shoutouts, current_user.id, db)
 
 @router.get("/{shoutout_id}", response_model=ShoutOutSchema)
 async def get_shoutout(
     shoutout_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await load_shoutout(shoutout_id, db)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
     
     # Admins can view any shoutout regardless of department
     is_admin = (current_user.role == "admin" or getattr(current_user, "is_admin", False))
     if not is_admin:
-        has_department_access = (
-            db.query(ShoutOutRecipient)
-            .join(User, ShoutOutRecipient.recipient_id == User.id)
-            .filter(
-                ShoutOutRecipient.shoutout_id == shoutout_id,
-                User.department == current_user.department
-            )
-            .first()
+        has_department_access = current_user.department and await db.get(
+            DepartmentTimeline, (current_user.department, shoutout_id)
         )
         if not has_department_access:
             raise HTTPException(
@@ -241,16 +477,16 @@ async def get_shoutout(
                 detail="Not authorized to view this shoutout"
             )
     
-    return format_shoutout(shoutout, current_user.id, db)
+    return (await hydrate_shoutouts([shoutout], current_user.id, db))[0]
 
 @router.put("/{shoutout_id}", response_model=ShoutOutSchema)
 async def update_shoutout(
     shoutout_id: int,
     shoutout_update: ShoutOutUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.get(ShoutOut, shoutout_id)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
     
@@ -261,18 +497,18 @@ async def update_shoutout(
         raise HTTPException(status_code=400, detail="Shoutout message cannot be empty")
     
     shoutout.message = shoutout_update.message
-    db.commit()
-    db.refresh(shoutout)
+    await db.commit()
+    shoutout = await load_shoutout(shoutout_id, db)
     
-    return format_shoutout(shoutout, current_user.id, db)
+    return (await hydrate_shoutouts([shoutout], current_user.id, db))[0]
 
 @router.delete("/{shoutout_id}")
 async def delete_shoutout(
     shoutout_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    shoutout = db.query(ShoutOut).filter(ShoutOut.id == shoutout_id).first()
+    shoutout = await db.get(ShoutOut, shoutout_id)
     if not shoutout:
         raise HTTPException(status_code=404, detail="Shoutout not found")
     
@@ -280,7 +516,11 @@ async def delete_shoutout(
     if shoutout.sender_id != current_user.id and not (current_user.role == "admin" or getattr(current_user, "is_admin", False)):
         raise HTTPException(status_code=403, detail="Not authorized to delete this shoutout")
     
-    db.delete(shoutout)
-    db.commit()
+    attachments = list(await shoutout.awaitable_attrs.attachments)
+    await db.delete(shoutout)
+    await db.flush()
+    released = await release_attachments(db, attachments)
+    await db.commit()
+    await remove_blob_files(released)
     
     return {"message": "Shoutout deleted successfully"}
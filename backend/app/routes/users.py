@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 from app.database import get_db
 from app.models.user import User
 from app.models.department_change import DepartmentChangeRequest
-from app.schemas.user import User as UserSchema, UserUpdate
-from app.middleware.auth import get_current_active_user
+from app.schemas.user import User as UserSchema, UserSuggestion, UserUpdate
+from app.middleware.auth import get_current_active_user, get_current_user_record
+from app.utils.principals import Principal
+import json
 import os
 import secrets
 from app.schemas.department_change import DepartmentChangeRequest as DepartmentChangeSchema
+from app.utils.http_cache import make_etag, not_modified
+from app.utils.typeahead import suggest_users
+from app.utils.images import AVATAR_WIDTHS, generate_variants, remove_variants
+from app.utils.uploads import remove_file, save_upload
 
 AVATAR_DIR = os.path.join(os.getcwd(), "uploads", "avatars")
 os.makedirs(AVATAR_DIR, exist_ok=True)
@@ -17,14 +25,14 @@ router = APIRouter(prefix="/api/users", tags=["users"])
 
 @router.get("/me", response_model=UserSchema)
 async def get_current_user_profile(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_db)
 ):
-    pending = (
-        db.query(DepartmentChangeRequest)
-        .filter(DepartmentChangeRequest.user_id == current_user.id, DepartmentChangeRequest.status == "pending")
+    pending = await db.scalar(
+        select(DepartmentChangeRequest)
+        .where(DepartmentChangeRequest.user_id == current_user.id, DepartmentChangeRequest.status == "pending")
         .order_by(DepartmentChangeRequest.created_at.desc())
-        .first()
+        .limit(1)
     )
     setattr(current_user, "pending_department", pending.requested_department if pending else None)
     return current_user
@@ -32,14 +40,14 @@ async def get_current_user_profile(
 @router.put("/me", response_model=UserSchema)
 async def update_current_user(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_db)
 ):
-    pending_request = (
-        db.query(DepartmentChangeRequest)
-        .filter(DepartmentChangeRequest.user_id == current_user.id, DepartmentChangeRequest.status == "pending")
+    pending_request = await db.scalar(
+        select(DepartmentChangeRequest)
+        .where(DepartmentChangeRequest.user_id == current_user.id, DepartmentChangeRequest.status == "pending")
         .order_by(DepartmentChangeRequest.created_at.desc())
-        .first()
+        .limit(1)
     )
 
     changed = False
@@ -69,9 +77,9 @@ async def update_current_user(
             new_pending_department = user_update.department
 
     if changed:
-        db.commit()
+        await db.commit()
 
-    db.refresh(current_user)
+    await db.refresh(current_user)
 
     if pending_request and pending_request.status == "pending":
         new_pending_department = pending_request.requested_department
@@ -82,85 +90,118 @@ async def update_current_user(
 
 @router.get("/me/department-change-requests", response_model=List[DepartmentChangeSchema])
 async def list_my_department_requests(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    requests = (
-        db.query(DepartmentChangeRequest)
-        .filter(DepartmentChangeRequest.user_id == current_user.id)
+    requests = (await db.scalars(
+        select(DepartmentChangeRequest)
+        .options(selectinload(DepartmentChangeRequest.user), selectinload(DepartmentChangeRequest.admin))
+        .where(DepartmentChangeRequest.user_id == current_user.id)
         .order_by(DepartmentChangeRequest.created_at.desc())
-        .all()
-    )
+    )).all()
     return requests
 
 @router.post("/me/avatar", response_model=UserSchema)
 async def upload_avatar(
     avatar: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_db)
 ):
     allowed_types = {"image/jpeg", "image/png", "image/webp", "image/gif"}
     if avatar.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="Unsupported image format")
 
-    contents = await avatar.read()
     MAX_SIZE = 2 * 1024 * 1024  # 2MB limit to keep uploads lightweight
-    if len(contents) > MAX_SIZE:
-        raise HTTPException(status_code=400, detail="Avatar exceeds 2MB size limit")
-
     _, ext = os.path.splitext(avatar.filename or "avatar")
     safe_name = f"{current_user.id}_{secrets.token_hex(8)}{ext or '.png'}"
     file_path = os.path.join(AVATAR_DIR, safe_name)
 
-    # Remove previous avatar if it exists inside our managed directory
-    if current_user.avatar_url and current_user.avatar_url.startswith("/uploads/"):
+    # Streamed in chunks; the size limit is enforced while copying
+    if await save_upload(avatar, file_path, max_size=MAX_SIZE) is None:
+        raise HTTPException(status_code=400, detail="Avatar exceeds 2MB size limit")
+
+    avatar_url = f"/uploads/avatars/{safe_name}"
+    variants = await generate_variants(avatar_url, AVATAR_WIDTHS)
+
+    old_url = current_user.avatar_url
+    current_user.avatar_url = avatar_url
+    current_user.avatar_variants = json.dumps(variants) if variants else None
+    await db.commit()
+
+    # Remove the previous avatar once nothing points at it, if it lives inside our managed directory
+    if old_url and old_url.startswith("/uploads/"):
         uploads_root = os.path.join(os.getcwd(), "uploads")
-        relative_path = current_user.avatar_url[len("/uploads/"):]
-        old_path = os.path.join(uploads_root, relative_path)
-        if os.path.commonpath([uploads_root, os.path.abspath(old_path)]) == uploads_root and os.path.exists(old_path):
-            try:
-                os.remove(old_path)
-            except OSError:
-                pass
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-
-    current_user.avatar_url = f"/uploads/avatars/{safe_name}"
-    db.commit()
-    db.refresh(current_user)
+        old_path = os.path.join(uploads_root, old_url[len("/uploads/"):])
+        if os.path.commonpath([uploads_root, os.path.abspath(old_path)]) == uploads_root:
+            await remove_file(old_path)
+            await remove_variants(old_url)
+
+    await db.refresh(current_user)
     return current_user
 
 @router.get("/search", response_model=List[UserSchema])
 async def search_users(
     query: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    users = db.query(User).filter(User.name.ilike(f"%{query}%")).all()
+    users = (await db.scalars(select(User).where(User.name.ilike(f"%{query}%")))).all()
     return users
 
+@router.get("/typeahead", response_model=List[UserSuggestion])
+async def typeahead_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    department: str = None,
+    limit: int = Query(8, ge=1, le=20),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    query = q.strip()
+    if not query:
+        return []
+    rows = await db.run_sync(suggest_users, query, department=department, limit=limit)
+    return [
+        UserSuggestion(
+            id=user_id,
+            name=name,
+            avatar_url=avatar_url,
+            avatar_variants=avatar_variants,
+            department=user_department,
+        )
+        for user_id, name, avatar_url, avatar_variants, user_department in rows
+    ]
+
 @router.get("", response_model=List[UserSchema])
 async def get_users(
+    request: Request,
+    response: Response,
     department: str = None,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(User).filter(User.is_active == True)
+    criteria = [User.is_active == True]
     
     if department:
-        query = query.filter(User.department == department)
+        criteria.append(User.department == department)
+
+    count, max_id, last_modified = (await db.execute(
+        select(func.count(User.id), func.max(User.id), func.max(User.updated_at)).where(*criteria)
+    )).one()
+    etag = make_etag("users", department, count, max_id, last_modified)
+    cached = not_modified(request, response, etag, last_modified=last_modified)
+    if cached:
+        return cached
     
-    users = query.all()
+    users = (await db.scalars(select(User).where(*criteria))).all()
     return users
 
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
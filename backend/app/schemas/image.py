@@ -0,0 +1,22 @@
+import json
+from typing import Any, List, Optional
+from pydantic import BaseModel
+
+
+class ImageSource(BaseModel):
+    width: int
+    height: int
+    webp: str
+    jpeg: str
+
+
+class ImageVariants(BaseModel):
+    placeholder: Optional[str] = None
+    sources: List[ImageSource] = []
+
+
+def parse_variants(value: Any) -> Any:
+    """Accept variants stored as a JSON string on the ORM row."""
+    if isinstance(value, str):
+        return json.loads(value) if value else None
+    return value
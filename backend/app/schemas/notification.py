@@ -23,8 +23,11 @@ class Notification(BaseModel):
     payload: Optional[Dict[str, Any]] = None
     is_read: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
     read_at: Optional[datetime] = None
     actor: Optional[NotificationActor] = None
+    actor_count: int = 1
+    event_count: int = 1
 
     class Config:
         from_attributes = True
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    kind: str  # "shoutout" or "comment"
+    shoutout_id: int
+    comment_id: Optional[int] = None
+    snippet: str
+    rank: float
+    created_at: datetime
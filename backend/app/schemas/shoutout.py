@@ -1,11 +1,26 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import List, Optional
+from app.schemas.image import ImageVariants, parse_variants
 
 class ShoutOutCreate(BaseModel):
     message: str
     recipient_ids: List[int]
 
+class ShoutOutBatchCreate(BaseModel):
+    items: List[ShoutOutCreate] = Field(..., min_length=1, max_length=1000)
+
+class ShoutOutBatchItemResult(BaseModel):
+    index: int
+    success: bool
+    shoutout_id: Optional[int] = None
+    error: Optional[str] = None
+
+class ShoutOutBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[ShoutOutBatchItemResult]
+
 class ShoutOutUpdate(BaseModel):
     message: str
 
@@ -14,6 +29,9 @@ class ShoutOutAttachment(BaseModel):
     name: Optional[str] = None
     type: Optional[str] = None
     size: Optional[int] = None
+    variants: Optional[ImageVariants] = None
+
+    _parse_variants = field_validator("variants", mode="before")(parse_variants)
 
     class Config:
         from_attributes = True
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from datetime import datetime
 from typing import Optional
+from app.schemas.image import ImageVariants, parse_variants
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -26,6 +27,21 @@ class User(UserBase):
     email_verified: bool
     company_verified: bool
     pending_department: Optional[str] = None
+    avatar_variants: Optional[ImageVariants] = None
+
+    _parse_avatar_variants = field_validator("avatar_variants", mode="before")(parse_variants)
+
+    class Config:
+        from_attributes = True
+
+class UserSuggestion(BaseModel):
+    id: int
+    name: str
+    avatar_url: Optional[str] = None
+    avatar_variants: Optional[ImageVariants] = None
+    department: Optional[str] = None
+
+    _parse_avatar_variants = field_validator("avatar_variants", mode="before")(parse_variants)
 
     class Config:
         from_attributes = True
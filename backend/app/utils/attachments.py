@@ -0,0 +1,184 @@
+import hashlib
+import os
+import secrets
+import time
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+from fastapi import UploadFile
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.models.attachment_blob import AttachmentBlob
+from app.models.shoutout import ShoutOutAttachment
+from app.utils.images import remove_variants
+from app.utils.uploads import remove_file, save_upload
+
+# Content-addressed attachment storage.
+#
+# Each distinct file is stored once under uploads/blobs/<sha[:2]>/<sha>-<token><ext>
+# and tracked by an AttachmentBlob row whose ref_count counts the
+# ShoutOutAttachment rows using it. Uploads are streamed to uploads/tmp while
+# hashed, then either moved into place or dropped as a duplicate. A blob's
+# row is deleted when its last reference goes and its files once that commits;
+# the random token gives content uploaded again a new path, so removing the
+# old files can never hit the new ones.
+
+UPLOADS_ROOT = os.path.join(os.getcwd(), "uploads")
+BLOB_DIR = os.path.join(UPLOADS_ROOT, "blobs")
+STAGING_DIR = os.path.join(UPLOADS_ROOT, "tmp")
+# Files this old with no blob row are abandoned uploads and may be swept
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class StagedUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+async def stage_upload(upload: UploadFile, *, max_size: int) -> Optional[StagedUpload]:
+    """Stream an upload into the staging directory, hashing it on the way.
+
+    Returns None when the file exceeds ``max_size``.
+    """
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    path = os.path.join(STAGING_DIR, secrets.token_hex(16))
+    hasher = hashlib.sha256()
+    size = await save_upload(upload, path, max_size=max_size, hasher=hasher)
+    if size is None:
+        return None
+    return StagedUpload(path=path, size=size, sha256=hasher.hexdigest())
+
+
+def _blob_insert(db: AsyncSession):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Attachment blobs are not available on {dialect}")
+    return insert(AttachmentBlob)
+
+
+def _move_into_place(staged_path: str, blob_path: str) -> None:
+    if os.path.exists(blob_path):
+        os.remove(staged_path)
+        return
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    os.replace(staged_path, blob_path)
+
+
+async def store_blob(db: AsyncSession, staged: StagedUpload, ext: str) -> str:
+    """Take a reference on the blob for ``staged`` and return its public URL.
+
+    The blob row is upserted with ``ref_count + 1`` first, so a concurrent
+    release of the same content waits on the row lock instead of deleting the
+    file underneath this upload. Duplicate content keeps the existing file.
+    """
+    statement = _blob_insert(db).values(
+        sha256=staged.sha256,
+        path=f"blobs/{staged.sha256[:2]}/{staged.sha256}-{secrets.token_hex(4)}{ext}",
+        size=staged.size,
+        ref_count=1,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[AttachmentBlob.sha256],
+        set_={"ref_count": AttachmentBlob.ref_count + 1},
+    ).returning(AttachmentBlob.path)
+    relative_path = (await db.execute(statement)).scalar_one()
+    await run_in_threadpool(_move_into_place, staged.path, os.path.join(UPLOADS_ROOT, relative_path))
+    return f"/uploads/{relative_path}"
+
+
+async def _purge_blobs(db: AsyncSession, shas: List[str]) -> List[str]:
+    # The files stay until the caller has committed, so a rollback never
+    # leaves a blob row pointing at a removed file
+    return list((await db.execute(
+        AttachmentBlob.__table__.delete()
+        .where(AttachmentBlob.sha256.in_(shas), AttachmentBlob.ref_count <= 0)
+        .returning(AttachmentBlob.path)
+    )).scalars().all())
+
+
+async def remove_blob_files(paths: List[str]) -> None:
+    """Delete the files and image variants of purged blobs. Call after the purge commits."""
+    for relative_path in paths:
+        await remove_file(os.path.join(UPLOADS_ROOT, relative_path))
+        await remove_variants(f"/uploads/{relative_path}")
+
+
+async def release_attachments(db: AsyncSession, attachments: List[ShoutOutAttachment]) -> List[str]:
+    """Drop the blob references held by attachments that were just deleted.
+
+    Call after the attachment rows (or their shoutout) are deleted and
+    flushed. Blobs left without references are deleted; their paths are
+    returned for ``remove_blob_files`` once the caller has committed.
+    """
+    references = Counter(a.blob_sha256 for a in attachments if a.blob_sha256)
+    if not references:
+        return []
+    for sha, count in references.items():
+        await db.execute(
+            update(AttachmentBlob)
+            .where(AttachmentBlob.sha256 == sha)
+            .values({AttachmentBlob.ref_count: AttachmentBlob.ref_count - count})
+            .execution_options(synchronize_session=False)
+        )
+    return await _purge_blobs(db, list(references))
+
+
+def _orphaned_files(known_paths: set) -> List[str]:
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    orphans = []
+    for directory in (BLOB_DIR, STAGING_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                relative_path = os.path.relpath(path, UPLOADS_ROOT).replace(os.sep, "/")
+                if relative_path not in known_paths and os.path.getmtime(path) < cutoff:
+                    orphans.append(path)
+    return orphans
+
+
+async def reconcile_attachment_blobs(db: AsyncSession) -> Tuple[int, int, int]:
+    """Recount blob references, purge unreferenced blobs and sweep orphaned files.
+
+    Returns ``(recounted, purged, swept)``.
+    """
+    actual = dict((await db.execute(
+        select(ShoutOutAttachment.blob_sha256, func.count(ShoutOutAttachment.id))
+        .where(ShoutOutAttachment.blob_sha256.isnot(None))
+        .group_by(ShoutOutAttachment.blob_sha256)
+    )).all())
+    recounted = 0
+    for sha, ref_count in (await db.execute(select(AttachmentBlob.sha256, AttachmentBlob.ref_count))).all():
+        if actual.get(sha, 0) != ref_count:
+            # Recount inside the UPDATE so attachments written since the scan are included
+            await db.execute(
+                update(AttachmentBlob)
+                .where(AttachmentBlob.sha256 == sha)
+                .values({
+                    AttachmentBlob.ref_count: (
+                        select(func.count(ShoutOutAttachment.id))
+                        .where(ShoutOutAttachment.blob_sha256 == sha)
+                        .scalar_subquery()
+                    )
+                })
+                .execution_options(synchronize_session=False)
+            )
+            recounted += 1
+    await db.commit()
+
+    zero_shas = (await db.scalars(select(AttachmentBlob.sha256).where(AttachmentBlob.ref_count <= 0))).all()
+    purged = await _purge_blobs(db, list(zero_shas)) if zero_shas else []
+    await db.commit()
+    await remove_blob_files(purged)
+
+    known_paths = set((await db.scalars(select(AttachmentBlob.path))).all())
+    orphans = await run_in_threadpool(_orphaned_files, known_paths)
+    for path in orphans:
+        await remove_file(path)
+    return recounted, len(purged), len(orphans)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+import asyncpg
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.database import ASYNC_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# "memory" wakes streams in this worker only; "postgres" relays through
+# LISTEN/NOTIFY so a notification committed by any worker or job reaches
+# every worker's streams.
+NOTIFICATION_BROKER = os.getenv("NOTIFICATION_BROKER", "memory").strip().lower()
+# LISTEN needs a session-level server connection, which PgBouncer in
+# transaction mode does not provide; point this past the bouncer there.
+NOTIFICATION_LISTEN_URL = os.getenv("NOTIFICATION_LISTEN_URL") or ASYNC_DATABASE_URL
+NOTIFY_CHANNEL = "notification_events"
+# User ids per NOTIFY payload, well under PostgreSQL's 8000 byte limit
+_NOTIFY_BATCH = 500
+
+
+class NotificationBroker:
+    """Wakes the notification streams of users whose notifications changed.
+
+    Messages carry only user ids. A woken stream reads what changed from the
+    database, so a coalesced or lost wake-up delays delivery instead of
+    dropping a notification.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Event]] = defaultdict(set)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Event]:
+        """An event set whenever ``user_id``'s notifications change; clear it after waking."""
+        wakeup = asyncio.Event()
+        self._subscribers[user_id].add(wakeup)
+        try:
+            yield wakeup
+        finally:
+            subscribers = self._subscribers[user_id]
+            subscribers.discard(wakeup)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_ids: Iterable[int]) -> None:
+        """Wake this worker's streams for ``user_ids``. Call on the event loop thread."""
+        for user_id in user_ids:
+            for wakeup in self._subscribers.get(user_id, ()):
+                wakeup.set()
+
+    def wake_all(self) -> None:
+        self.publish(list(self._subscribers))
+
+
+class PostgresNotificationBroker(NotificationBroker):
+    """Relays wake-ups between processes through PostgreSQL LISTEN/NOTIFY.
+
+    Publishers NOTIFY inside the committing transaction (see
+    ``_notify_in_transaction``), so PostgreSQL delivers the message only if
+    the notifications were committed. Each worker keeps one listening
+    connection and reconnects with backoff if it drops.
+    """
+
+    def __init__(self, url: str):
+        super().__init__()
+        self._dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        await self._listen()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+            self._reconnect = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(self._dsn)
+        await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        self.publish(int(user_id) for user_id in payload.split(",") if user_id)
+
+    def _on_terminate(self, connection) -> None:
+        if self._stopping or connection is not self._connection:
+            return
+        self._connection = None
+        self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = 1.0
+        while not self._stopping:
+            try:
+                await self._listen()
+            except Exception as exc:
+                logger.warning("Notification listener reconnect failed: %s", exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            # Anything committed while disconnected was missed; streams re-read
+            self.wake_all()
+            return
+
+
+def _create_broker() -> NotificationBroker:
+    if NOTIFICATION_BROKER == "postgres":
+        return PostgresNotificationBroker(NOTIFICATION_LISTEN_URL)
+    if NOTIFICATION_BROKER == "memory":
+        return NotificationBroker()
+    raise RuntimeError(f"Unknown NOTIFICATION_BROKER {NOTIFICATION_BROKER!r}")
+
+
+notification_broker = _create_broker()
+
+
+def publish_after_commit(db, user_ids: Iterable[int]) -> None:
+    """Wake the notification streams of ``user_ids`` once ``db`` commits.
+
+    Nothing is published if the transaction rolls back. ``db`` may be a
+    Session or an AsyncSession.
+    """
+    db.info.setdefault("notified_users", set()).update(user_ids)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_in_transaction(session) -> None:
+    if not isinstance(notification_broker, PostgresNotificationBroker):
+        return
+    user_ids = sorted(session.info.get("notified_users", ()))
+    if not user_ids or session.get_bind().dialect.name != "postgresql":
+        return
+    connection = session.connection()
+    for start in range(0, len(user_ids), _NOTIFY_BATCH):
+        payload = ",".join(str(user_id) for user_id in user_ids[start:start + _NOTIFY_BATCH])
+        connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session) -> None:
+    user_ids = session.info.pop("notified_users", None)
+    if user_ids and not isinstance(notification_broker, PostgresNotificationBroker):
+        notification_broker.publish(user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session, previous_transaction) -> None:
+    session.info.pop("notified_users", None)
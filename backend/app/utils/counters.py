@@ -0,0 +1,114 @@
+from typing import Dict
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.shoutout import ShoutOut
+from app.models.reaction import Reaction
+from app.models.comment import Comment
+
+REACTION_COUNTERS = {
+    "like": ShoutOut.like_count,
+    "clap": ShoutOut.clap_count,
+    "star": ShoutOut.star_count,
+}
+
+
+async def _bump(db: AsyncSession, shoutout_id: int, column, delta: int) -> None:
+    # Applied as ``col = col + delta`` so concurrent writers never lose updates.
+    # updated_at is pinned because a reaction or comment is not an edit.
+    await db.execute(
+        update(ShoutOut)
+        .where(ShoutOut.id == shoutout_id)
+        .values({column: column + delta, ShoutOut.updated_at: ShoutOut.updated_at})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_reaction_count(db: AsyncSession, shoutout_id: int, reaction_type: str, delta: int) -> None:
+    await _bump(db, shoutout_id, REACTION_COUNTERS[reaction_type], delta)
+
+
+async def bump_comment_count(db: AsyncSession, shoutout_id: int, delta: int) -> None:
+    await _bump(db, shoutout_id, ShoutOut.comment_count, delta)
+
+
+def reaction_counts(shoutout: ShoutOut) -> Dict[str, int]:
+    """Reaction counts read from the row, omitting types nobody has used."""
+    counts = {}
+    for reaction_type, column in REACTION_COUNTERS.items():
+        value = getattr(shoutout, column.key) or 0
+        if value:
+            counts[reaction_type] = value
+    return counts
+
+
+def _recount_values():
+    values = {
+        column: select(func.count(Reaction.id))
+        .where(Reaction.shoutout_id == ShoutOut.id, Reaction.type == reaction_type)
+        .scalar_subquery()
+        for reaction_type, column in REACTION_COUNTERS.items()
+    }
+    values[ShoutOut.comment_count] = (
+        select(func.count(Comment.id)).where(Comment.shoutout_id == ShoutOut.id).scalar_subquery()
+    )
+    values[ShoutOut.updated_at] = ShoutOut.updated_at
+    return values
+
+
+def reconcile_shoutout_counters(db: Session, *, batch_size: int = 500) -> int:
+    """Recompute counters from the child tables and fix any drift.
+
+    Walks shoutouts in id order one batch at a time, committing after each
+    batch so the job never holds long locks. Returns the number of rows fixed.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        shoutouts = (
+            db.query(ShoutOut)
+            .filter(ShoutOut.id > last_id)
+            .order_by(ShoutOut.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not shoutouts:
+            return fixed
+        last_id = shoutouts[-1].id
+        ids = [s.id for s in shoutouts]
+
+        actual_reactions = {}
+        rows = (
+            db.query(Reaction.shoutout_id, Reaction.type, func.count(Reaction.id))
+            .filter(Reaction.shoutout_id.in_(ids))
+            .group_by(Reaction.shoutout_id, Reaction.type)
+            .all()
+        )
+        for shoutout_id, reaction_type, count in rows:
+            actual_reactions[(shoutout_id, reaction_type)] = count
+
+        actual_comments = dict(
+            db.query(Comment.shoutout_id, func.count(Comment.id))
+            .filter(Comment.shoutout_id.in_(ids))
+            .group_by(Comment.shoutout_id)
+            .all()
+        )
+
+        drifted_ids = []
+        for shoutout in shoutouts:
+            expected = {
+                column.key: actual_reactions.get((shoutout.id, reaction_type), 0)
+                for reaction_type, column in REACTION_COUNTERS.items()
+            }
+            expected[ShoutOut.comment_count.key] = actual_comments.get(shoutout.id, 0)
+            if any(getattr(shoutout, key) != value for key, value in expected.items()):
+                drifted_ids.append(shoutout.id)
+
+        if drifted_ids:
+            # Recount inside the UPDATE itself so writes racing the scan above are not clobbered
+            db.query(ShoutOut).filter(ShoutOut.id.in_(drifted_ids)).update(
+                _recount_values(), synchronize_session=False
+            )
+            fixed += len(drifted_ids)
+
+        db.commit()
@@ -0,0 +1,120 @@
+import asyncio
+import base64
+import io
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Resized variants generated for uploaded images, by target width in pixels.
+# Every width narrower than the original gets a WebP and a JPEG rendition,
+# plus a tiny inline WebP placeholder for blur-up loading.
+ATTACHMENT_WIDTHS = (320, 640, 1280)
+AVATAR_WIDTHS = (40, 96, 256)
+PLACEHOLDER_WIDTH = 16
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Jobs allowed to wait for a worker before further uploads wait in the handler
+IMAGE_QUEUE_LIMIT = int(os.getenv("IMAGE_QUEUE_LIMIT", str(IMAGE_WORKERS * 4)))
+
+UPLOADS_ROOT = os.path.join(os.getcwd(), "uploads")
+DERIVED_PREFIX = "derived"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _derived_location(source_url: str):
+    """Map ``/uploads/<dir>/<name>.<ext>`` to the directory and URL prefix of its variants."""
+    relative_path = source_url[len("/uploads/"):]
+    stem = os.path.splitext(relative_path)[0]
+    return (
+        os.path.join(UPLOADS_ROOT, DERIVED_PREFIX, *stem.split("/")),
+        f"/uploads/{DERIVED_PREFIX}/{stem}",
+    )
+
+
+def _render_variants(source_path: str, out_dir: str, url_prefix: str, widths: Sequence[int]) -> Dict[str, Any]:
+    # Runs in a worker process; Pillow is imported here so the API process never loads it
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as opened:
+        opened.seek(0)  # first frame of animated images
+        image = ImageOps.exif_transpose(opened)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            flattened = Image.new("RGB", image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.getchannel("A"))
+            image = flattened
+        else:
+            image = image.convert("RGB")
+
+    os.makedirs(out_dir, exist_ok=True)
+    sources = []
+    for width in sorted(set(widths)):
+        if width >= image.width and sources:
+            break
+        width = min(width, image.width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        entry = {"width": width, "height": height}
+        for fmt, ext, options in (
+            ("WEBP", "webp", {"quality": 80, "method": 4}),
+            ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+        ):
+            name = f"w{width}.{ext}"
+            path = os.path.join(out_dir, name)
+            if not os.path.exists(path):
+                # Write then rename so a half-written variant is never served
+                resized.save(f"{path}.part", fmt, **options)
+                os.replace(f"{path}.part", path)
+            entry["webp" if fmt == "WEBP" else "jpeg"] = f"{url_prefix}/{name}"
+        sources.append(entry)
+
+    tiny = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))),
+        Image.Resampling.BILINEAR,
+    )
+    buffer = io.BytesIO()
+    tiny.save(buffer, "WEBP", quality=30)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+    return {"placeholder": placeholder, "sources": sources}
+
+
+def _executor():
+    global _pool, _slots
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        _slots = asyncio.Semaphore(IMAGE_QUEUE_LIMIT)
+    return _pool, _slots
+
+
+async def generate_variants(source_url: str, widths: Sequence[int]) -> Optional[Dict[str, Any]]:
+    """Render resized variants of an uploaded image in the image worker pool.
+
+    ``source_url`` is the public ``/uploads/...`` URL of the original. Returns
+    ``{"placeholder": data_uri, "sources": [{width, height, webp, jpeg}, ...]}``
+    ordered by width, or None if the file could not be processed. Variants
+    that already exist on disk (e.g. for deduplicated blobs) are reused.
+    """
+    out_dir, url_prefix = _derived_location(source_url)
+    source_path = os.path.join(UPLOADS_ROOT, source_url[len("/uploads/"):])
+    pool, slots = _executor()
+    async with slots:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, _render_variants, source_path, out_dir, url_prefix, tuple(widths)
+            )
+        except Exception:
+            logger.warning("Could not generate image variants for %s", source_url, exc_info=True)
+            return None
+
+
+async def remove_variants(source_url: str) -> None:
+    """Delete every variant generated for ``source_url``."""
+    out_dir, _ = _derived_location(source_url)
+    await run_in_threadpool(shutil.rmtree, out_dir, True)
@@ -0,0 +1,151 @@
+"""Optional monthly partitioning of the notifications table (PostgreSQL only).
+
+``python -m app.jobs.partition_notifications`` converts the table once. From
+then on ``python -m app.jobs.purge_notifications`` creates partitions ahead
+of time and drops whole months past NOTIFICATION_RETENTION_DAYS, which is far
+cheaper than deleting their rows. Rows whose month has no partition land in
+a default partition and are moved out when that month's partition is added.
+"""
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.notification import Notification, current_month
+from app.utils.broker import publish_after_commit
+from app.utils.notifications import NOTIFICATION_RETENTION_DAYS, bump_unread_counts
+
+# Months of partitions kept ready beyond the current one
+PARTITIONS_AHEAD = 3
+_DEFAULT_PARTITION = "notifications_default"
+_PARTITION_NAME = re.compile(r"^notifications_p(\d{4})_(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"notifications_p{month:%Y_%m}"
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(await db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications'))"
+    )))
+
+
+async def _partitions(db: AsyncSession) -> Dict[date, str]:
+    names = await db.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'notifications'::regclass"
+    ))
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+async def _add_partition(db: AsyncSession, month: date) -> None:
+    # A partition cannot be created while the default partition holds rows
+    # in its range, so build it standalone, move those rows, then attach.
+    name, start, end = _partition_name(month), month.isoformat(), _add_months(month, 1).isoformat()
+    in_range = f"created_month >= '{start}' AND created_month < '{end}'"
+    await db.execute(text(f"CREATE TABLE {name} (LIKE notifications INCLUDING DEFAULTS)"))
+    await db.execute(text(f"INSERT INTO {name} SELECT * FROM {_DEFAULT_PARTITION} WHERE {in_range}"))
+    await db.execute(text(f"DELETE FROM {_DEFAULT_PARTITION} WHERE {in_range}"))
+    await db.execute(text(f"ALTER TABLE notifications ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+
+
+async def ensure_partitions(db: AsyncSession, *, ahead: int = PARTITIONS_AHEAD) -> int:
+    """Create any missing partitions up to ``ahead`` months from now. Returns how many were created."""
+    existing = await _partitions(db)
+    month = current_month()
+    created = 0
+    for offset in range(ahead + 1):
+        upcoming = _add_months(month, offset)
+        if upcoming not in existing:
+            await _add_partition(db, upcoming)
+            created += 1
+    await db.commit()
+    return created
+
+
+async def drop_expired_partitions(db: AsyncSession) -> int:
+    """Drop partitions whose whole month is past NOTIFICATION_RETENTION_DAYS.
+
+    Unread rows in a dropped partition are released from the unread
+    counters. Returns the number of partitions dropped.
+    """
+    if NOTIFICATION_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_RETENTION_DAYS)).date()
+    dropped = 0
+    for month, name in sorted((await _partitions(db)).items()):
+        if _add_months(month, 1) > cutoff:
+            break
+        # Detaching first takes the locks in the same order as queries on the
+        # table; once detached, nothing else can read or change these rows.
+        await db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+        await db.commit()
+        unread = {
+            (user_id, event_type): count
+            for user_id, event_type, count in await db.execute(text(
+                f"SELECT user_id, event_type, count(*) FROM {name} WHERE NOT is_read GROUP BY user_id, event_type"
+            ))
+        }
+        await bump_unread_counts(db, {key: -count for key, count in unread.items()})
+        publish_after_commit(db, {user_id for user_id, _ in unread})
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        dropped += 1
+    return dropped
+
+
+async def partition_notifications(db: AsyncSession, *, ahead: int = PARTITIONS_AHEAD) -> int:
+    """Rebuild ``notifications`` as a table partitioned by ``created_month``.
+
+    Runs in one transaction that locks the table and copies every row, so
+    plan it for a quiet period. Returns the number of rows copied.
+    """
+    sequence = await db.scalar(text("SELECT pg_get_serial_sequence('notifications', 'id')"))
+    await db.execute(text("LOCK TABLE notifications IN ACCESS EXCLUSIVE MODE"))
+    await db.execute(text(
+        "UPDATE notifications SET created_month = date_trunc('month', created_at AT TIME ZONE 'UTC')::date "
+        "WHERE created_month IS NULL"
+    ))
+    first = await db.scalar(text("SELECT min(created_month) FROM notifications")) or current_month()
+    # Keep the id sequence when the old table is dropped
+    await db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    await db.execute(text("ALTER TABLE notifications RENAME TO notifications_unpartitioned"))
+    await db.execute(text(
+        "CREATE TABLE notifications (LIKE notifications_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_month)"
+    ))
+    await db.execute(text(
+        "ALTER TABLE notifications ALTER COLUMN created_month SET NOT NULL, "
+        "ALTER COLUMN created_month SET DEFAULT date_trunc('month', now() AT TIME ZONE 'UTC')::date"
+    ))
+    await db.execute(text(f"CREATE TABLE {_DEFAULT_PARTITION} PARTITION OF notifications DEFAULT"))
+    month = first
+    while month <= _add_months(current_month(), ahead):
+        await _add_partition(db, month)
+        month = _add_months(month, 1)
+    copied = (await db.execute(text("INSERT INTO notifications SELECT * FROM notifications_unpartitioned"))).rowcount
+    await db.execute(text("DROP TABLE notifications_unpartitioned"))
+
+    # The partition key has to be part of the primary key
+    await db.execute(text("ALTER TABLE notifications ADD CONSTRAINT notifications_pkey PRIMARY KEY (id, created_month)"))
+    for column, on_delete in (("user_id", "CASCADE"), ("actor_id", "SET NULL"), ("previous_actor_id", "SET NULL")):
+        await db.execute(text(
+            f"ALTER TABLE notifications ADD FOREIGN KEY ({column}) REFERENCES users (id) ON DELETE {on_delete}"
+        ))
+    await db.run_sync(lambda session: [index.create(session.connection()) for index in Notification.__table__.indexes])
+    await db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY notifications.id"))
+    await db.commit()
+    return copied
@@ -1,14 +1,193 @@
 import json
-from datetime import datetime
-from typing import Any, Dict, Optional
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from sqlalchemy import String, and_, bindparam, case, cast, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.notification import Notification
+from app.models.notification_unread_count import NotificationUnreadCount
+from app.models.user import User
+from app.utils.broker import publish_after_commit
 
+# (user_id, event_type) -> change in that user's unread notifications of the type
+UnreadDeltas = Mapping[Tuple[int, str], int]
 
-def create_notification(
-    db: Session,
+# Retention enforced by ``python -m app.jobs.purge_notifications``: read
+# notifications are kept this many days, and any notification at most
+# NOTIFICATION_RETENTION_DAYS. 0 keeps them forever.
+NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv("NOTIFICATION_READ_RETENTION_DAYS", "90"))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "365"))
+# Rows per DELETE statement (and transaction) when purging or clearing a
+# user's history, so no single statement locks an unbounded number of rows
+_DELETE_BATCH = 1000
+
+
+def _upsert(db):
+    return (postgresql if db.get_bind().dialect.name == "postgresql" else sqlite).insert
+
+
+async def bump_unread_counts(db: AsyncSession, deltas: UnreadDeltas) -> None:
+    """Apply changes to the unread counters in the current transaction.
+
+    Increments are a single multi-row upsert; decrements never take a
+    counter below zero. Keys are applied in sorted order so concurrent
+    writers lock counter rows in the same order.
+    """
+    table = NotificationUnreadCount.__table__
+    keys = sorted(key for key, delta in deltas.items() if delta)
+    increments = [
+        {"user_id": user_id, "event_type": event_type, "unread": deltas[(user_id, event_type)]}
+        for user_id, event_type in keys if deltas[(user_id, event_type)] > 0
+    ]
+    decrements = [
+        {"b_user_id": user_id, "b_event_type": event_type, "b_delta": -deltas[(user_id, event_type)]}
+        for user_id, event_type in keys if deltas[(user_id, event_type)] < 0
+    ]
+    if increments:
+        statement = _upsert(db)(table).values(increments)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.event_type],
+            set_={"unread": table.c.unread + statement.excluded.unread},
+        ))
+    if decrements:
+        remaining = table.c.unread - bindparam("b_delta")
+        await db.execute(
+            update(table)
+            .where(table.c.user_id == bindparam("b_user_id"), table.c.event_type == bindparam("b_event_type"))
+            .values(unread=case((remaining > 0, remaining), else_=0)),
+            decrements,
+        )
+
+
+# Rows per INSERT statement, well inside the drivers' bind parameter limits
+_INSERT_BATCH = 1000
+
+# High-volume event types whose unread notifications about the same object
+# merge into one row, and the title shown once a row has several actors.
+COALESCED_EVENTS = {
+    "reaction.new": "{actors} reacted to a shoutout",
+}
+
+
+def coalesce_key(event_type: str, reference_type: Optional[str], reference_id: Optional[int]) -> Optional[str]:
+    if event_type not in COALESCED_EVENTS or reference_id is None:
+        return None
+    return f"{event_type}:{reference_type}:{reference_id}"
+
+
+def coalesced_title(notification: Notification) -> str:
+    """Title naming the latest actors, e.g. "Ana, Ben and 11 others reacted to a shoutout"."""
+    template = COALESCED_EVENTS.get(notification.event_type)
+    count = notification.actor_count or 1
+    if template is None or count < 2 or notification.actor is None:
+        return notification.title
+    names = [notification.actor.name]
+    if notification.previous_actor is not None:
+        names.append(notification.previous_actor.name)
+    others = count - len(names)
+    if others <= 0:
+        actors = " and ".join(names)
+    else:
+        actors = f"{', '.join(names)} and {others} other{'s' if others > 1 else ''}"
+    return template.format(actors=actors)
+
+
+def notification_rows(
+    user_ids: Iterable[int],
+    *,
+    event_type: str,
+    title: str,
+    message: Optional[str] = None,
+    actor_id: Optional[int] = None,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[int] = None,
+    payload: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Build rows for the same notification sent to each of ``user_ids``.
+
+    The payload is serialized once and shared by every row.
+    """
+    serialized_payload = json.dumps(payload) if payload else None
+    key = coalesce_key(event_type, reference_type, reference_id)
+    return [
+        {
+            "user_id": user_id,
+            "actor_id": actor_id,
+            "event_type": event_type,
+            "title": title,
+            "message": message,
+            "reference_type": reference_type,
+            "reference_id": reference_id,
+            "payload": serialized_payload,
+            "is_read": False,
+            "coalesce_key": key,
+        }
+        for user_id in user_ids
+    ]
+
+
+async def insert_notification_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """Write notification rows with multi-row INSERTs through Core.
+
+    Rows with a ``coalesce_key`` are upserted: if the recipient already has
+    an unread notification with that key from this month, it absorbs the new one (latest
+    actor and text, distinct actor and event counts, ``updated_at``) instead of a
+    row being added. Its ``created_at`` is kept, so cursors over
+    (created_at, id) stay valid. Unread counters are bumped for added rows only, and the
+    recipients' streams woken, in the same transaction, so this is the only
+    way notifications should be created. Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+    table = Notification.__table__
+    plain = [row for row in rows if not row.get("coalesce_key")]
+    # One row per recipient and key, since a statement may not update a row twice
+    coalescing = sorted(
+        {(row["user_id"], row["coalesce_key"]): row for row in rows if row.get("coalesce_key")}.values(),
+        key=lambda row: (row["user_id"], row["coalesce_key"]),
+    )
+    added = Counter((row["user_id"], row["event_type"]) for row in plain)
+    for start in range(0, len(plain), _INSERT_BATCH):
+        await db.execute(insert(table).values(plain[start:start + _INSERT_BATCH]))
+    for start in range(0, len(coalescing), _INSERT_BATCH):
+        statement = _upsert(db)(table).values(coalescing[start:start + _INSERT_BATCH])
+        new = statement.excluded
+        repeat_actor = new.actor_id == table.c.actor_id
+        # actor_ids is null until the first merge, when only the original actor is known
+        known = func.coalesce(table.c.actor_ids, literal(",") + cast(table.c.actor_id, String) + literal(","))
+        new_actor = cast(new.actor_id, String) + literal(",")
+        seen = known.like(literal("%,") + new_actor + literal("%"))
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.coalesce_key, table.c.created_month],
+            set_={
+                "actor_id": new.actor_id,
+                "previous_actor_id": case((repeat_actor, table.c.previous_actor_id), else_=table.c.actor_id),
+                "actor_ids": case((seen, known), else_=known + new_actor),
+                "actor_count": table.c.actor_count + case((seen, 0), else_=1),
+                "event_count": table.c.event_count + 1,
+                "title": new.title,
+                "message": new.message,
+                "payload": new.payload,
+                "updated_at": func.now(),
+            },
+        ).returning(table.c.user_id, table.c.event_type, table.c.event_count)
+        added.update(
+            (user_id, event_type)
+            for user_id, event_type, event_count in (await db.execute(statement)).all()
+            if event_count == 1
+        )
+    await bump_unread_counts(db, added)
+    publish_after_commit(db, {row["user_id"] for row in rows})
+    return len(plain) + len(coalescing)
+
+
+async def create_notifications_bulk(
+    db: AsyncSession,
+    user_ids: Iterable[int],
     *,
-    user_id: int,
     event_type: str,
     title: str,
     message: Optional[str] = None,
@@ -16,40 +195,193 @@ def create_notification(
     reference_type: Optional[str] = None,
     reference_id: Optional[int] = None,
     payload: Optional[Dict[str, Any]] = None
-) -> Notification:
-    """Persist a notification for a user.
+) -> int:
+    """Notify every user in ``user_ids`` with one INSERT. Returns the number of rows written.
 
     This helper centralizes payload serialization and ensures every notification
     contains the minimal metadata needed for the frontend.
     """
-    serialized_payload = json.dumps(payload) if payload else None
-    notification = Notification(
-        user_id=user_id,
-        actor_id=actor_id,
+    return await insert_notification_rows(db, notification_rows(
+        user_ids,
         event_type=event_type,
         title=title,
         message=message,
+        actor_id=actor_id,
         reference_type=reference_type,
         reference_id=reference_id,
-        payload=serialized_payload,
+        payload=payload,
+    ))
+
+
+async def mark_notifications_read(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    ids: Optional[List[int]] = None,
+    read: bool = True
+) -> int:
+    """Set the read state of ``user_id``'s notifications (all of them, or ``ids``).
+
+    Only rows whose state changes are updated, and the unread counters move
+    by exactly those rows, so overlapping requests cannot count a
+    notification twice. Read rows stop coalescing. Returns the number of
+    notifications changed.
+    """
+    statement = (
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.is_(not read))
+        .values({
+            Notification.is_read: read,
+            Notification.read_at: datetime.utcnow() if read else None,
+            Notification.coalesce_key: None,
+        })
+        .returning(Notification.event_type)
+        .execution_options(synchronize_session=False)
     )
-    db.add(notification)
-    return notification
+    if ids is not None:
+        statement = statement.where(Notification.id.in_(ids))
+    event_types = (await db.scalars(statement)).all()
+    delta = -1 if read else 1
+    await bump_unread_counts(db, {
+        (user_id, event_type): count * delta for event_type, count in Counter(event_types).items()
+    })
+    publish_after_commit(db, [user_id])
+    return len(event_types)
 
 
-def mark_notification_read(notification: Notification, *, read: bool = True) -> None:
-    now = datetime.utcnow()
-    notification.is_read = read
-    notification.read_at = now if read else None
+async def mark_all_notifications_read(db: AsyncSession, *, user_id: int) -> int:
+    return await mark_notifications_read(db, user_id=user_id)
+
+
+async def _delete_notifications(db: AsyncSession, condition, batch_size: int, *, publish: bool = True) -> int:
+    """Delete up to ``batch_size`` notifications matching ``condition``, releasing their unread counts.
+
+    Streams of users who lost unread notifications are woken on commit
+    unless ``publish`` is false.
+    """
+    batch = select(Notification.id).where(condition).order_by(Notification.id).limit(batch_size)
+    rows = (await db.execute(
+        delete(Notification)
+        .where(Notification.id.in_(batch.scalar_subquery()))
+        .returning(Notification.user_id, Notification.event_type, Notification.is_read)
+        .execution_options(synchronize_session=False)
+    )).all()
+    unread = Counter((user_id, event_type) for user_id, event_type, is_read in rows if not is_read)
+    await bump_unread_counts(db, {key: -count for key, count in unread.items()})
+    if publish:
+        publish_after_commit(db, {user_id for user_id, _ in unread})
+    return len(rows)
 
 
-def mark_all_notifications_read(db: Session, *, user_id: int) -> int:
-    updated = (
-        db.query(Notification)
-        .filter(Notification.user_id == user_id, Notification.is_read.is_(False))
-        .update({
-            Notification.is_read: True,
-            Notification.read_at: datetime.utcnow(),
-        }, synchronize_session="fetch")
+async def delete_all_notifications(db: AsyncSession, *, user_id: int, batch_size: int = _DELETE_BATCH) -> int:
+    """Delete all of ``user_id``'s notifications, committing after each batch.
+
+    The user's streams are woken once, when the last batch commits.
+    """
+    deleted = 0
+    while True:
+        count = await _delete_notifications(db, Notification.user_id == user_id, batch_size, publish=False)
+        if count < batch_size:
+            publish_after_commit(db, [user_id])
+        await db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+async def purge_expired_notifications(db: AsyncSession, *, batch_size: int = _DELETE_BATCH) -> int:
+    """Delete notifications past the retention periods, committing after each batch.
+
+    Returns the number of notifications deleted.
+    """
+    now = datetime.now(timezone.utc)
+    expired = []
+    if NOTIFICATION_READ_RETENTION_DAYS > 0:
+        expired.append(and_(
+            Notification.is_read.is_(True),
+            Notification.created_at < now - timedelta(days=NOTIFICATION_READ_RETENTION_DAYS),
+        ))
+    if NOTIFICATION_RETENTION_DAYS > 0:
+        expired.append(Notification.created_at < now - timedelta(days=NOTIFICATION_RETENTION_DAYS))
+    if not expired:
+        return 0
+    purged = 0
+    while True:
+        count = await _delete_notifications(db, or_(*expired), batch_size)
+        await db.commit()
+        purged += count
+        if count < batch_size:
+            return purged
+
+
+async def unread_counts(db: AsyncSession, user_id: int) -> Dict[str, int]:
+    """Unread notifications of ``user_id`` by event type, read from the counters."""
+    rows = await db.execute(
+        select(NotificationUnreadCount.event_type, NotificationUnreadCount.unread)
+        .where(NotificationUnreadCount.user_id == user_id, NotificationUnreadCount.unread > 0)
     )
-    return updated or 0
+    return dict(rows.all())
+
+
+def reconcile_unread_counts(db: Session, *, batch_size: int = 500) -> int:
+    """Recompute unread counters from the notifications table and fix any drift.
+
+    Walks users in id order one batch at a time, committing after each batch
+    so the job never holds long locks. Returns the number of users fixed.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(User.id).filter(User.id > last_id).order_by(User.id.asc()).limit(batch_size).all()
+        ]
+        if not user_ids:
+            return fixed
+        last_id = user_ids[-1]
+
+        actual = {
+            (user_id, event_type): count
+            for user_id, event_type, count in (
+                db.query(Notification.user_id, Notification.event_type, func.count(Notification.id))
+                .filter(Notification.user_id.in_(user_ids), Notification.is_read.is_(False))
+                .group_by(Notification.user_id, Notification.event_type)
+                .all()
+            )
+        }
+        stored = {
+            (user_id, event_type): unread
+            for user_id, event_type, unread in (
+                db.query(NotificationUnreadCount.user_id, NotificationUnreadCount.event_type, NotificationUnreadCount.unread)
+                .filter(NotificationUnreadCount.user_id.in_(user_ids))
+                .all()
+            )
+        }
+        drifted_ids = sorted({
+            user_id for user_id, event_type in actual.keys() | stored.keys()
+            if actual.get((user_id, event_type), 0) != stored.get((user_id, event_type), 0)
+        })
+
+        if drifted_ids:
+            missing = [
+                {"user_id": user_id, "event_type": event_type, "unread": 0}
+                for user_id, event_type in sorted(actual.keys() - stored.keys())
+            ]
+            if missing:
+                db.execute(_upsert(db)(NotificationUnreadCount.__table__).values(missing).on_conflict_do_nothing())
+            # Recount inside the UPDATE itself so writes racing the scan above are not clobbered
+            recount = (
+                select(func.count(Notification.id))
+                .where(
+                    Notification.user_id == NotificationUnreadCount.user_id,
+                    Notification.event_type == NotificationUnreadCount.event_type,
+                    Notification.is_read.is_(False),
+                )
+                .scalar_subquery()
+            )
+            db.query(NotificationUnreadCount).filter(NotificationUnreadCount.user_id.in_(drifted_ids)).update(
+                {NotificationUnreadCount.unread: recount}, synchronize_session=False
+            )
+            fixed += len(drifted_ids)
+
+        db.commit()
@@ -0,0 +1,38 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import DateTime, and_, literal, or_
+from sqlalchemy.dialects import sqlite
+
+# SQLite keeps server-generated timestamps without fractional seconds, so
+# whole-second cursor values are bound in that same format to compare equal.
+_WHOLE_SECOND_TIMESTAMP = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Build an opaque keyset cursor pointing just after ``(created_at, row_id)``."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Return the ``(created_at, id)`` pair encoded in a cursor, or None if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_before(created_column, id_column, position: Tuple[datetime, int]):
+    """Filter for rows that sort after ``position`` in ``created_at DESC, id DESC`` order."""
+    created_at, row_id = position
+    if created_at.microsecond == 0:
+        created_at = literal(created_at, _WHOLE_SECOND_TIMESTAMP)
+    return or_(
+        created_column < created_at,
+        and_(created_column == created_at, id_column < row_id),
+    )
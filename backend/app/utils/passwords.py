@@ -0,0 +1,49 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from app.utils.security import get_password_hash, verify_password
+
+# bcrypt runs in worker processes so a burst of logins cannot stall the event
+# loop. Past PASSWORD_QUEUE_LIMIT waiting jobs, requests get a 503 rather than
+# queueing for seconds behind the ones already accepted.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+# Seconds a rejected client is asked to wait before retrying
+PASSWORD_RETRY_AFTER = 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+    return _pool
+
+
+async def _run(fn, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in requests, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_RETRY_AFTER)},
+        )
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    """``get_password_hash`` in the password worker pool; 503 when the pool is saturated."""
+    return await _run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """``verify_password`` in the password worker pool; 503 when the pool is saturated."""
+    return await _run(verify_password, plain_password, hashed_password)
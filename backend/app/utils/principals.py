@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.models.user import User
+
+# Authenticated users are resolved from a per-process cache keyed by user id.
+# Local changes invalidate an entry as soon as they commit; the TTL bounds
+# staleness for changes made by other worker processes.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot of the authenticated user's row, detached from any session.
+
+    Carries what handlers read about the caller; handlers that change the
+    user load the row with ``get_current_user_record`` instead.
+    """
+
+    id: int
+    email: str
+    name: str
+    department: Optional[str]
+    role: str
+    is_admin: bool
+    is_active: bool
+    avatar_url: Optional[str]
+    avatar_variants: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            department=user.department,
+            role=user.role,
+            is_admin=bool(user.is_admin),
+            is_active=user.is_active,
+            avatar_url=user.avatar_url,
+            avatar_variants=user.avatar_variants,
+        )
+
+
+def token_claims(user: User) -> Dict[str, Any]:
+    """JWT claims identifying ``user``: the id as subject plus the authorization fields.
+
+    The role and department claims are informational for clients. Requests
+    are authorized against the cached principal, so a role or department
+    change applies before the token expires.
+    """
+    return {"sub": str(user.id), "email": user.email, "role": user.role, "department": user.department}
+
+
+class PrincipalCache:
+    """Bounded LRU of principals whose entries expire after ``ttl`` seconds.
+
+    Every invalidation bumps a generation counter. A principal loaded while
+    an invalidation happened is not stored, so a read that raced a commit
+    cannot put the old row back into the cache.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[float, Principal]]" = OrderedDict()
+        self.generation = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal, generation: int) -> None:
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[principal.id] = (time.monotonic() + self._ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_SIZE)
+
+
+async def resolve_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """The principal for ``user_id``, from the cache or with one primary key lookup."""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    generation = principal_cache.generation
+    user = await db.get(User, user_id)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(principal, generation)
+    return principal
+
+
+async def resolve_principal_by_email(db: AsyncSession, email: str) -> Optional[Principal]:
+    """Resolve tokens issued with the email as subject; cached under the user id."""
+    generation = principal_cache.generation
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(principal, generation)
+    return principal
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target) -> None:
+    principal_cache.invalidate(target.id)
+    # Again after commit: until then other sessions still read the old row
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session) -> None:
+    for user_id in session.info.pop("changed_principals", ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_principals(session, previous_transaction) -> None:
+    session.info.pop("changed_principals", None)
@@ -0,0 +1,156 @@
+from typing import List, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Full-text search over ShoutOut.message and Comment.content.
+#
+# PostgreSQL: a generated ``search_vector`` tsvector column on each table with
+# a GIN index. SQLite: FTS5 tables keyed by rowid = source row id, kept in
+# sync by triggers. Neither structure is part of the ORM models; both are
+# created idempotently at startup by ensure_search_index.
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE shoutouts ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(message, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_shoutouts_search_vector ON shoutouts USING GIN (search_vector)",
+    """
+    ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_comments_search_vector ON comments USING GIN (search_vector)",
+]
+
+_SQLITE_SOURCES = {
+    # fts table: (source table, text column)
+    "shoutouts_fts": ("shoutouts", "message"),
+    "comments_fts": ("comments", "content"),
+}
+
+
+def _sqlite_ddl(fts_table: str, source: str, column: str) -> List[str]:
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({column}, tokenize='porter unicode61')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {source} BEGIN
+            INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {source} BEGIN
+            UPDATE {fts_table} SET {column} = new.{column} WHERE rowid = new.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {source} BEGIN
+            DELETE FROM {fts_table} WHERE rowid = old.id;
+        END
+        """,
+    ]
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the dialect-specific full-text structures if they are missing."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for statement in _POSTGRES_DDL:
+                conn.execute(text(statement))
+        elif dialect == "sqlite":
+            existing = set(inspect(conn).get_table_names())
+            for fts_table, (source, column) in _SQLITE_SOURCES.items():
+                for statement in _sqlite_ddl(fts_table, source, column):
+                    conn.execute(text(statement))
+                if fts_table not in existing:
+                    # First run: index rows written before the triggers existed
+                    conn.execute(text(
+                        f"INSERT INTO {fts_table}(rowid, {column}) SELECT id, {column} FROM {source}"
+                    ))
+
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+_POSTGRES_SEARCH = """
+WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query),
+hits AS (
+    SELECT 'shoutout' AS kind, s.id AS shoutout_id, NULL::integer AS comment_id,
+           s.message AS body, ts_rank(s.search_vector, q.query) AS rank, s.created_at
+    FROM shoutouts s, q
+    WHERE s.search_vector @@ q.query
+    UNION ALL
+    SELECT 'comment', c.shoutout_id, c.id, c.content, ts_rank(c.search_vector, q.query), c.created_at
+    FROM comments c, q
+    WHERE c.search_vector @@ q.query
+),
+page AS (
+    SELECT * FROM hits
+    WHERE :all_departments OR EXISTS (
+        SELECT 1 FROM department_timelines t
+        WHERE t.shoutout_id = hits.shoutout_id AND t.department = :department
+    )
+    ORDER BY rank DESC, created_at DESC, shoutout_id DESC, comment_id DESC NULLS FIRST
+    LIMIT :limit OFFSET :offset
+)
+SELECT page.kind, page.shoutout_id, page.comment_id, page.rank, page.created_at,
+       ts_headline('english', page.body, q.query, 'MaxFragments=2, MinWords=5, MaxWords=20, StartSel="", StopSel=""') AS snippet
+FROM page, q
+ORDER BY page.rank DESC, page.created_at DESC, page.shoutout_id DESC, page.comment_id DESC NULLS FIRST
+"""
+
+_SQLITE_SEARCH = """
+WITH hits AS (
+    SELECT 'shoutout' AS kind, s.id AS shoutout_id, NULL AS comment_id,
+           snippet(shoutouts_fts, 0, '', '', '...', 20) AS snippet,
+           -bm25(shoutouts_fts) AS rank, s.created_at
+    FROM shoutouts_fts JOIN shoutouts s ON s.id = shoutouts_fts.rowid
+    WHERE shoutouts_fts MATCH :query
+    UNION ALL
+    SELECT 'comment', c.shoutout_id, c.id,
+           snippet(comments_fts, 0, '', '', '...', 20),
+           -bm25(comments_fts), c.created_at
+    FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid
+    WHERE comments_fts MATCH :query
+)
+SELECT kind, shoutout_id, comment_id, rank, created_at, snippet FROM hits
+WHERE :all_departments OR EXISTS (
+    SELECT 1 FROM department_timelines t
+    WHERE t.shoutout_id = hits.shoutout_id AND t.department = :department
+)
+ORDER BY rank DESC, created_at DESC, shoutout_id DESC, comment_id DESC
+LIMIT :limit OFFSET :offset
+"""
+
+
+def search_content(
+    db: Session,
+    query: str,
+    *,
+    department: Optional[str],
+    all_departments: bool,
+    limit: int,
+    offset: int,
+):
+    """Ranked matches across shoutout messages and comments.
+
+    Unless ``all_departments`` is set, only content on shoutouts in the
+    caller's department timeline is returned, mirroring the feed's visibility.
+    """
+    dialect = db.get_bind().dialect.name
+    params = {
+        "department": department,
+        "all_departments": all_departments,
+        "limit": limit,
+        "offset": offset,
+    }
+    if dialect == "postgresql":
+        statement, params["query"] = _POSTGRES_SEARCH, query
+    elif dialect == "sqlite":
+        statement, params["query"] = _SQLITE_SEARCH, _fts5_query(query)
+    else:
+        raise NotImplementedError(f"Full-text search is not available on {dialect}")
+    return db.execute(text(statement), params).mappings().all()
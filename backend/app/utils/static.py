@@ -0,0 +1,151 @@
+import os
+import re
+from typing import Optional, Tuple
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+from app.utils.http_cache import etag_matches, make_etag
+
+# Every stored upload has a unique, never-rewritten name (content hash or
+# random token), so responses can be cached for a year without revalidation.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# When set (e.g. "/internal-uploads/"), responses carry X-Accel-Redirect to
+# that prefix and an nginx front end sends the file itself with sendfile.
+UPLOADS_ACCEL_REDIRECT = os.getenv("UPLOADS_ACCEL_REDIRECT")
+
+_BLOB_NAME = re.compile(r"^blobs/[0-9a-f]{2}/([0-9a-f]{64})(?:-[0-9a-f]+)?\.[^/]*$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive (start, end) of a single byte range, or (-1, -1) if unsatisfiable.
+
+    None means the header should be ignored and the full file sent
+    (malformed or multi-range requests, or a last byte before the first;
+    RFC 9110 section 14.1.1).
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return (-1, -1)
+        return (max(0, size - length), size - 1)
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return (-1, -1)
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end)
+
+
+class UploadFileResponse(FileResponse):
+    """FileResponse that can send a byte range and uses zero-copy send when offered.
+
+    Servers implementing the ASGI ``http.response.zerocopysend`` extension get
+    the open file descriptor; others receive the range in 64 KiB chunks.
+    """
+
+    def __init__(self, *args, offset: int = 0, count: Optional[int] = None, **kwargs):
+        self.offset = offset
+        self.count = count
+        super().__init__(*args, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.count if self.count is not None else self.stat_result.st_size - self.offset
+        if self.send_header_only or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.offset,
+                    "count": count,
+                    "more_body": False,
+                })
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; close the body rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadsStaticFiles(StaticFiles):
+    """Serves /uploads with immutable caching, strong ETags and byte ranges."""
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        blob = _BLOB_NAME.match(relative_path)
+        # Blob names are their SHA-256; other uploads are never rewritten in place
+        etag = f'"{blob.group(1)}"' if blob else make_etag(
+            relative_path, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+        )
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        if UPLOADS_ACCEL_REDIRECT:
+            # nginx answers ranges and conditional requests from the file itself
+            headers["X-Accel-Redirect"] = UPLOADS_ACCEL_REDIRECT.rstrip("/") + "/" + relative_path
+            return Response(status_code=200, headers=headers)
+
+        size = stat_result.st_size
+        byte_range = None
+        range_header = request_headers.get("range")
+        if range_header is not None and status_code == 200 and scope["method"] == "GET":
+            if_range = request_headers.get("if-range")
+            # If-Range needs a strong match; a stale validator gets the whole file
+            if if_range is None or if_range.strip() == etag:
+                byte_range = _parse_range(range_header, size)
+
+        if byte_range == (-1, -1):
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return UploadFileResponse(
+                full_path,
+                status_code=206,
+                headers=headers,
+                stat_result=stat_result,
+                method=scope["method"],
+                offset=start,
+                count=end - start + 1,
+            )
+        return UploadFileResponse(
+            full_path, status_code=status_code, headers=headers, stat_result=stat_result, method=scope["method"]
+        )
@@ -0,0 +1,66 @@
+from typing import List
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.models.department_timeline import DepartmentTimeline
+from app.models.shoutout import ShoutOut, ShoutOutRecipient
+from app.models.user import User
+
+
+def fan_out_shoutouts(db: Session, shoutout_ids: List[int]) -> None:
+    """Add shoutouts to the timeline of each department their recipients belong to."""
+    if not shoutout_ids:
+        return
+    # created_at is copied from the shoutout row so both sort keys match exactly
+    db.execute(
+        insert(DepartmentTimeline).from_select(
+            ["department", "shoutout_id", "created_at"],
+            select(User.department, ShoutOut.id, ShoutOut.created_at)
+            .join(ShoutOutRecipient, ShoutOutRecipient.shoutout_id == ShoutOut.id)
+            .join(User, ShoutOutRecipient.recipient_id == User.id)
+            .where(ShoutOut.id.in_(shoutout_ids), User.department.isnot(None))
+            .distinct(),
+        )
+    )
+
+
+def rebuild_timelines(db: Session, shoutout_ids: List[int]) -> None:
+    """Recompute timeline rows for the given shoutouts from their recipients' current departments."""
+    if not shoutout_ids:
+        return
+    db.query(DepartmentTimeline).filter(DepartmentTimeline.shoutout_id.in_(shoutout_ids)).delete(
+        synchronize_session=False
+    )
+    fan_out_shoutouts(db, shoutout_ids)
+
+
+def rebuild_timelines_for_recipient(db: Session, user_id: int) -> None:
+    """Re-home every shoutout a user received, e.g. after their department changed."""
+    shoutout_ids = [
+        shoutout_id
+        for (shoutout_id,) in db.query(ShoutOutRecipient.shoutout_id)
+        .filter(ShoutOutRecipient.recipient_id == user_id)
+        .distinct()
+        .all()
+    ]
+    rebuild_timelines(db, shoutout_ids)
+
+
+def backfill_department_timelines(db: Session, *, batch_size: int = 500) -> int:
+    """Rebuild the timeline of every shoutout in id-ordered batches. Returns shoutouts processed."""
+    processed = 0
+    last_id = 0
+    while True:
+        shoutout_ids = [
+            shoutout_id
+            for (shoutout_id,) in db.query(ShoutOut.id)
+            .filter(ShoutOut.id > last_id)
+            .order_by(ShoutOut.id.asc())
+            .limit(batch_size)
+            .all()
+        ]
+        if not shoutout_ids:
+            return processed
+        rebuild_timelines(db, shoutout_ids)
+        db.commit()
+        processed += len(shoutout_ids)
+        last_id = shoutout_ids[-1]
@@ -0,0 +1,161 @@
+import bisect
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+from sqlalchemy import case, event, func, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app.models.user import User
+
+# Serve typeahead lookups from an in-process sorted prefix index instead of SQL.
+TYPEAHEAD_IN_MEMORY = os.getenv("TYPEAHEAD_IN_MEMORY", "false").strip().lower() in {"1", "true", "yes", "on"}
+# Upper bound on staleness for changes made by other worker processes.
+TYPEAHEAD_REFRESH_SECONDS = int(os.getenv("TYPEAHEAD_REFRESH_SECONDS", "60"))
+
+# (id, name, avatar_url, avatar_variants, department)
+Suggestion = Tuple[int, str, Optional[str], Optional[str], Optional[str]]
+
+# Set by ensure_typeahead_index when ix_users_name_trgm exists; only then can
+# SQL lookups afford infix matches.
+_trigram_index = False
+
+
+def ensure_typeahead_index(engine: Engine) -> None:
+    """Create PostgreSQL indexes for name lookups.
+
+    A text_pattern_ops index serves the ``lower(name) LIKE 'q%'`` full-name
+    prefix lookup. When the pg_trgm extension is available, a trigram GIN
+    index also serves the ``LIKE '% q%'`` word-prefix and ``LIKE '%q%'``
+    infix lookups, and suggest_users returns infix matches too; without it
+    infix matches are left out, and TYPEAHEAD_IN_MEMORY avoids the filter
+    pass the word-prefix lookup still needs.
+    """
+    global _trigram_index
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_users_name_prefix ON users (lower(name) text_pattern_ops)"
+        ))
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING GIN (lower(name) gin_trgm_ops)"
+            ))
+    except DBAPIError:
+        # Extension not installed or not permitted for this role
+        pass
+    with engine.connect() as conn:
+        _trigram_index = conn.execute(text(
+            "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_users_name_trgm'"
+        )).first() is not None
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _sql_suggestions(db: Session, query: str, department: Optional[str], limit: int) -> List[Suggestion]:
+    lowered = func.lower(User.name)
+    escaped = _escape_like(query.lower())
+    prefix = lowered.like(f"{escaped}%", escape="\\")
+    word_prefix = lowered.like(f"% {escaped}%", escape="\\")
+    rank = case((prefix, 0), (word_prefix, 1), else_=2)
+    matches = lowered.like(f"%{escaped}%", escape="\\") if _trigram_index else or_(prefix, word_prefix)
+    rows = (
+        db.query(User.id, User.name, User.avatar_url, User.avatar_variants, User.department)
+        .filter(User.is_active.is_(True), matches)
+    )
+    if department:
+        rows = rows.filter(User.department == department)
+    return [tuple(row) for row in rows.order_by(rank, lowered, User.id).limit(limit).all()]
+
+
+class PrefixIndex:
+    """Sorted in-process index of active users keyed by full name and by each name word.
+
+    Rebuilt lazily from the database after a local user change or once the
+    refresh interval has elapsed. The rebuild lock is never waited on: while
+    one request rebuilds, others use the previous index, or SQL if there is
+    none yet. Blocking would stall the event loop the rebuild runs on.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self._refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, int, int]] = []  # (key, rank, user id)
+        self._users = {}
+        self._built_at = 0.0
+        self._stale = True
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def _ensure_fresh(self, db: Session) -> bool:
+        if not self._stale and time.monotonic() - self._built_at < self._refresh_seconds:
+            return True
+        if not self._lock.acquire(blocking=False):
+            return self._built_at > 0
+        try:
+            self._stale = False
+            rows = (
+                db.query(User.id, User.name, User.avatar_url, User.avatar_variants, User.department)
+                .filter(User.is_active.is_(True))
+                .all()
+            )
+            keys, users = [], {}
+            for row in rows:
+                users[row.id] = tuple(row)
+                lowered = row.name.lower()
+                keys.append((lowered, 0, row.id))
+                for word in lowered.split()[1:]:
+                    keys.append((word, 1, row.id))
+            keys.sort()
+            self._keys, self._users = keys, users
+            self._built_at = time.monotonic()
+            return True
+        finally:
+            self._lock.release()
+
+    def lookup(self, db: Session, query: str, department: Optional[str], limit: int) -> Optional[List[Suggestion]]:
+        """Return suggestions, or None if no index has been built yet."""
+        if not self._ensure_fresh(db):
+            return None
+        keys, users = self._keys, self._users
+        prefix = query.lower()
+        start = bisect.bisect_left(keys, (prefix,))
+        matches = {}
+        for key, rank, user_id in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            user = users[user_id]
+            if department and user[4] != department:
+                continue
+            matches[user_id] = min(rank, matches.get(user_id, rank))
+        ordered = sorted(matches, key=lambda user_id: (matches[user_id], users[user_id][1].lower(), user_id))
+        return [users[user_id] for user_id in ordered[:limit]]
+
+
+prefix_index = PrefixIndex(TYPEAHEAD_REFRESH_SECONDS)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_prefix_index(mapper, connection, target) -> None:
+    prefix_index.invalidate()
+
+
+def suggest_users(db: Session, query: str, *, department: Optional[str], limit: int) -> List[Suggestion]:
+    """Name suggestions ranked full-name prefix first, then word prefix, then infix.
+
+    Infix matches come only from SQL, and only when the trigram index exists.
+    """
+    if TYPEAHEAD_IN_MEMORY:
+        suggestions = prefix_index.lookup(db, query, department, limit)
+        if suggestions is not None:
+            return suggestions
+    return _sql_suggestions(db, query, department, limit)
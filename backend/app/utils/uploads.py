@@ -0,0 +1,46 @@
+import os
+from typing import BinaryIO, Optional
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Bytes copied per read/write; bounds the memory an upload holds at once
+CHUNK_SIZE = 64 * 1024
+
+
+def _copy_limited(source: BinaryIO, dest_path: str, max_size: int, hasher) -> Optional[int]:
+    source.seek(0)
+    written = 0
+    with open(dest_path, "wb") as out_file:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                return written
+            written += len(chunk)
+            if written > max_size:
+                break
+            if hasher is not None:
+                hasher.update(chunk)
+            out_file.write(chunk)
+    os.remove(dest_path)
+    return None
+
+
+async def save_upload(upload: UploadFile, dest_path: str, *, max_size: int, hasher=None) -> Optional[int]:
+    """Stream an upload to ``dest_path`` in fixed-size chunks on the thread pool.
+
+    Returns the number of bytes written, or None when the file is larger than
+    ``max_size``; nothing is left on disk in that case. Files whose size the
+    multipart parser already knows are rejected without being read. A
+    ``hashlib`` object passed as ``hasher`` is fed every chunk written.
+    """
+    if upload.size is not None and upload.size > max_size:
+        return None
+    return await run_in_threadpool(_copy_limited, upload.file, dest_path, max_size, hasher)
+
+
+async def remove_file(path: str) -> None:
+    """Delete ``path`` on the thread pool, ignoring files that are already gone."""
+    try:
+        await run_in_threadpool(os.remove, path)
+    except OSError:
+        pass
@@ -0,0 +1,228 @@
+"""Helpers shared by the HTTP benchmarks.
+
+Each benchmark runs the app under uvicorn in a subprocess against a
+dedicated PostgreSQL database whose public schema is dropped and recreated
+first, so never point ``--database-url`` at data you want to keep.
+``--app-dir`` selects the ``backend/`` directory to serve, which lets the
+same script measure an older checkout (e.g. a ``git worktree``).
+"""
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Iterator, List, Tuple
+
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "pw"
+
+_SEED_USERS = """
+import sys
+import app.models
+from app.database import Base, SessionLocal, engine
+from app.models.user import User
+from app.utils.security import get_password_hash
+
+Base.metadata.create_all(bind=engine)
+db = SessionLocal()
+hashed = get_password_hash(sys.argv[1])
+for i in range(int(sys.argv[2])):
+    db.add(User(
+        email=f"bench{i}@example.com", name=f"Bench {i}", hashed_password=hashed, department="Eng",
+        role="employee", is_active=True, email_verified=True, company_verified=True,
+    ))
+db.commit()
+"""
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database-url", required=True, help="PostgreSQL database to wipe and use")
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend/ directory to serve (default: this tree)")
+    parser.add_argument("--port", type=int, default=8765)
+
+
+def reset_database(url: str) -> None:
+    if not url.startswith("postgresql"):
+        raise SystemExit("The benchmarks need a PostgreSQL --database-url")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    engine.dispose()
+
+
+def _app_env(app_dir: str, url: str, **overrides: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=app_dir, DATABASE_URL=url, RATE_LIMIT_ENABLED="false")
+    env.pop("ASYNC_DATABASE_URL", None)
+    env.update(overrides)
+    return env
+
+
+def seed_users(app_dir: str, url: str, count: int) -> None:
+    """Create the app's tables and ``count`` verified users, bench0@example.com onwards."""
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run(
+            [sys.executable, "-c", _SEED_USERS, PASSWORD, str(count)],
+            cwd=workdir, env=_app_env(app_dir, url), check=True,
+        )
+
+
+@contextlib.contextmanager
+def serve(app_dir: str, url: str, port: int, **env: str) -> Iterator[str]:
+    """Run one uvicorn worker for ``app_dir`` and yield its base URL."""
+    with tempfile.TemporaryDirectory() as workdir, open(os.path.join(workdir, "server.log"), "w+") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=workdir, env=_app_env(app_dir, url, **env), stdout=log, stderr=subprocess.STDOUT,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    log.seek(0)
+                    raise RuntimeError(f"Server did not start:\n{log.read()}")
+                try:
+                    if httpx.get(f"{base_url}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.2)
+            yield base_url
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                # A worker stuck on a blocked event loop ignores SIGTERM
+                server.kill()
+                server.wait()
+
+
+async def _forward(reader, writer, delay: float) -> None:
+    # Chunks are written in order, each ``delay`` seconds after it was read
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def send():
+        while True:
+            due, data = await queue.get()
+            if data is None:
+                break
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    sender = asyncio.create_task(send())
+    try:
+        while data := await reader.read(65536):
+            queue.put_nowait((loop.time() + delay, data))
+    except ConnectionError:
+        pass
+    queue.put_nowait((0.0, None))
+    with contextlib.suppress(ConnectionError):
+        await sender
+
+
+def _run_proxy(listener: socket.socket, upstream: Tuple[str, ...], delay: float) -> None:
+    async def handle(client_reader, client_writer):
+        if len(upstream) == 1:
+            server_reader, server_writer = await asyncio.open_unix_connection(upstream[0])
+        else:
+            server_reader, server_writer = await asyncio.open_connection(upstream[0], int(upstream[1]))
+        # Only replies are delayed, which adds one round trip to every query
+        await asyncio.gather(
+            _forward(client_reader, server_writer, 0.0),
+            _forward(server_reader, client_writer, delay),
+        )
+
+    async def main():
+        server = await asyncio.start_server(handle, sock=listener)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+@contextlib.contextmanager
+def latency_proxy(url: str, latency_ms: float) -> Iterator[str]:
+    """Yield a URL for ``url``'s database that adds ``latency_ms`` to every round trip.
+
+    Stands in for a database on another host; with 0 the URL is returned as is.
+    """
+    if latency_ms <= 0:
+        yield url
+        return
+    parsed = make_url(url)
+    socket_dir = parsed.query.get("host")
+    if socket_dir:
+        upstream = (os.path.join(socket_dir, f".s.PGSQL.{parsed.port or 5432}"),)
+    else:
+        upstream = (parsed.host or "localhost", str(parsed.port or 5432))
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(128)
+    proxy = multiprocessing.get_context("fork").Process(
+        target=_run_proxy, args=(listener, upstream, latency_ms / 1000), daemon=True
+    )
+    proxy.start()
+    try:
+        proxied = parsed.difference_update_query(["host"]).set(host="127.0.0.1", port=listener.getsockname()[1])
+        yield proxied.render_as_string(hide_password=False)
+    finally:
+        proxy.terminate()
+        proxy.join()
+        listener.close()
+
+
+def login(base_url: str, index: int) -> dict:
+    """Authorization headers for the ``index``-th seeded user."""
+    response = httpx.post(
+        f"{base_url}/api/auth/login",
+        json={"email": f"bench{index}@example.com", "password": PASSWORD},
+        timeout=60,
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_load(
+    base_url: str, path: str, headers: dict, clients: int, total: int, *, timeout: float = 30
+) -> Tuple[float, List[float]]:
+    """Send ``total`` GETs from ``clients`` concurrent clients. Returns (requests/s, latencies in ms).
+
+    Raises httpx.TimeoutException when a request takes longer than ``timeout`` seconds.
+    """
+    latencies: List[float] = []
+    remaining = total
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return total / elapsed, latencies
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,128 @@
+"""Shared fixtures for the API tests.
+
+Tests run against a throwaway SQLite database unless TEST_DATABASE_URL points
+at a PostgreSQL database, whose public schema is dropped and recreated first.
+Run from ``backend/`` with ``python -m pytest``.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+_WORKDIR = tempfile.mkdtemp(prefix="bgboard-tests-")
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_WORKDIR}/test.db"
+
+# Configure the app before it is imported: it binds its engines and creates
+# tables at import time, and writes uploads relative to the working directory.
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["NOTIFICATION_BROKER"] = "memory"
+os.chdir(_WORKDIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if TEST_DATABASE_URL.startswith("postgresql"):
+    _reset = create_engine(TEST_DATABASE_URL)
+    with _reset.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    _reset.dispose()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.database import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils.security import get_password_hash  # noqa: E402
+
+PASSWORD = "pw"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def users():
+    """Ten active users in Eng (users[0] is an admin) and two in Ops."""
+    db = SessionLocal()
+    hashed = get_password_hash(PASSWORD)
+    created = [
+        User(
+            email=f"user{i}@example.com", name=f"User {i}", hashed_password=hashed,
+            department="Eng" if i < 10 else "Ops", role="admin" if i == 0 else "employee",
+            is_active=True, email_verified=True, company_verified=True,
+        )
+        for i in range(12)
+    ]
+    db.add_all(created)
+    db.commit()
+    ids = [user.id for user in created]
+    db.close()
+    return ids
+
+
+@pytest.fixture(scope="session")
+def auth(client, users):
+    """``auth(i)`` returns Authorization headers for the i-th seeded user."""
+    tokens = {}
+
+    def headers(index: int) -> dict:
+        if index not in tokens:
+            response = client.post("/api/auth/login", json={"email": f"user{index}@example.com", "password": PASSWORD})
+            assert response.status_code == 200, response.text
+            tokens[index] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return tokens[index]
+
+    return headers
+
+
+@pytest.fixture(scope="session")
+def make_user(client, users):
+    """``make_user(department)`` adds a fresh verified employee and returns ``(id, headers)``.
+
+    For tests that need a user no other test has posted to or notified.
+    """
+    hashed = get_password_hash(PASSWORD)
+    numbers = itertools.count()
+
+    def create(department: str = "Eng"):
+        email = f"fresh{next(numbers)}@example.com"
+        db = SessionLocal()
+        user = User(
+            email=email, name=email.split("@")[0].title(), hashed_password=hashed, department=department,
+            role="employee", is_active=True, email_verified=True, company_verified=True,
+        )
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        db.close()
+        response = client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return create
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@pytest.fixture
+def count_statements():
+    """Counts SQL statements sent by both the sync and the async engine."""
+    counter = StatementCounter()
+    targets = (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", counter)
+    yield counter
+    for target in targets:
+        event.remove(target, "before_cursor_execute", counter)
@@ -0,0 +1,85 @@
+"""Attachment blobs: image variants, and file removal only once the purge that frees them commits."""
+import io
+import os
+
+from PIL import Image
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.attachment_blob import AttachmentBlob
+from app.models.shoutout import ShoutOut
+from app.utils import attachments
+
+
+def _post_with_file(client, users, auth, content):
+    response = client.post(
+        "/api/shoutouts",
+        data={"message": "with a file", "recipient_ids": [users[2]]},
+        files=[("files", ("notes.pdf", content, "application/pdf"))],
+        headers=auth(1),
+    )
+    assert response.status_code == 200, response.text
+    shoutout = response.json()
+    url = shoutout["attachments"][0]["url"]
+    return shoutout["id"], os.path.join(attachments.UPLOADS_ROOT, url[len("/uploads/"):])
+
+
+async def _release_and_roll_back(shoutout_id):
+    async with AsyncSessionLocal() as db:
+        shoutout = await db.get(ShoutOut, shoutout_id)
+        files = list(await shoutout.awaitable_attrs.attachments)
+        await db.delete(shoutout)
+        await db.flush()
+        released = await attachments.release_attachments(db, files)
+        await db.rollback()
+        return released
+
+
+async def _blob_paths(content_path):
+    sha = os.path.basename(content_path).split("-")[0]
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(select(AttachmentBlob.path).where(AttachmentBlob.sha256 == sha))).all()
+
+
+def test_rolled_back_release_keeps_the_file(client, users, auth):
+    shoutout_id, path = _post_with_file(client, users, auth, b"%PDF-1.4 rolled back")
+    released = client.portal.call(_release_and_roll_back, shoutout_id)
+    assert len(released) == 1
+    assert os.path.exists(path)
+    assert len(client.portal.call(_blob_paths, path)) == 1
+
+    response = client.delete(f"/api/shoutouts/{shoutout_id}", headers=auth(1))
+    assert response.status_code == 200, response.text
+    assert not os.path.exists(path)
+    assert client.portal.call(_blob_paths, path) == []
+
+
+def test_uploading_purged_content_again_uses_a_new_path(client, users, auth):
+    content = b"%PDF-1.4 uploaded twice"
+    first_id, first_path = _post_with_file(client, users, auth, content)
+    assert client.delete(f"/api/shoutouts/{first_id}", headers=auth(1)).status_code == 200
+    second_id, second_path = _post_with_file(client, users, auth, content)
+    assert second_path != first_path
+    assert os.path.exists(second_path)
+    assert client.delete(f"/api/shoutouts/{second_id}", headers=auth(1)).status_code == 200
+
+
+def test_image_upload_returns_variants_under_derived(client, users, auth):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), "blue").save(buffer, format="PNG")
+    response = client.post(
+        "/api/shoutouts",
+        data={"message": "with an image", "recipient_ids": [users[2]]},
+        files=[("files", ("wide.png", buffer.getvalue(), "image/png"))],
+        headers=auth(1),
+    )
+    assert response.status_code == 200, response.text
+    variants = response.json()["attachments"][0]["variants"]
+    assert [source["width"] for source in variants["sources"]] == [320, 640]
+    for source in variants["sources"]:
+        for url in (source["webp"], source["jpeg"]):
+            assert url.startswith("/uploads/derived/blobs/")
+            assert os.path.exists(os.path.join(attachments.UPLOADS_ROOT, url[len("/uploads/"):]))
+
+    feed = client.get("/api/shoutouts", params={"limit": 1}, headers=auth(1)).json()
+    assert feed[0]["attachments"][0]["variants"] == variants
@@ -0,0 +1,48 @@
+"""Replacing an avatar removes the old file only after the new one is saved."""
+import io
+import os
+
+import pytest
+from PIL import Image
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _upload(client, auth):
+    response = client.post(
+        "/api/users/me/avatar", files={"avatar": ("me.png", _png(), "image/png")}, headers=auth(4)
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["avatar_url"]
+
+
+def _path(url):
+    return os.path.join(os.getcwd(), "uploads", url[len("/uploads/"):])
+
+
+def test_replacing_an_avatar_removes_the_old_file(client, auth):
+    old_url = _upload(client, auth)
+    new_url = _upload(client, auth)
+    assert new_url != old_url
+    assert os.path.exists(_path(new_url))
+    assert not os.path.exists(_path(old_url))
+
+
+def test_failed_commit_keeps_the_old_avatar(client, auth, monkeypatch):
+    old_url = _upload(client, auth)
+
+    async def fail(self):
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(AsyncSession, "commit", fail)
+    with pytest.raises(RuntimeError):
+        _upload(client, auth)
+    monkeypatch.undo()
+
+    assert os.path.exists(_path(old_url))
+    assert client.get("/api/users/me", headers=auth(4)).json()["avatar_url"] == old_url
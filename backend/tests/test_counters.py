@@ -0,0 +1,91 @@
+"""Denormalized reaction and comment counters follow the rows they count."""
+import pytest
+from sqlalchemy import func, select, update
+
+from app.database import SessionLocal
+from app.models.comment import Comment
+from app.models.reaction import Reaction
+from app.models.shoutout import ShoutOut
+from app.utils.counters import REACTION_COUNTERS, reconcile_shoutout_counters
+
+
+@pytest.fixture(scope="module")
+def shoutout_id(client, users, auth):
+    response = client.post(
+        "/api/shoutouts/batch",
+        json={"items": [{"message": "counted", "recipient_ids": [users[6]]}]},
+        headers=auth(5),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["results"][0]["shoutout_id"]
+
+
+def _counters(shoutout_id):
+    """(stored, actual) counters, keyed like the ShoutOut columns."""
+    db = SessionLocal()
+    try:
+        shoutout = db.get(ShoutOut, shoutout_id)
+        stored = {column.key: getattr(shoutout, column.key) for column in REACTION_COUNTERS.values()}
+        stored["comment_count"] = shoutout.comment_count
+        actual = {
+            column.key: db.scalar(select(func.count(Reaction.id)).where(
+                Reaction.shoutout_id == shoutout_id, Reaction.type == reaction_type
+            ))
+            for reaction_type, column in REACTION_COUNTERS.items()
+        }
+        actual["comment_count"] = db.scalar(select(func.count(Comment.id)).where(Comment.shoutout_id == shoutout_id))
+        return stored, actual
+    finally:
+        db.close()
+
+
+def _assert_consistent(shoutout_id, **expected):
+    stored, actual = _counters(shoutout_id)
+    assert stored == actual
+    for key, value in expected.items():
+        assert stored[key] == value
+
+
+def test_counters_follow_reactions_and_comments(client, auth, shoutout_id):
+    base = f"/api/shoutouts/{shoutout_id}"
+    for user in (1, 2):
+        assert client.post(f"{base}/reactions", json={"type": "like"}, headers=auth(user)).status_code == 200
+    assert client.post(f"{base}/reactions", json={"type": "clap"}, headers=auth(3)).status_code == 200
+    _assert_consistent(shoutout_id, like_count=2, clap_count=1)
+
+    # Reacting again with the same type changes nothing; another type moves the reaction
+    assert client.post(f"{base}/reactions", json={"type": "like"}, headers=auth(1)).status_code == 200
+    assert client.post(f"{base}/reactions", json={"type": "star"}, headers=auth(1)).status_code == 200
+    _assert_consistent(shoutout_id, like_count=1, star_count=1)
+
+    assert client.delete(f"{base}/reactions/like", headers=auth(2)).status_code == 200
+    assert client.delete(f"{base}/reactions/like", headers=auth(2)).status_code == 404
+    _assert_consistent(shoutout_id, like_count=0, clap_count=1, star_count=1)
+
+    comment_ids = []
+    for n in range(3):
+        response = client.post(f"{base}/comments", json={"content": f"comment {n}"}, headers=auth(4))
+        assert response.status_code == 200, response.text
+        comment_ids.append(response.json()["id"])
+    _assert_consistent(shoutout_id, comment_count=3)
+
+    assert client.delete(f"/api/shoutouts/comments/{comment_ids[0]}", headers=auth(4)).status_code == 200
+    _assert_consistent(shoutout_id, comment_count=2)
+
+    shown = client.get(base, headers=auth(5)).json()
+    assert shown["reaction_counts"] == {"clap": 1, "star": 1}
+    assert shown["comment_count"] == 2
+
+
+def test_reconcile_repairs_drifted_counters(client, auth, shoutout_id):
+    db = SessionLocal()
+    try:
+        db.execute(update(ShoutOut).where(ShoutOut.id == shoutout_id).values(like_count=7, comment_count=0))
+        db.commit()
+        assert _counters(shoutout_id)[0] != _counters(shoutout_id)[1]
+        assert reconcile_shoutout_counters(db) >= 1
+    finally:
+        db.close()
+    stored, actual = _counters(shoutout_id)
+    assert stored == actual
+    assert stored["like_count"] == 0
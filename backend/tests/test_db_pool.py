@@ -0,0 +1,59 @@
+"""Request pool gauges and warming."""
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from app import database
+from app.database import async_engine, warm_pool
+
+queue_pool = pytest.mark.skipif(
+    not isinstance(async_engine.pool, QueuePool), reason="the engine does not keep a connection pool"
+)
+
+
+def test_gauges_count_checkouts(client, auth):
+    before = client.get("/api/admin/db-pool", headers=auth(0))
+    assert before.status_code == 200, before.text
+    assert client.get("/api/shoutouts", params={"limit": 1}, headers=auth(1)).status_code == 200
+    after = client.get("/api/admin/db-pool", headers=auth(0)).json()
+
+    assert after["pool"] == type(async_engine.pool).__name__
+    assert after["timeouts"] == 0
+    assert 0 <= after["wait_ms_avg"] <= after["wait_ms_max"]
+    # Only the PostgreSQL request pool is instrumented
+    if isinstance(async_engine.pool, QueuePool):
+        assert after["checkouts"] > before.json()["checkouts"]
+        assert (after["size"], after["max_overflow"]) == (database.DB_POOL_SIZE, database.DB_MAX_OVERFLOW)
+        assert after["checked_out"] + after["checked_in"] <= after["size"] + after["max_overflow"]
+
+
+def test_gauges_need_an_admin(client, auth):
+    assert client.get("/api/admin/db-pool", headers=auth(1)).status_code == 403
+
+
+@queue_pool
+def test_warm_pool_closes_connections_when_one_fails(client, monkeypatch):
+    connect = AsyncEngine.connect
+    opened = []
+
+    async def refused():
+        raise ConnectionRefusedError("refused")
+
+    def flaky(engine):
+        if len(opened) == 1:
+            opened.append(None)
+            return refused()
+        # Held here so the garbage collector cannot return them to the pool instead
+        opened.append(connect(engine))
+        return opened[-1]
+
+    monkeypatch.setattr(AsyncEngine, "connect", flaky)
+    with pytest.raises(ConnectionRefusedError):
+        client.portal.call(warm_pool, 3)
+    # Give connections still opening in the background time to finish
+    time.sleep(0.2)
+    connections = [connection for connection in opened if connection is not None]
+    assert len(connections) == 2
+    assert all(connection.closed for connection in connections)
@@ -0,0 +1,38 @@
+"""Approving a department change moves the user's shoutouts between department feeds."""
+
+
+def _post(client, headers, recipient_id, message):
+    response = client.post("/api/shoutouts", data={"message": message, "recipient_ids": [recipient_id]}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _feed(client, headers):
+    response = client.get("/api/shoutouts", params={"limit": 100}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {shoutout["id"] for shoutout in response.json()}
+
+
+def test_approval_rebuilds_the_movers_timeline(client, users, auth, make_user):
+    mover_id, mover = make_user("Eng")
+    colleague_id, _ = make_user("Eng")
+    received = _post(client, auth(1), mover_id, "for the mover")
+    eng_only = _post(client, auth(1), colleague_id, "stays in Eng")
+    ops_only = _post(client, auth(10), users[11], "Ops news")
+    assert {received, eng_only} <= _feed(client, mover)
+    assert ops_only not in _feed(client, mover)
+
+    response = client.put("/api/users/me", json={"department": "Ops"}, headers=mover)
+    assert response.status_code == 200, response.text
+    pending = client.get("/api/admin/department-change-requests", headers=auth(0)).json()
+    (request_id,) = [request["id"] for request in pending if request["user_id"] == mover_id]
+    decision = client.post(
+        f"/api/admin/department-change-requests/{request_id}/decision", json={"action": "approved"}, headers=auth(0)
+    )
+    assert decision.status_code == 200, decision.text
+
+    feed = _feed(client, mover)
+    assert {received, ops_only} <= feed
+    assert eng_only not in feed
+    assert received in _feed(client, auth(11))
+    assert received not in _feed(client, auth(1))
@@ -0,0 +1,26 @@
+import time
+
+
+def test_feed_etag_tracks_only_people_on_the_page(client, users, auth):
+    response = client.post(
+        "/api/shoutouts", data={"message": "cached shoutout", "recipient_ids": [users[3]]}, headers=auth(4)
+    )
+    assert response.status_code == 200, response.text
+
+    def revalidate(etag):
+        return client.get("/api/shoutouts", params={"limit": 1}, headers={**auth(5), "If-None-Match": etag})
+
+    etag = client.get("/api/shoutouts", params={"limit": 1}, headers=auth(5)).headers["etag"]
+    assert revalidate(etag).status_code == 304
+
+    # A user who is not on the page does not invalidate it
+    assert client.put("/api/users/me", json={"name": "Renamed Bystander"}, headers=auth(6)).status_code == 200
+    assert revalidate(etag).status_code == 304
+
+    # Renaming the recipient shown on the page does; SQLite keeps updated_at
+    # in whole seconds, so let the clock move past the last write first
+    time.sleep(1.1)
+    assert client.put("/api/users/me", json={"name": "Renamed Recipient"}, headers=auth(3)).status_code == 200
+    response = revalidate(etag)
+    assert response.status_code == 200
+    assert response.json()[0]["recipients"][0]["name"] == "Renamed Recipient"
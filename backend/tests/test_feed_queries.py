@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def feed(client, users, auth):
+    """Twenty-five shoutouts from user 0 to users 1 and 2, each with a reaction and a comment."""
+    for n in range(25):
+        response = client.post(
+            "/api/shoutouts",
+            data={"message": f"feed shoutout {n}", "recipient_ids": [users[1], users[2]]},
+            headers=auth(0),
+        )
+        assert response.status_code == 200, response.text
+        shoutout_id = response.json()["id"]
+        assert client.post(f"/api/shoutouts/{shoutout_id}/reactions", json={"type": "like"}, headers=auth(1)).status_code == 200
+        assert client.post(f"/api/shoutouts/{shoutout_id}/comments", json={"content": "nice"}, headers=auth(2)).status_code == 200
+
+
+def _statements_for_page(client, auth, count_statements, limit):
+    count_statements.count = 0
+    response = client.get("/api/shoutouts", params={"limit": limit}, headers=auth(1))
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == limit
+    return count_statements.count
+
+
+def test_feed_query_count_does_not_grow_with_page_size(client, auth, feed, count_statements):
+    # Warm the principal cache so authentication does not add statements to either page
+    client.get("/api/shoutouts", params={"limit": 1}, headers=auth(1))
+
+    small = _statements_for_page(client, auth, count_statements, 5)
+    large = _statements_for_page(client, auth, count_statements, 20)
+
+    assert 0 < small == large
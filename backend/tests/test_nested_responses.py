@@ -0,0 +1,89 @@
+"""Routes that return ORM objects render their nested relationships.
+
+Under AsyncSession a relationship the schema reads but the query did not
+eager-load fails with MissingGreenlet (a 500), so each of these routes is
+called once and its nested objects checked.
+"""
+import pytest
+
+
+@pytest.fixture(scope="module")
+def shoutout_id(client, users, auth):
+    response = client.post(
+        "/api/shoutouts/batch",
+        json={"items": [{"message": "nested responses", "recipient_ids": [users[6]]}]},
+        headers=auth(5),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["results"][0]["shoutout_id"]
+
+
+def test_department_change_requests(client, users, auth):
+    response = client.put("/api/users/me", json={"department": "Ops"}, headers=auth(7))
+    assert response.status_code == 200, response.text
+    assert response.json()["pending_department"] == "Ops"
+
+    mine = client.get("/api/users/me/department-change-requests", headers=auth(7))
+    assert mine.status_code == 200, mine.text
+    assert mine.json()[0]["user"]["id"] == users[7]
+    assert mine.json()[0]["admin"] is None
+
+    pending = client.get("/api/admin/department-change-requests", params={"status": "pending"}, headers=auth(0))
+    assert pending.status_code == 200, pending.text
+    request_id = next(r["id"] for r in pending.json() if r["user_id"] == users[7])
+
+    decided = client.post(
+        f"/api/admin/department-change-requests/{request_id}/decision",
+        json={"action": "rejected"},
+        headers=auth(0),
+    )
+    assert decided.status_code == 200, decided.text
+    assert decided.json()["admin"]["id"] == users[0]
+
+    mine = client.get("/api/users/me/department-change-requests", headers=auth(7))
+    assert mine.status_code == 200, mine.text
+    assert mine.json()[0]["admin"]["id"] == users[0]
+
+
+def test_comments_and_reports(client, users, auth, shoutout_id):
+    created = client.post(
+        f"/api/shoutouts/{shoutout_id}/comments",
+        json={"content": "hello", "mentions": [users[6]]},
+        headers=auth(5),
+    )
+    assert created.status_code == 200, created.text
+    comment = created.json()
+    assert comment["user"]["id"] == users[5]
+    assert [m["id"] for m in comment["mentions"]] == [users[6]]
+
+    listed = client.get(f"/api/shoutouts/{shoutout_id}/comments", headers=auth(6))
+    assert listed.status_code == 200, listed.text
+    assert listed.json()[-1]["mentions"][0]["id"] == users[6]
+
+    updated = client.put(f"/api/shoutouts/comments/{comment['id']}", json={"content": "edited"}, headers=auth(5))
+    assert updated.status_code == 200, updated.text
+    assert updated.json()["user"]["id"] == users[5]
+
+    reported = client.post(
+        f"/api/shoutouts/comments/{comment['id']}/report", json={"reason": "spam"}, headers=auth(6)
+    )
+    assert reported.status_code == 200, reported.text
+    assert reported.json()["reporter"]["id"] == users[6]
+    assert reported.json()["comment"]["user"]["id"] == users[5]
+
+    comment_reports = client.get("/api/admin/comment-reports", headers=auth(0))
+    assert comment_reports.status_code == 200, comment_reports.text
+    assert any(r["comment"]["mentions"] for r in comment_reports.json())
+
+    report = client.post(f"/api/admin/shoutouts/{shoutout_id}/report", json={"reason": "spam"}, headers=auth(6))
+    assert report.status_code == 200, report.text
+    reports = client.get("/api/admin/reports", headers=auth(0))
+    assert reports.status_code == 200, reports.text
+
+
+def test_user_listings(client, users, auth):
+    for path in ("/api/users", f"/api/users/{users[3]}", "/api/users/me", "/api/admin/users"):
+        response = client.get(path, headers=auth(0))
+        assert response.status_code == 200, (path, response.text)
+    search = client.get("/api/users/search", params={"query": "User 3"}, headers=auth(0))
+    assert search.status_code == 200, search.text
@@ -0,0 +1,68 @@
+"""Coalesced notifications keep their place in keyset pages and count each actor once."""
+import pytest
+
+
+@pytest.fixture(scope="module")
+def shoutout_id(client, users, auth):
+    response = client.post(
+        "/api/shoutouts/batch",
+        json={"items": [{"message": "coalescing", "recipient_ids": [users[9]]}]},
+        headers=auth(8),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["results"][0]["shoutout_id"]
+
+
+def _react(client, auth, shoutout_id, reactor):
+    response = client.post(f"/api/shoutouts/{shoutout_id}/reactions", json={"type": "like"}, headers=auth(reactor))
+    assert response.status_code == 200, response.text
+
+
+def test_coalescing_keeps_the_row_in_place(client, users, auth, shoutout_id):
+    _react(client, auth, shoutout_id, 10)
+    comment = client.post(f"/api/shoutouts/{shoutout_id}/comments", json={"content": "nice"}, headers=auth(3))
+    assert comment.status_code == 200, comment.text
+
+    first = client.get("/api/notifications", params={"limit": 1}, headers=auth(8))
+    assert first.status_code == 200, first.text
+    assert first.json()["notifications"][0]["event_type"] == "comment.new"
+    cursor = first.headers["X-Next-Cursor"]
+
+    before = client.get("/api/notifications", params={"limit": 1, "before": cursor}, headers=auth(8))
+    reaction = before.json()["notifications"][0]
+    assert (reaction["event_type"], reaction["event_count"], reaction["updated_at"]) == ("reaction.new", 1, None)
+
+    # A second reaction merges into the older row without moving it past the comment
+    _react(client, auth, shoutout_id, 11)
+    newest = client.get("/api/notifications", params={"limit": 1}, headers=auth(8))
+    assert newest.json()["notifications"][0]["id"] == first.json()["notifications"][0]["id"]
+
+    after = client.get("/api/notifications", params={"limit": 1, "before": cursor}, headers=auth(8))
+    merged = after.json()["notifications"][0]
+    assert merged["id"] == reaction["id"]
+    assert merged["event_count"] == 2
+    assert merged["created_at"] == reaction["created_at"]
+    assert merged["updated_at"] is not None
+
+
+def test_actor_count_counts_people_not_reactions(client, make_user):
+    sender_id, sender = make_user()
+    recipient_id, _ = make_user()
+    reactors = [make_user()[1] for _ in range(3)]
+    response = client.post(
+        "/api/shoutouts/batch",
+        json={"items": [{"message": "re-reacted", "recipient_ids": [recipient_id]}]},
+        headers=sender,
+    )
+    shoutout_id = response.json()["results"][0]["shoutout_id"]
+
+    a, b, c = reactors
+    for headers in (a, b, c):
+        assert client.post(f"/api/shoutouts/{shoutout_id}/reactions", json={"type": "like"}, headers=headers).status_code == 200
+    # A takes the reaction back and reacts again
+    assert client.delete(f"/api/shoutouts/{shoutout_id}/reactions/like", headers=a).status_code == 200
+    assert client.post(f"/api/shoutouts/{shoutout_id}/reactions", json={"type": "like"}, headers=a).status_code == 200
+
+    (notification,) = client.get("/api/notifications", headers=sender).json()["notifications"]
+    assert (notification["event_count"], notification["actor_count"]) == (4, 3)
+    assert notification["title"].endswith("and 1 other reacted to a shoutout")
@@ -0,0 +1,61 @@
+"""Walking the notification list with the ``before`` cursor."""
+import pytest
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal
+from app.utils.notifications import create_notifications_bulk, mark_notifications_read
+
+
+async def _notify_in_batches(user_id, batches, size):
+    # Rows written in one statement share created_at, so every page boundary
+    # inside a batch has to fall back to the id tie-breaker.
+    for batch in range(batches):
+        async with AsyncSessionLocal() as db:
+            await create_notifications_bulk(db, [user_id] * size, event_type="comment.new", title=f"batch {batch}")
+            await db.commit()
+    async with AsyncSessionLocal() as db:
+        ids = (await db.execute(text(
+            "SELECT id FROM notifications WHERE user_id = :user_id ORDER BY id"
+        ), {"user_id": user_id})).scalars().all()
+        await mark_notifications_read(db, user_id=user_id, ids=ids[::3])
+        await db.commit()
+
+
+async def _expected(user_id, unread_only):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(text(
+            "SELECT id FROM notifications WHERE user_id = :user_id"
+            + (" AND NOT is_read" if unread_only else "")
+            + " ORDER BY created_at DESC, id DESC"
+        ), {"user_id": user_id})).scalars().all()
+
+
+@pytest.fixture(scope="module")
+def reader(client, make_user):
+    user_id, headers = make_user()
+    client.portal.call(_notify_in_batches, user_id, 3, 15)
+    return user_id, headers
+
+
+@pytest.mark.parametrize("unread_only", [False, True])
+def test_cursor_walk_has_no_duplicates_or_gaps(client, reader, unread_only):
+    user_id, headers = reader
+    params = {"limit": 7, "unread_only": unread_only}
+    seen = []
+    pages = 0
+    while True:
+        response = client.get("/api/notifications", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = [item["id"] for item in response.json()["notifications"]]
+        assert len(page) <= 7
+        seen.extend(page)
+        pages += 1
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["before"] = response.headers["X-Next-Cursor"]
+        assert pages < 20, "cursor did not advance"
+
+    expected = client.portal.call(_expected, user_id, unread_only)
+    assert len(expected) == (30 if unread_only else 45)
+    assert len(seen) == len(set(seen))
+    assert seen == expected
@@ -0,0 +1,142 @@
+"""Retention: the batched purge, and dropping expired monthly partitions."""
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import database
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine
+from app.models.notification import Notification, current_month
+from app.utils import notification_partitions, notifications
+from app.utils.notifications import create_notifications_bulk, purge_expired_notifications
+
+
+async def _notify(user_id, count):
+    async with AsyncSessionLocal() as db:
+        await create_notifications_bulk(db, [user_id] * count, event_type="comment.new", title="retention")
+        await db.commit()
+
+
+async def _purge(batch_size):
+    async with AsyncSessionLocal() as db:
+        return await purge_expired_notifications(db, batch_size=batch_size)
+
+
+def _backdate(ids, days):
+    db = SessionLocal()
+    db.execute(
+        update(Notification).where(Notification.id.in_(ids))
+        .values(created_at=datetime.now(timezone.utc) - timedelta(days=days))
+    )
+    db.commit()
+    db.close()
+
+
+def test_purge_deletes_expired_rows_in_batches(client, make_user, monkeypatch):
+    user_id, headers = make_user()
+    client.portal.call(_notify, user_id, 7)
+    ids = sorted(n["id"] for n in client.get("/api/notifications", headers=headers).json()["notifications"])
+    old_read, old_unread, recent_read, ancient_unread = ids[:4], ids[4:5], ids[5:6], ids[6:]
+    assert client.post(
+        "/api/notifications/mark-read", json={"ids": old_read + recent_read}, headers=headers
+    ).status_code == 200
+    _backdate(old_read + old_unread, notifications.NOTIFICATION_READ_RETENTION_DAYS + 1)
+    _backdate(ancient_unread, notifications.NOTIFICATION_RETENTION_DAYS + 1)
+
+    batches = []
+    delete_batch = notifications._delete_notifications
+
+    async def record(*args, **kwargs):
+        batches.append(await delete_batch(*args, **kwargs))
+        return batches[-1]
+
+    monkeypatch.setattr(notifications, "_delete_notifications", record)
+    # Old read rows and anything past the overall retention, two per batch
+    assert client.portal.call(_purge, 2) == 5
+    assert batches == [2, 2, 1]
+
+    left = [n["id"] for n in client.get("/api/notifications", headers=headers).json()["notifications"]]
+    assert sorted(left) == old_unread + recent_read
+    unread = client.get("/api/notifications/unread-count", headers=headers).json()
+    assert unread["unread_count"] == 1
+    assert unread["by_event_type"] == {"comment.new": 1}
+
+
+@pytest.fixture
+def scratch_url():
+    """An empty PostgreSQL database beside the test database, with the app's tables."""
+    if async_engine.dialect.name != "postgresql":
+        pytest.skip("partitioning needs PostgreSQL")
+    url = make_url(database.DATABASE_URL)
+    scratch = url.set(database=f"{url.database}_partitions")
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch.database}"'))
+        conn.execute(text(f'CREATE DATABASE "{scratch.database}"'))
+    engine = create_engine(scratch)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    yield scratch
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE "{scratch.database}" WITH (FORCE)'))
+    admin.dispose()
+
+
+def _seed(url, rows):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        user_id = conn.execute(text(
+            "INSERT INTO users (email, name, hashed_password, department, role, is_active, email_verified, "
+            "company_verified) VALUES ('old@example.com', 'Old', '-', 'Eng', 'employee', true, true, true) RETURNING id"
+        )).scalar_one()
+        for month, is_read in rows:
+            conn.execute(
+                text(
+                    "INSERT INTO notifications (user_id, event_type, title, is_read, created_at, created_month) "
+                    "VALUES (:user_id, 'comment.new', 'old', :is_read, :month, :month)"
+                ),
+                {"user_id": user_id, "is_read": is_read, "month": month},
+            )
+        conn.execute(text(
+            "INSERT INTO notification_unread_counts (user_id, event_type, unread) "
+            "SELECT user_id, event_type, count(*) FROM notifications WHERE NOT is_read GROUP BY user_id, event_type"
+        ))
+    engine.dispose()
+
+
+async def _partition_and_expire(url):
+    engine = create_async_engine(database._async_url(url.render_as_string(hide_password=False)))
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            await notification_partitions.partition_notifications(db)
+            before = await notification_partitions._partitions(db)
+            dropped = await notification_partitions.drop_expired_partitions(db)
+            after = await notification_partitions._partitions(db)
+            default = await db.scalar(text("SELECT to_regclass('notifications_default') IS NOT NULL"))
+            rows = (await db.execute(select(Notification.created_month, Notification.is_read))).all()
+            unread = await db.scalar(text("SELECT sum(unread) FROM notification_unread_counts"))
+            return before, dropped, after, default, rows, unread
+    finally:
+        await engine.dispose()
+
+
+def test_drop_expired_partitions_keeps_current_and_default(client, scratch_url, monkeypatch):
+    this_month = current_month()
+    ancient = date(this_month.year - 2, this_month.month, 1)
+    # Beyond the partitions made ahead, so the row lands in the default partition
+    far_ahead = date(this_month.year + 2, this_month.month, 1)
+    _seed(scratch_url, [(ancient, False), (ancient, False), (ancient, True), (this_month, False), (far_ahead, False)])
+    # Everything before yesterday has expired
+    monkeypatch.setattr(notification_partitions, "NOTIFICATION_RETENTION_DAYS", 1)
+
+    before, dropped, after, default, rows, unread = client.portal.call(_partition_and_expire, scratch_url)
+    assert ancient in before and ancient not in after
+    assert dropped == len(before) - len(after) > 0
+    assert min(after) >= notification_partitions._add_months(this_month, -1)
+    assert this_month in after
+    assert default
+    assert sorted(rows) == [(this_month, False), (far_ahead, False)]
+    # The two unread rows in the dropped partition are released from the counters
+    assert unread == 2
@@ -0,0 +1,60 @@
+"""The notification stream pushes new notifications and re-sends coalesced ones.
+
+TestClient returns a streamed body only once it ends, so the stream is
+given a short lifetime and read from a thread while the test acts.
+"""
+import json
+import threading
+import time
+
+from app.routes import notifications
+
+LIFETIME = 3
+
+
+def _events(body):
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_pushes_created_and_coalesced_notifications(client, make_user, monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFICATION_STREAM_MAX_SECONDS", LIFETIME)
+    monkeypatch.setattr(notifications, "NOTIFICATION_STREAM_HEARTBEAT_SECONDS", 1)
+    listener_id, listener = make_user()
+    (colleague_id, colleague), (_, reactor) = make_user(), make_user()
+
+    response = {}
+    reader = threading.Thread(
+        target=lambda: response.update(stream=client.get("/api/notifications/stream", headers=listener))
+    )
+    reader.start()
+    time.sleep(0.5)
+
+    # A shoutout to the listener, then two reactions to one of theirs
+    received = client.post("/api/shoutouts", data={"message": "streamed", "recipient_ids": [listener_id]}, headers=colleague)
+    assert received.status_code == 200, received.text
+    sent = client.post("/api/shoutouts", data={"message": "reacted to", "recipient_ids": [colleague_id]}, headers=listener)
+    assert sent.status_code == 200, sent.text
+    for headers in (colleague, reactor):
+        reaction = client.post(f"/api/shoutouts/{sent.json()['id']}/reactions", json={"type": "like"}, headers=headers)
+        assert reaction.status_code == 200, reaction.text
+        time.sleep(0.3)
+
+    reader.join(timeout=LIFETIME + 10)
+    assert not reader.is_alive()
+    stream = response["stream"]
+    assert stream.status_code == 200
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    events = _events(stream.text)
+
+    pushed = [(data["event_type"], data["event_count"]) for kind, data in events if kind == "notification"]
+    assert pushed == [("shoutout.received", 1), ("reaction.new", 1), ("reaction.new", 2)]
+    reaction_ids = {data["id"] for kind, data in events if kind == "notification" and data["event_type"] == "reaction.new"}
+    assert len(reaction_ids) == 1
+    # The coalesced reaction does not change the unread count
+    unread = [data["unread_count"] for kind, data in events if kind == "unread"]
+    assert unread == [0, 1, 2]
@@ -0,0 +1,71 @@
+"""Changes to a user reach requests served from the principal cache."""
+from app.database import SessionLocal
+from app.models.user import User
+from app.utils.principals import principal_cache
+
+
+def _admin_status(client, headers):
+    return client.get("/api/admin/db-pool", headers=headers).status_code
+
+
+def _set(user_id, **values):
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_deactivation_applies_to_the_next_request(client, make_user):
+    user_id, headers = make_user()
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    assert principal_cache.get(user_id) is not None
+
+    _set(user_id, is_active=False)
+
+    response = client.get("/api/users/me", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+
+def test_role_change_applies_to_the_next_request(client, make_user):
+    user_id, headers = make_user()
+    assert _admin_status(client, headers) == 403
+
+    _set(user_id, role="admin")
+    assert _admin_status(client, headers) == 200
+
+    _set(user_id, role="employee")
+    assert _admin_status(client, headers) == 403
+
+
+def test_request_during_an_uncommitted_change_is_not_kept(client, make_user):
+    user_id, headers = make_user()
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).role = "admin"
+        db.flush()
+        # Loads and caches the committed row while the change is pending
+        assert _admin_status(client, headers) == 403
+        db.commit()
+    finally:
+        db.close()
+    assert _admin_status(client, headers) == 200
+
+
+def test_rolled_back_change_never_applies(client, make_user):
+    user_id, headers = make_user()
+    assert _admin_status(client, headers) == 403
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).role = "admin"
+        db.flush()
+        assert _admin_status(client, headers) == 403
+        db.rollback()
+    finally:
+        db.close()
+    assert _admin_status(client, headers) == 403
+    assert principal_cache.get(user_id).role == "employee"
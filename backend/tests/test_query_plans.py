@@ -0,0 +1,150 @@
+"""Query-plan regression tests for the feed and notification page queries.
+
+Each test captures the page query the route actually sends and asks the
+database to EXPLAIN it, failing if a paged table is read by a full scan or
+if the index meant to serve the query is missing from the plan. On
+PostgreSQL sequential scans are disabled for the EXPLAIN, so the plan shows
+which index the query can use however few rows the test database holds.
+"""
+import re
+
+import pytest
+from sqlalchemy import event, text
+
+from app.database import AsyncSessionLocal, async_engine
+from app.utils.notifications import create_notifications_bulk, mark_notifications_read
+
+PAGED_TABLES = ("shoutouts", "department_timelines", "shoutout_recipients", "notifications")
+RANGE = {"start_date": "2000-01-01", "end_date": "2999-12-31"}
+
+
+@pytest.fixture(scope="module")
+def seeded(client, users, auth):
+    """A few hundred shoutouts between the Eng users, then fresh statistics."""
+    for sender in range(1, 5):
+        items = [
+            {"message": f"plan shoutout {sender}-{n}", "recipient_ids": [users[(sender + n) % 9 + 1]]}
+            for n in range(100)
+            if users[(sender + n) % 9 + 1] != users[sender]
+        ]
+        response = client.post("/api/shoutouts/batch", json={"items": items}, headers=auth(sender))
+        assert response.status_code == 200, response.text
+        assert response.json()["failed"] == 0, response.text
+    client.portal.call(_analyze)
+
+
+@pytest.fixture(scope="module")
+def notified(client, users, seeded):
+    """Two hundred notifications for user 11, every other one read, then fresh statistics."""
+    client.portal.call(_notify, users[11], 200)
+    client.portal.call(_analyze)
+
+
+async def _notify(user_id, count):
+    async with AsyncSessionLocal() as db:
+        await create_notifications_bulk(db, [user_id] * count, event_type="comment.new", title="plan notification")
+        await db.flush()
+        ids = (await db.execute(text(
+            "SELECT id FROM notifications WHERE user_id = :user_id ORDER BY id"
+        ), {"user_id": user_id})).scalars().all()
+        await mark_notifications_read(db, user_id=user_id, ids=ids[::2])
+        await db.commit()
+
+
+async def _analyze():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+
+def _page_query(client, headers, path, params, marker):
+    """Request ``path`` and return the (statement, parameters) of its LIMIT query mentioning ``marker``."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if marker in statement and "LIMIT" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        response = client.get(path, params={"limit": 20, **params}, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    assert response.status_code == 200, response.text
+    assert len(captured) == 1
+    return captured[0]
+
+
+async def _explain(statement, parameters):
+    async with async_engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            rows = await conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+            return [row[0] for row in rows]
+        rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in rows]
+
+
+def _full_scans(plan):
+    scans = []
+    for line in plan:
+        # PostgreSQL: "Seq Scan on shoutouts"; SQLite: "SCAN shoutouts" without an index
+        match = re.search(r"Seq Scan on (\w+)", line) or re.fullmatch(r"\s*SCAN (\w+)", line)
+        if match and match.group(1) in PAGED_TABLES:
+            scans.append(line.strip())
+    return scans
+
+
+# Filters for each case, and index names of which at least one must appear in its
+# plan (ix_shoutouts_created_at also matches the (created_at, id) composite)
+CASES = {
+    "department feed": (lambda users: {}, ("ix_department_timelines_feed",)),
+    "all departments feed": (lambda users: {"all_departments": True}, ("ix_shoutouts_created_at",)),
+    "department feed with range": (lambda users: RANGE, ("ix_department_timelines_feed",)),
+    "department filter with range": (
+        lambda users: {"all_departments": True, "department": "Eng", **RANGE},
+        ("ix_shoutouts_created_at",),
+    ),
+    "sender with range": (
+        lambda users: {"all_departments": True, "sender_id": users[2], **RANGE},
+        ("ix_shoutouts_sender_created_at",),
+    ),
+    "recipient with range": (
+        lambda users: {"all_departments": True, "recipient_id": users[3], **RANGE},
+        (
+            "ix_shoutout_recipients_recipient_shoutout",
+            "ix_shoutout_recipients_shoutout_recipient",
+            "ix_shoutout_recipients_recipient_id",
+        ),
+    ),
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_feed_queries_use_indexes(client, users, auth, seeded, case):
+    params, indexes = CASES[case]
+    statement, parameters = _page_query(client, auth(1), "/api/shoutouts", params(users), "shoutouts.like_count")
+    plan = client.portal.call(_explain, statement, parameters)
+    assert _full_scans(plan) == [], "\n".join(plan)
+    assert any(index in line for line in plan for index in indexes), "\n".join(plan)
+
+
+NOTIFICATION_CASES = {
+    "notifications page": ({}, "ix_notifications_user_created_at"),
+    "unread notifications page": ({"unread_only": True}, "ix_notifications_user_unread"),
+}
+
+
+@pytest.mark.parametrize("case", NOTIFICATION_CASES)
+def test_notification_pages_use_indexes(client, auth, notified, case):
+    params, index = NOTIFICATION_CASES[case]
+    first = client.get("/api/notifications", params={"limit": 20, **params}, headers=auth(11))
+    assert first.status_code == 200, first.text
+    # The first page and one reached through the cursor
+    for page_params in (params, {**params, "before": first.headers["X-Next-Cursor"]}):
+        statement, parameters = _page_query(
+            client, auth(11), "/api/notifications", page_params, "notifications.event_count"
+        )
+        plan = client.portal.call(_explain, statement, parameters)
+        assert _full_scans(plan) == [], "\n".join(plan)
+        assert any(index in line for line in plan), "\n".join(plan)
@@ -0,0 +1,72 @@
+"""Login throttling with the memory and database bucket stores.
+
+conftest turns rate limiting off; each test switches it on with small limits
+and a clock it controls.
+"""
+import time
+import types
+
+import pytest
+
+from app.middleware import rate_limit
+from app.middleware.rate_limit import DatabaseStore, Limit, MemoryStore
+
+STORES = {"memory": lambda: MemoryStore(100), "database": DatabaseStore}
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=STORES)
+def clock(request, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "rate_limit_store", STORES[request.param]())
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def email(client, make_user):
+    # Created before the clock fixture turns limiting on, so its login is free
+    _, headers = make_user()
+    return client.get("/api/users/me", headers=headers).json()["email"]
+
+
+def _login(client, email, password="pw"):
+    return client.post("/api/auth/login", json={"email": email, "password": password})
+
+
+def test_account_bucket_empties_and_refills(client, email, clock, monkeypatch):
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "login_ip", None)
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "login_account", Limit(capacity=2, per_seconds=60))
+
+    assert _login(client, email).status_code == 200
+    assert _login(client, email, password="wrong").status_code == 401
+    denied = _login(client, email)
+    assert denied.status_code == 429
+    assert denied.headers["Retry-After"] == "30"
+
+    clock.now += 29
+    assert _login(client, email).headers["Retry-After"] == "1"
+    clock.now += 1
+    assert _login(client, email).status_code == 200
+    assert _login(client, email).status_code == 429
+
+
+def test_ip_bucket_is_shared_by_accounts(client, clock, monkeypatch):
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "login_ip", Limit(capacity=3, per_seconds=30))
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "login_account", None)
+    for n in range(3):
+        assert _login(client, f"nobody{n}@example.com").status_code == 401
+    denied = _login(client, "user1@example.com")
+    assert denied.status_code == 429
+    assert denied.headers["Retry-After"] == "10"
+
+    clock.now += 10
+    assert _login(client, "user1@example.com").status_code == 200
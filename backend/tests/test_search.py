@@ -0,0 +1,57 @@
+"""Full-text search over shoutouts and comments stays in sync with the rows."""
+
+
+def _post(client, users, auth, message):
+    response = client.post("/api/shoutouts", data={"message": message, "recipient_ids": [users[7]]}, headers=auth(6))
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _comment(client, auth, shoutout_id, content):
+    response = client.post(f"/api/shoutouts/{shoutout_id}/comments", json={"content": content}, headers=auth(7))
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _search(client, auth, q):
+    response = client.get("/api/search", params={"q": q}, headers=auth(6))
+    assert response.status_code == 200, response.text
+    return [(hit["kind"], hit["shoutout_id"], hit["comment_id"]) for hit in response.json()]
+
+
+def test_comment_text_finds_its_shoutout(client, users, auth):
+    shoutout_id = _post(client, users, auth, "Thanks for the release notes")
+    comment_id = _comment(client, auth, shoutout_id, "The xylophonic release party was great")
+    assert _search(client, auth, "xylophonic") == [("comment", shoutout_id, comment_id)]
+
+
+def test_closer_match_ranks_first(client, users, auth):
+    close = _post(client, users, auth, "Zephyrine deployment: the zephyrine deployment went smoothly")
+    # Newer, so it would come first if ranking fell back to recency
+    loose = _post(client, users, auth, "Sprint review covered the zephyrine backlog, retro notes and a deployment checklist")
+    assert [shoutout_id for _, shoutout_id, _ in _search(client, auth, "zephyrine deployment")] == [close, loose]
+
+
+def test_edits_and_deletes_update_the_index(client, users, auth):
+    shoutout_id = _post(client, users, auth, "Quokkaform migration shipped")
+    comment_id = _comment(client, auth, shoutout_id, "Marsupialix congratulations")
+    assert _search(client, auth, "quokkaform") == [("shoutout", shoutout_id, None)]
+
+    edited = client.put(f"/api/shoutouts/{shoutout_id}", json={"message": "Wombatic migration shipped"}, headers=auth(6))
+    assert edited.status_code == 200, edited.text
+    assert _search(client, auth, "quokkaform") == []
+    assert _search(client, auth, "wombatic") == [("shoutout", shoutout_id, None)]
+
+    edited = client.put(f"/api/shoutouts/comments/{comment_id}", json={"content": "Dasyurid congratulations"}, headers=auth(7))
+    assert edited.status_code == 200, edited.text
+    assert _search(client, auth, "marsupialix") == []
+    assert _search(client, auth, "dasyurid") == [("comment", shoutout_id, comment_id)]
+
+    assert client.delete(f"/api/shoutouts/comments/{comment_id}", headers=auth(7)).status_code == 200
+    assert _search(client, auth, "dasyurid") == []
+
+    other_comment = _comment(client, auth, shoutout_id, "Bandicootish applause")
+    assert _search(client, auth, "bandicootish") == [("comment", shoutout_id, other_comment)]
+    assert client.delete(f"/api/shoutouts/{shoutout_id}", headers=auth(6)).status_code == 200
+    assert _search(client, auth, "wombatic") == []
+    assert _search(client, auth, "bandicootish") == []
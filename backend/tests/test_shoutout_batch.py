@@ -0,0 +1,113 @@
+"""The batch endpoint writes in chunks, retries a failed chunk item by item, and reports each item."""
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models.shoutout import ShoutOut
+from app.routes import shoutouts
+
+# SQLite cannot order batched RETURNING rows, so SQLAlchemy sends one
+# shoutout INSERT per row there; every other statement is per chunk.
+PER_ROW = 1 if async_engine.dialect.name == "sqlite" else 0
+
+
+@pytest.fixture(scope="module")
+def people(make_user):
+    """A fresh sender and recipient, so counts are not disturbed by other tests."""
+    (sender_id, sender), (recipient_id, _) = make_user(), make_user()
+    return sender_id, sender, recipient_id
+
+
+def _post(client, headers, count_statements, items):
+    count_statements.count = 0
+    response = client.post("/api/shoutouts/batch", json={"items": items}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json(), count_statements.count
+
+
+def _items(recipient_id, count, message="batched"):
+    return [{"message": f"{message} {n}", "recipient_ids": [recipient_id]} for n in range(count)]
+
+
+async def _sent_by(sender_id):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count(ShoutOut.id)).where(ShoutOut.sender_id == sender_id))
+
+
+@pytest.fixture(scope="module")
+def chunk_cost(client, people):
+    """Statements for a one-item batch, and for each further chunk."""
+    _, sender, recipient_id = people
+
+    def measure(count_statements):
+        _post(client, sender, count_statements, _items(recipient_id, 1))  # warm the principal cache
+        _, one = _post(client, sender, count_statements, _items(recipient_id, 1))
+        _, full = _post(client, sender, count_statements, _items(recipient_id, shoutouts.BATCH_CHUNK_SIZE))
+        _, two = _post(client, sender, count_statements, _items(recipient_id, shoutouts.BATCH_CHUNK_SIZE + 1))
+        assert full == one + (shoutouts.BATCH_CHUNK_SIZE - 1) * PER_ROW
+        return one, two - full
+
+    return measure
+
+
+def test_statements_grow_per_chunk_not_per_item(client, people, count_statements, chunk_cost):
+    _, sender, recipient_id = people
+    one_chunk, per_chunk = chunk_cost(count_statements)
+    assert per_chunk > 0
+
+    body, statements = _post(client, sender, count_statements, _items(recipient_id, 450))
+    assert (body["created"], body["failed"]) == (450, 0)
+    # 200 + 200 + 50
+    assert statements == one_chunk + 2 * per_chunk + 447 * PER_ROW
+
+
+def test_failed_chunk_is_retried_item_by_item(client, people, count_statements, chunk_cost, monkeypatch):
+    sender_id, sender, recipient_id = people
+    one_chunk, per_chunk = chunk_cost(count_statements)
+    insert_shoutouts = shoutouts.insert_shoutouts
+
+    async def poisoned(db, sender, items):
+        # Fail after the rows are written, so the rollback has something to undo
+        rows = await insert_shoutouts(db, sender, items)
+        if any(message == "poison" for message, _ in items):
+            raise SQLAlchemyError("poisoned item")
+        return rows
+
+    monkeypatch.setattr(shoutouts, "insert_shoutouts", poisoned)
+    items = _items(recipient_id, 5)
+    items[2]["message"] = "poison"
+    before = client.portal.call(_sent_by, sender_id)
+
+    body, statements = _post(client, sender, count_statements, items)
+
+    assert (body["created"], body["failed"]) == (4, 1)
+    assert [result["success"] for result in body["results"]] == [True, True, False, True, True]
+    assert body["results"][2]["error"] == "Could not create shoutout"
+    assert len({result["shoutout_id"] for result in body["results"] if result["success"]}) == 4
+    assert client.portal.call(_sent_by, sender_id) == before + 4
+    # The failed chunk, then each of its five items on its own
+    assert statements == one_chunk + 5 * per_chunk + 4 * PER_ROW
+
+
+def test_invalid_items_fail_without_breaking_the_chunk(client, users, people, count_statements, chunk_cost):
+    sender_id, sender, recipient_id = people
+    one_chunk, _ = chunk_cost(count_statements)
+    items = _items(recipient_id, 10)
+    items[1]["recipient_ids"] = [recipient_id, 10 ** 9]
+    items[4]["message"] = "   "
+    items[7]["recipient_ids"] = [sender_id]
+    items[8]["recipient_ids"] = [users[11]]  # Ops
+
+    body, statements = _post(client, sender, count_statements, items)
+
+    assert (body["created"], body["failed"]) == (6, 4)
+    errors = {result["index"]: result["error"] for result in body["results"] if not result["success"]}
+    assert errors == {
+        1: f"Recipient with id {10 ** 9} not found",
+        4: "Shoutout message cannot be empty",
+        7: "You cannot give a shoutout to yourself",
+        8: "Can only tag users from your own department",
+    }
+    # The six valid items still went out as one chunk, with no per-item retries
+    assert statements == one_chunk + 5 * PER_ROW
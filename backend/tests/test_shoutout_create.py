@@ -0,0 +1,23 @@
+"""Creating a shoutout costs the same statements whatever the number of recipients."""
+
+
+def _statements_for_post(client, users, auth, count_statements, recipients):
+    count_statements.count = 0
+    response = client.post(
+        "/api/shoutouts",
+        data={"message": f"to {len(recipients)}", "recipient_ids": [users[i] for i in recipients]},
+        headers=auth(1),
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()["recipients"]) == len(recipients)
+    return count_statements.count
+
+
+def test_statement_count_does_not_grow_with_recipients(client, users, auth, count_statements):
+    # Warm the principal cache so authentication does not add statements to either request
+    _statements_for_post(client, users, auth, count_statements, [2])
+
+    one = _statements_for_post(client, users, auth, count_statements, [2])
+    eight = _statements_for_post(client, users, auth, count_statements, range(2, 10))
+
+    assert 0 < one == eight
@@ -0,0 +1,72 @@
+"""Uploads are served with immutable caching, a strong ETag and byte ranges."""
+import hashlib
+
+import pytest
+
+from app.utils.static import IMMUTABLE_CACHE_CONTROL
+
+CONTENT = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+@pytest.fixture(scope="module")
+def url(client, users, auth):
+    response = client.post(
+        "/api/shoutouts",
+        data={"message": "ranged", "recipient_ids": [users[3]]},
+        files=[("files", ("ranged.pdf", CONTENT, "application/pdf"))],
+        headers=auth(2),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["attachments"][0]["url"]
+
+
+def test_full_file_is_immutable(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["ETag"] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+
+def test_if_none_match_gets_304(client, url):
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=2-5", 2, 5),
+    ("bytes=1000-", 1000, len(CONTENT) - 1),
+    ("bytes=10-999999", 10, len(CONTENT) - 1),
+    ("bytes=-4", len(CONTENT) - 4, len(CONTENT) - 1),
+    ("bytes=-999999", 0, len(CONTENT) - 1),
+])
+def test_satisfiable_range_gets_206(client, url, header, start, end):
+    response = client.get(url, headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.content == CONTENT[start:end + 1]
+
+
+@pytest.mark.parametrize("header", [f"bytes={len(CONTENT)}-", f"bytes={len(CONTENT) + 5}-{len(CONTENT) + 9}", "bytes=-0"])
+def test_unsatisfiable_range_gets_416(client, url, header):
+    response = client.get(url, headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=5-2", "bytes=0-1,4-5", "items=0-1"])
+def test_invalid_range_is_ignored(client, url, header):
+    response = client.get(url, headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_stale_if_range_gets_the_whole_file(client, url):
+    response = client.get(url, headers={"Range": "bytes=2-5", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
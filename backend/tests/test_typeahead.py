@@ -0,0 +1,65 @@
+"""Typeahead ranking, LIKE escaping, department filter, and SQL/in-memory parity."""
+import pytest
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.utils import typeahead
+from app.utils.typeahead import PrefixIndex, _sql_suggestions
+
+NAMES = {
+    "Quorvan Adams": "Eng",   # full-name prefix
+    "Bea Quorvin": "Ops",     # word prefix
+    "Xquorvy Lee": "Eng",     # infix only
+    "Quorv_a": "Eng",         # literal underscore
+    "Quorvba": "Eng",         # would match an unescaped _
+    "Quorv%c": "Eng",         # literal percent
+}
+
+
+@pytest.fixture(scope="module")
+def named(users):
+    db = SessionLocal()
+    created = [
+        User(email=f"typeahead{i}@example.com", name=name, hashed_password="-", department=department,
+             role="employee", is_active=True)
+        for i, (name, department) in enumerate(NAMES.items())
+    ]
+    db.add_all(created)
+    db.commit()
+    db.close()
+
+
+def _names(client, auth, **params):
+    response = client.get("/api/users/typeahead", params=params, headers=auth(1))
+    assert response.status_code == 200, response.text
+    return [suggestion["name"] for suggestion in response.json()]
+
+
+def test_prefix_then_word_prefix_then_infix(client, auth, named):
+    expected = ["Quorv%c", "Quorv_a", "Quorvan Adams", "Quorvba", "Bea Quorvin"]
+    if typeahead._trigram_index:
+        expected.append("Xquorvy Lee")
+    assert _names(client, auth, q="QUORV", limit=20) == expected
+
+
+@pytest.mark.parametrize("query, expected", [("quorv_", ["Quorv_a"]), ("quorv%", ["Quorv%c"])])
+def test_like_wildcards_are_literal(client, auth, named, query, expected):
+    assert _names(client, auth, q=query) == expected
+
+
+def test_department_filter(client, auth, named):
+    assert _names(client, auth, q="quorv", department="Ops") == ["Bea Quorvin"]
+
+
+@pytest.mark.parametrize("query, department", [
+    ("quorv", None), ("quor", "Ops"), ("adams", None), ("quorv_", None), ("user 1", None), ("nobody", None),
+])
+def test_in_memory_index_matches_sql(named, query, department):
+    db = SessionLocal()
+    try:
+        in_memory = PrefixIndex(refresh_seconds=60).lookup(db, query, department, 20)
+        sql = [row for row in _sql_suggestions(db, query, department, 20)
+               if row[1].lower().startswith(query) or f" {query}" in row[1].lower()]
+    finally:
+        db.close()
+    assert in_memory == sql
@@ -0,0 +1,74 @@
+"""The unread-count endpoint matches the unread rows through every kind of change."""
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models.notification import Notification
+from app.utils import broker
+from app.utils.notifications import create_notifications_bulk, delete_all_notifications
+
+
+async def _unread_rows(user_id):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(func.count(Notification.id)).where(Notification.user_id == user_id, Notification.is_read.is_(False))
+        )
+
+
+def _assert_parity(client, user_id, headers, expected):
+    response = client.get("/api/notifications/unread-count", headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["unread_count"] == sum(body["by_event_type"].values())
+    assert body["unread_count"] == client.portal.call(_unread_rows, user_id) == expected
+    listed = client.get("/api/notifications", params={"limit": 1}, headers=headers).json()
+    assert listed["unread_count"] == expected
+
+
+def test_unread_count_matches_rows(client, make_user):
+    user_id, headers = make_user()
+    (colleague_id, colleague), (_, reactor) = make_user(), make_user()
+
+    # Created: a shoutout to the user, and two comments on one of theirs
+    assert client.post("/api/shoutouts", data={"message": "hi", "recipient_ids": [user_id]}, headers=colleague).status_code == 200
+    own = client.post("/api/shoutouts", data={"message": "mine", "recipient_ids": [colleague_id]}, headers=headers).json()["id"]
+    for n in range(2):
+        assert client.post(f"/api/shoutouts/{own}/comments", json={"content": f"c{n}"}, headers=colleague).status_code == 200
+    _assert_parity(client, user_id, headers, 3)
+
+    # Coalesced: the second reaction merges into the first row and is not counted again
+    for headers_ in (colleague, reactor):
+        assert client.post(f"/api/shoutouts/{own}/reactions", json={"type": "like"}, headers=headers_).status_code == 200
+    _assert_parity(client, user_id, headers, 4)
+
+    ids = [n["id"] for n in client.get("/api/notifications", headers=headers).json()["notifications"]]
+    assert client.post("/api/notifications/mark-read", json={"ids": ids[:2]}, headers=headers).status_code == 200
+    _assert_parity(client, user_id, headers, 2)
+    # Marking the same rows again changes nothing
+    assert client.post("/api/notifications/mark-read", json={"ids": ids[:2]}, headers=headers).status_code == 200
+    _assert_parity(client, user_id, headers, 2)
+
+    assert client.delete("/api/notifications", headers=headers).json()["deleted"] == 4
+    _assert_parity(client, user_id, headers, 0)
+
+
+async def _delete_in_batches(user_id):
+    async with AsyncSessionLocal() as db:
+        await create_notifications_bulk(db, [user_id] * 5, event_type="comment.new", title="batched")
+        await db.commit()
+    async with AsyncSessionLocal() as db:
+        return await delete_all_notifications(db, user_id=user_id, batch_size=2)
+
+
+def test_delete_all_wakes_streams_once(client, make_user, monkeypatch):
+    user_id, _ = make_user()
+    published = []
+    publish = broker.notification_broker.publish
+
+    def record(user_ids):
+        published.append(set(user_ids))
+        publish(user_ids)
+
+    monkeypatch.setattr(broker.notification_broker, "publish", record)
+    assert client.portal.call(_delete_in_batches, user_id) == 5
+    # One wakeup for creating the rows, one for deleting them in three batches
+    assert published == [{user_id}, {user_id}]
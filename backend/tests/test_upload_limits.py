@@ -0,0 +1,60 @@
+"""Oversized uploads are rejected with 400 and leave no file behind."""
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.routes.users import AVATAR_DIR
+from app.utils import attachments
+from app.utils.uploads import save_upload
+
+MB = 1024 * 1024
+
+
+def _files(directory):
+    found = set()
+    for root, _, names in os.walk(directory):
+        found.update(os.path.join(root, name) for name in names)
+    return found
+
+
+def test_oversized_attachment_is_rejected(client, users, make_user):
+    sender_id, headers = make_user()
+    before = _files(attachments.UPLOADS_ROOT)
+    response = client.post(
+        "/api/shoutouts",
+        data={"message": "too big", "recipient_ids": [users[2]]},
+        files=[
+            ("files", ("fine.pdf", b"%PDF-1.4 fine", "application/pdf")),
+            ("files", ("big.pdf", b"0" * (5 * MB + 1), "application/pdf")),
+        ],
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "File big.pdf exceeds 5MB size limit"
+    # The file staged before the oversized one is removed too
+    assert _files(attachments.UPLOADS_ROOT) == before
+    assert client.get("/api/shoutouts", params={"sender_id": sender_id}, headers=headers).json() == []
+
+
+@pytest.mark.parametrize("size", [2 * MB + 1, 5 * MB + 1])
+def test_oversized_avatar_is_rejected(client, make_user, size):
+    _, headers = make_user()
+    before = _files(AVATAR_DIR)
+    response = client.post(
+        "/api/users/me/avatar", files={"avatar": ("big.png", b"0" * size, "image/png")}, headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Avatar exceeds 2MB size limit"
+    assert _files(AVATAR_DIR) == before
+    assert client.get("/api/users/me", headers=headers).json()["avatar_url"] is None
+
+
+@pytest.mark.parametrize("limit", [2 * MB, 5 * MB])
+def test_streamed_upload_over_the_limit_is_removed(client, tmp_path, limit):
+    # No size from the multipart parser, so the limit is only found while copying
+    upload = UploadFile(io.BytesIO(b"0" * (limit + 1)), filename="big.bin")
+    destination = tmp_path / "staged"
+    assert client.portal.call(lambda: save_upload(upload, str(destination), max_size=limit)) is None
+    assert not destination.exists()
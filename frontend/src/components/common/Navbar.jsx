@@ -91,13 +91,20 @@ export default function Navbar() {
     return date.toLocaleDateString();
   }, []);
 
+  // Newest notification seen, so a reconnecting stream resumes after it
+  const lastNotificationIdRef = useRef(null);
+
   const fetchNotifications = useCallback(async () => {
     if (!user) return;
     setNotificationsLoading(true);
     try {
       const { data } = await notificationsAPI.list({ limit: 15 });
-      setNotifications(data?.notifications || []);
+      const items = data?.notifications || [];
+      setNotifications(items);
       setUnreadCount(data?.unread_count || 0);
+      items.forEach((item) => {
+        lastNotificationIdRef.current = Math.max(lastNotificationIdRef.current || 0, item.id);
+      });
     } catch (error) {
       console.error('Failed to load notifications', error);
     } finally {
@@ -108,10 +115,49 @@ export default function Navbar() {
   useEffect(() => {
     if (!user) return;
     fetchNotifications();
-    const intervalId = window.setInterval(fetchNotifications, 60000);
+    // Fallback only: the stream below delivers changes as they happen
+    const intervalId = window.setInterval(fetchNotifications, 300000);
     return () => window.clearInterval(intervalId);
   }, [user, fetchNotifications]);
 
+  useEffect(() => {
+    if (!user) return;
+    const controller = new AbortController();
+    let retryDelay = 1000;
+    let retryTimer;
+    const handleEvent = (message) => {
+      retryDelay = 1000;
+      const data = JSON.parse(message.data);
+      if (message.event === 'notification') {
+        lastNotificationIdRef.current = Math.max(lastNotificationIdRef.current || 0, data.id);
+        setNotifications((prev) => [data, ...prev.filter((item) => item.id !== data.id)].slice(0, 15));
+      } else if (message.event === 'unread') {
+        setUnreadCount(data.unread_count);
+      }
+    };
+    const connect = async () => {
+      try {
+        await notificationsAPI.stream({
+          signal: controller.signal,
+          lastEventId: lastNotificationIdRef.current,
+          onEvent: handleEvent,
+        });
+      } catch {
+        if (controller.signal.aborted) return;
+        // Goes through the API client, which refreshes an expired token
+        await fetchNotifications();
+        retryDelay = Math.min(retryDelay * 2, 60000);
+      }
+      if (controller.signal.aborted) return;
+      retryTimer = window.setTimeout(connect, retryDelay);
+    };
+    connect();
+    return () => {
+      controller.abort();
+      window.clearTimeout(retryTimer);
+    };
+  }, [user, fetchNotifications]);
+
   useEffect(() => {
     if (user) return;
     setNotifications([]);
@@ -19,7 +19,7 @@ export default function CommentInput({ value = '', onChange = () => {}, onAddCom
     const fetch = async () => {
       if (!query) { setSuggestions([]); return; }
       try {
-        const { data } = await userAPI.search(query);
+        const { data } = await userAPI.typeahead(query);
         setSuggestions((data || []).map(u => ({ id: u.id, name: u.name })));
         setActiveIndex(0);
       } catch (e) {
@@ -44,7 +44,7 @@ export default function Feed() {
     setFilterSender(val);
     if (val && String(val).length >= 2 && isNaN(Number(val))) {
       try {
-        const { data } = await userAPI.search(val);
+        const { data } = await userAPI.typeahead(val);
         setSenderOptions(data || []);
       } catch (e) {
         setSenderOptions([]);
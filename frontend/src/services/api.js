@@ -63,6 +63,7 @@ export const userAPI = {
   },
   getUsers: (department) => api.get('/users', { params: { department } }),
   search: (query) => api.get('/users/search', { params: { query } }),
+  typeahead: (q, department) => api.get('/users/typeahead', { params: { q, department } }),
 };
 
 export const shoutoutAPI = {
@@ -114,4 +115,42 @@ export const notificationsAPI = {
   markRead: (ids) => api.post('/notifications/mark-read', ids ? { ids } : {}),
   markAllRead: () => api.post('/notifications/mark-all-read'),
   clearAll: () => api.delete('/notifications'),
+  stream: (options) => streamNotifications(options),
 };
+
+// Reads the Server-Sent Events stream with fetch rather than EventSource so
+// the access token travels in the Authorization header, not the URL.
+// Resolves when the server ends the stream; rejects on HTTP or network errors.
+async function streamNotifications({ signal, lastEventId, onEvent }) {
+  const headers = { Accept: 'text/event-stream' };
+  const token = localStorage.getItem('access_token');
+  if (token) headers.Authorization = `Bearer ${token}`;
+  if (lastEventId) headers['Last-Event-ID'] = String(lastEventId);
+  const response = await fetch(`${API_URL}/notifications/stream`, { headers, signal });
+  if (!response.ok || !response.body) {
+    throw new Error(`Notification stream failed with status ${response.status}`);
+  }
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value;
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const message = { event: 'message', id: null, data: '' };
+      for (const line of block.split('\n')) {
+        const colon = line.indexOf(':');
+        if (colon === 0) continue; // keep-alive comment
+        const field = colon === -1 ? line : line.slice(0, colon);
+        const fieldValue = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+        if (field === 'event') message.event = fieldValue;
+        else if (field === 'id') message.id = fieldValue;
+        else if (field === 'data') message.data = message.data ? `${message.data}\n${fieldValue}` : fieldValue;
+      }
+      if (message.data) onEvent(message);
+    }
+  }
+}